@@ -8,13 +8,21 @@ Usage:
     python medf.py to-html <input.medf> <output.html>
     python medf.py hash <file.medf>
     python medf.py verify <file.medf>
+    python medf.py init <file>...
+    python medf.py commit <file>... --intent "..."
+    python medf.py status [<dir>]
 """
 
 import argparse
 import hashlib
 import json
+import mmap
+import os
 import re
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Optional
@@ -340,28 +348,120 @@ class MeDFHTMLConverter:
         print(f"✓ Created HTML file: {output_path}")
 
 
+# Tracked-file hashing
+HASH_BUFFER_SIZE = 8 * 1024 * 1024  # files up to this size are read in one call
+HASH_MMAP_THRESHOLD = 64 * 1024 * 1024  # larger files are hashed through mmap
+RACY_WINDOW_NS = 2 * 1_000_000_000  # files modified this recently are not cached
+SIDECAR_SUFFIX = '.medf.json'
+
+
+def default_stat_cache_path() -> Path:
+    """Stat cache location ($MEDF_CACHE or ~/.cache/medf)."""
+    cache_dir = os.environ.get('MEDF_CACHE') or Path.home() / '.cache' / 'medf'
+    return Path(cache_dir) / 'stat-cache.json'
+
+
+class FileHasher:
+    """SHA-256 of tracked files with large reads, mmap, threads and a stat cache.
+
+    A cached hash is reused while the file's size, mtime and inode are
+    unchanged, so unchanged files are never re-read. Files modified within
+    the last couple of seconds are not cached, because a same-second edit
+    could leave their stat unchanged.
+    """
+
+    def __init__(self, cache_path: Optional[Path] = None, workers: Optional[int] = None):
+        self.cache_path = cache_path
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 2)
+        self._cache: Dict[str, List[Any]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if cache_path and cache_path.exists():
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    self._cache = json.load(f)
+            except (OSError, ValueError):
+                self._cache = {}
+
+    @staticmethod
+    def _digest(file_path: Path, size: int) -> str:
+        sha256 = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            if size <= HASH_BUFFER_SIZE:
+                sha256.update(f.read())
+            elif size >= HASH_MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    sha256.update(mapped)
+            else:
+                buffer = bytearray(HASH_BUFFER_SIZE)
+                view = memoryview(buffer)
+                while True:
+                    n = f.readinto(buffer)
+                    if not n:
+                        break
+                    sha256.update(view[:n])
+        return f"sha256:{sha256.hexdigest()}"
+
+    def hash_file(self, file_path: Path) -> str:
+        """Return "sha256:<hex>" for a file, from the stat cache when possible."""
+        key = str(file_path.resolve())
+        st = os.stat(key)
+        signature = [st.st_size, st.st_mtime_ns, st.st_ino]
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached and cached[:3] == signature:
+            return cached[3]
+
+        content_hash = self._digest(Path(key), st.st_size)
+        if time.time_ns() - st.st_mtime_ns > RACY_WINDOW_NS:
+            with self._lock:
+                self._cache[key] = signature + [content_hash]
+                self._dirty = True
+        return content_hash
+
+    def hash_files(self, paths: List[Path]) -> Dict[Path, str]:
+        """Hash many files on a thread pool (hashlib releases the GIL)."""
+        if len(paths) < 2:
+            return {path: self.hash_file(path) for path in paths}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return dict(zip(paths, pool.map(self.hash_file, paths)))
+
+    def save(self) -> None:
+        """Write the stat cache back if anything changed."""
+        if not self.cache_path or not self._dirty:
+            return
+        # Forget files that no longer exist
+        self._cache = {k: v for k, v in self._cache.items() if os.path.exists(k)}
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_name(self.cache_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._cache, f)
+        os.replace(tmp_path, self.cache_path)
+        self._dirty = False
+
+
 class MeDFMinimal:
     """Minimal MeDF v0.1 operations with Git-like interface."""
 
-    def __init__(self):
-        pass
+    def __init__(self, hasher: Optional[FileHasher] = None):
+        self.hasher = hasher or FileHasher(default_stat_cache_path())
 
     def _calculate_file_hash(self, file_path: Path) -> str:
         """Calculate SHA-256 hash of a file."""
-        sha256 = hashlib.sha256()
-        with open(file_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b''):
-                sha256.update(chunk)
-        return f"sha256:{sha256.hexdigest()}"
+        return self.hasher.hash_file(file_path)
+
+    def hash_files(self, file_paths: List[Path]) -> Dict[Path, str]:
+        """Hash existing files in parallel, ahead of init/commit."""
+        return self.hasher.hash_files([p for p in file_paths if p.exists()])
 
-    def init(self, file_path: Path) -> None:
+    def init(self, file_path: Path, content_hash: Optional[str] = None) -> None:
         """Initialize a new MeDF file for tracking."""
         if not file_path.exists():
             print(f"✗ File does not exist: {file_path}")
             return
 
         # Calculate content hash
-        content_hash = self._calculate_file_hash(file_path)
+        content_hash = content_hash or self._calculate_file_hash(file_path)
 
         # Get title from first line or filename
         try:
@@ -406,14 +506,15 @@ class MeDFMinimal:
         print(f"  Content hash: {content_hash}")
         print(f"  Use 'medf commit {file_path.name} --intent \"...\"' to set intent")
 
-    def commit(self, file_path: Path, intent: str, author: Optional[str] = None) -> None:
+    def commit(self, file_path: Path, intent: str, author: Optional[str] = None,
+               content_hash: Optional[str] = None) -> None:
         """Create a new MeDF commit for a file."""
         if not file_path.exists():
             print(f"✗ File does not exist: {file_path}")
             return
 
         # Calculate content hash
-        content_hash = self._calculate_file_hash(file_path)
+        content_hash = content_hash or self._calculate_file_hash(file_path)
 
         # Get title from first line or filename
         try:
@@ -514,6 +615,66 @@ class MeDFMinimal:
             print(f"✗ Error: {e}")
             return False
 
+    def status(self, directory: Path, as_json: bool = False) -> Dict[str, List[str]]:
+        """List modified, untracked and deleted files against their sidecars."""
+        tracked: Dict[Path, str] = {}
+        untracked: List[Path] = []
+        deleted: List[Path] = []
+        files = set()
+        sidecars = []
+
+        for root, dirs, names in os.walk(directory):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            for name in names:
+                if name.startswith('.'):
+                    continue
+                path = Path(root) / name
+                if name.endswith(SIDECAR_SUFFIX):
+                    sidecars.append(path)
+                else:
+                    files.add(path)
+
+        for sidecar in sidecars:
+            source = sidecar.with_name(sidecar.name[:-len(SIDECAR_SUFFIX)])
+            try:
+                with open(sidecar, 'r', encoding='utf-8') as f:
+                    content_hash = json.load(f).get('document', {}).get('content_hash')
+            except (OSError, ValueError, AttributeError):
+                continue
+            if not content_hash:
+                # Not a tracking sidecar (e.g. a MEDF v0.2 document)
+                continue
+            if source in files:
+                tracked[source] = content_hash
+            else:
+                deleted.append(source)
+
+        untracked = sorted(files - set(tracked))
+        actual = self.hasher.hash_files(sorted(tracked))
+        modified = sorted(p for p, h in actual.items() if h != tracked[p])
+        self.hasher.save()
+
+        result = {
+            'modified': [str(p) for p in modified],
+            'untracked': [str(p) for p in untracked],
+            'deleted': [str(p) for p in sorted(deleted)],
+        }
+        if as_json:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+            return result
+
+        if not any(result.values()):
+            print(f"✓ {len(tracked)} tracked files unchanged")
+            return result
+        for label, mark in (('modified', '✗'), ('deleted', '✗'), ('untracked', '?')):
+            if result[label]:
+                print(f"{label.capitalize()}:")
+                for path in result[label]:
+                    print(f"  {mark} {path}")
+        print(f"  ({len(tracked)} tracked, {len(modified)} modified, "
+              f"{len(untracked)} untracked, {len(deleted)} deleted)")
+        return result
+
 
 def main():
     parser = argparse.ArgumentParser(description='MeDF CLI Tool')
@@ -553,15 +714,20 @@ def main():
     verify_parser.add_argument('--version', default='0.2', choices=['0.1', '0.2'], help='MeDF version for schema validation')
 
     # init command (minimal v0.1)
-    init_parser = subparsers.add_parser('init', help='Initialize MeDF tracking for a file')
-    init_parser.add_argument('file', type=Path, help='File to track')
+    init_parser = subparsers.add_parser('init', help='Initialize MeDF tracking for files')
+    init_parser.add_argument('file', type=Path, nargs='+', help='File(s) to track')
 
     # commit command (minimal v0.1)
-    commit_parser = subparsers.add_parser('commit', help='Commit file with intent')
-    commit_parser.add_argument('file', type=Path, help='File to commit')
+    commit_parser = subparsers.add_parser('commit', help='Commit files with intent')
+    commit_parser.add_argument('file', type=Path, nargs='+', help='File(s) to commit')
     commit_parser.add_argument('--author', help='Author name')
     commit_parser.add_argument('--intent', required=True, help='Intent description')
 
+    # status command (minimal v0.1)
+    status_parser = subparsers.add_parser('status', help='List modified and untracked files')
+    status_parser.add_argument('directory', type=Path, nargs='?', default=Path('.'), help='Directory to scan')
+    status_parser.add_argument('--json', action='store_true', help='Output as JSON')
+
     args = parser.parse_args()
 
     if not args.command:
@@ -619,11 +785,21 @@ def main():
 
     elif args.command == 'init':
         minimal = MeDFMinimal()
-        minimal.init(args.file)
+        hashes = minimal.hash_files(args.file)
+        for file_path in args.file:
+            minimal.init(file_path, content_hash=hashes.get(file_path))
+        minimal.hasher.save()
 
     elif args.command == 'commit':
         minimal = MeDFMinimal()
-        minimal.commit(args.file, intent=args.intent, author=getattr(args, 'author', None))
+        hashes = minimal.hash_files(args.file)
+        for file_path in args.file:
+            minimal.commit(file_path, intent=args.intent, author=getattr(args, 'author', None),
+                           content_hash=hashes.get(file_path))
+        minimal.hasher.save()
+
+    elif args.command == 'status':
+        MeDFMinimal().status(args.directory, as_json=args.json)
 
     elif args.command == 'verify':
         validator = MeDFValidator(version=args.version)
@@ -3,13 +3,112 @@
  *
  * A flexible, block-based MEDF document viewer with:
  * - Document loading and verification
+ * - Lazily loaded bundles exported by `medf export-viewer`
  * - Block-based navigation
  * - Table of contents generation
  * - Citation copying
  * - Responsive rendering
  */
 
+/**
+ * BLAKE2b with a 32-byte digest (RFC 7693), which Web Crypto lacks.
+ * 64-bit words are held as (low, high) pairs of 32-bit integers.
+ */
+const BLAKE2B_IV = new Uint32Array([
+  0xf3bcc908, 0x6a09e667, 0x84caa73b, 0xbb67ae85, 0xfe94f82b, 0x3c6ef372, 0x5f1d36f1, 0xa54ff53a,
+  0xade682d1, 0x510e527f, 0x2b3e6c1f, 0x9b05688c, 0xfb41bd6b, 0x1f83d9ab, 0x137e2179, 0x5be0cd19
+]);
+const BLAKE2B_SIGMA = [
+  [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15],
+  [14, 10, 4, 8, 9, 15, 13, 6, 1, 12, 0, 2, 11, 7, 5, 3],
+  [11, 8, 12, 0, 5, 2, 15, 13, 10, 14, 3, 6, 7, 1, 9, 4],
+  [7, 9, 3, 1, 13, 12, 11, 14, 2, 6, 5, 10, 4, 0, 15, 8],
+  [9, 0, 5, 7, 2, 4, 10, 15, 14, 1, 11, 12, 6, 8, 3, 13],
+  [2, 12, 6, 10, 0, 11, 8, 3, 4, 13, 7, 5, 15, 14, 1, 9],
+  [12, 5, 1, 15, 14, 13, 4, 10, 0, 7, 6, 3, 9, 2, 8, 11],
+  [13, 11, 7, 14, 12, 1, 3, 9, 5, 0, 15, 4, 8, 6, 2, 10],
+  [6, 15, 14, 9, 11, 3, 0, 8, 12, 2, 13, 7, 1, 4, 10, 5],
+  [10, 2, 8, 4, 7, 6, 1, 5, 15, 11, 9, 14, 3, 12, 13, 0]
+];
+
+function blake2b256Hex(data) {
+  const h = BLAKE2B_IV.slice();
+  h[0] ^= 0x01010000 ^ 32;
+  const v = new Uint32Array(32);
+  const m = new Uint32Array(32);
+
+  const add = (a, b0, b1) => {
+    const lo = v[a] + b0;
+    v[a + 1] = v[a + 1] + b1 + (lo >= 0x100000000 ? 1 : 0);
+    v[a] = lo;
+  };
+  const mix = (a, b, c, d, x, y) => {
+    add(a, v[b], v[b + 1]);
+    add(a, m[x], m[x + 1]);
+    let lo = v[d] ^ v[a], hi = v[d + 1] ^ v[a + 1];
+    v[d] = hi; v[d + 1] = lo;
+    add(c, v[d], v[d + 1]);
+    lo = v[b] ^ v[c]; hi = v[b + 1] ^ v[c + 1];
+    v[b] = (lo >>> 24) ^ (hi << 8); v[b + 1] = (hi >>> 24) ^ (lo << 8);
+    add(a, v[b], v[b + 1]);
+    add(a, m[y], m[y + 1]);
+    lo = v[d] ^ v[a]; hi = v[d + 1] ^ v[a + 1];
+    v[d] = (lo >>> 16) ^ (hi << 16); v[d + 1] = (hi >>> 16) ^ (lo << 16);
+    add(c, v[d], v[d + 1]);
+    lo = v[b] ^ v[c]; hi = v[b + 1] ^ v[c + 1];
+    v[b] = (hi >>> 31) ^ (lo << 1); v[b + 1] = (lo >>> 31) ^ (hi << 1);
+  };
+  const compress = (block, offset, last) => {
+    for (let i = 0; i < 16; i++) {
+      v[i] = h[i];
+      v[i + 16] = BLAKE2B_IV[i];
+    }
+    v[24] ^= offset % 0x100000000;
+    v[25] ^= Math.floor(offset / 0x100000000);
+    if (last) {
+      v[28] = ~v[28];
+      v[29] = ~v[29];
+    }
+    for (let i = 0; i < 32; i++) {
+      m[i] = block[i * 4] | (block[i * 4 + 1] << 8) | (block[i * 4 + 2] << 16) | (block[i * 4 + 3] << 24);
+    }
+    for (let round = 0; round < 12; round++) {
+      const s = BLAKE2B_SIGMA[round % 10];
+      mix(0, 8, 16, 24, s[0] * 2, s[1] * 2);
+      mix(2, 10, 18, 26, s[2] * 2, s[3] * 2);
+      mix(4, 12, 20, 28, s[4] * 2, s[5] * 2);
+      mix(6, 14, 22, 30, s[6] * 2, s[7] * 2);
+      mix(0, 10, 20, 30, s[8] * 2, s[9] * 2);
+      mix(2, 12, 22, 24, s[10] * 2, s[11] * 2);
+      mix(4, 14, 16, 26, s[12] * 2, s[13] * 2);
+      mix(6, 8, 18, 28, s[14] * 2, s[15] * 2);
+    }
+    for (let i = 0; i < 16; i++) {
+      h[i] ^= v[i] ^ v[i + 16];
+    }
+  };
+
+  // Every full block but the last is compressed as it is; the last
+  // (possibly empty or partial) block is zero-padded
+  let offset = 0;
+  while (data.length - offset > 128) {
+    compress(data.subarray(offset, offset + 128), offset + 128, false);
+    offset += 128;
+  }
+  const last = new Uint8Array(128);
+  last.set(data.subarray(offset));
+  compress(last, data.length, true);
+
+  let hex = '';
+  for (let i = 0; i < 32; i++) {
+    hex += ((h[i >> 2] >>> (8 * (i & 3))) & 0xff).toString(16).padStart(2, '0');
+  }
+  return hex;
+}
+
 class MEDFViewer {
+  static HASH_ALGORITHMS = ['sha-256', 'blake2b-256'];
+
   constructor(options = {}) {
     this.options = {
       verifyOnLoad: true,
@@ -19,6 +118,141 @@ class MEDFViewer {
     };
     this.currentDocument = null;
     this.verified = false;
+    this.bundle = null;
+    this.chunkLoads = new Map();
+  }
+
+  /**
+   * Load a viewer bundle exported by `medf export-viewer`
+   *
+   * The manifest carries document metadata, the verification result and
+   * the block list with precomputed block hashes. Block text lives in
+   * content-addressed chunks that are fetched as they scroll into view.
+   */
+  async loadBundle(manifestPath) {
+    const response = await fetch(manifestPath);
+    if (!response.ok) {
+      throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+    }
+    const manifest = await response.json();
+    const base = new URL(manifestPath, window.location.href);
+
+    this.bundle = { manifest, base };
+    this.chunkLoads.clear();
+    this.currentDocument = { ...manifest.document, blocks: manifest.blocks };
+
+    const result = {
+      valid: manifest.verification?.result === 'ok',
+      expected: manifest.document.doc_hash?.value,
+      ...manifest.verification
+    };
+    this.verified = result.valid;
+    this.updateVerificationStatus(result);
+
+    this.renderBundle(manifest);
+
+    return {
+      verified: this.verified,
+      hash: manifest.document.doc_hash?.value || null
+    };
+  }
+
+  /**
+   * Render bundle header, TOC and one placeholder per chunk
+   */
+  renderBundle(manifest) {
+    const doc = manifest.document;
+    document.getElementById('document-title').textContent =
+      doc.document_type?.replace('_', ' ').toUpperCase() || doc.id;
+    document.getElementById('document-id').textContent = `MEDF: ${doc.id}`;
+    document.getElementById('document-snapshot').textContent = doc.snapshot;
+
+    const content = document.getElementById('document-content');
+    content.innerHTML = '';
+
+    const observer = 'IntersectionObserver' in window
+      ? new IntersectionObserver(entries => {
+          entries.forEach(entry => {
+            if (entry.isIntersecting) {
+              observer.unobserve(entry.target);
+              this.loadChunk(Number(entry.target.dataset.chunk));
+            }
+          });
+        }, { rootMargin: '200% 0px' })
+      : null;
+
+    manifest.chunks.forEach((chunk, index) => {
+      const section = document.createElement('section');
+      section.className = 'medf-chunk';
+      section.dataset.chunk = index;
+      // Rough height estimate so the scrollbar is stable before loading
+      section.style.minHeight = `${Math.max(4, chunk.bytes / 60)}px`;
+      content.appendChild(section);
+      if (observer) {
+        observer.observe(section);
+      } else {
+        this.loadChunk(index);
+      }
+    });
+
+    this.generateTOC(manifest.blocks);
+    this.setTheme(this.options.theme);
+  }
+
+  /**
+   * Fetch, check and render a chunk (at most once)
+   */
+  loadChunk(index) {
+    if (!this.chunkLoads.has(index)) {
+      this.chunkLoads.set(index, this.fetchChunk(index));
+    }
+    return this.chunkLoads.get(index);
+  }
+
+  async fetchChunk(index) {
+    const chunk = this.bundle.manifest.chunks[index];
+    const response = await fetch(new URL(chunk.path, this.bundle.base));
+    if (!response.ok) {
+      throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+    }
+    const data = await response.arrayBuffer();
+
+    const section = document.querySelector(`.medf-chunk[data-chunk="${index}"]`);
+    section.innerHTML = '';
+    section.style.minHeight = '';
+
+    // A chunk that does not match its hash is never rendered
+    const actual = await this.sha256Hex(data);
+    if (actual !== chunk.sha256) {
+      this.verified = false;
+      this.updateVerificationStatus({
+        valid: false,
+        error: 'chunk_hash_mismatch',
+        chunk: chunk.path,
+        expected: chunk.sha256,
+        actual
+      });
+      const error = document.createElement('div');
+      error.className = 'medf-error';
+      error.textContent = `Chunk ${chunk.path} failed verification (chunk_hash_mismatch); its blocks are not shown.`;
+      section.appendChild(error);
+      return [];
+    }
+
+    // Pre-rendered HTML is trusted only from a chunk whose hash checked out
+    const { blocks } = JSON.parse(new TextDecoder().decode(data));
+    blocks.forEach(block => section.appendChild(this.renderBlock(block, { trustedHtml: true })));
+    return blocks;
+  }
+
+  /**
+   * Calculate SHA-256 with the Web Crypto API
+   */
+  async sha256Hex(data) {
+    const digest = await crypto.subtle.digest('SHA-256', data);
+    return Array.from(new Uint8Array(digest))
+      .map(b => b.toString(16).padStart(2, '0'))
+      .join('');
   }
 
   /**
@@ -35,7 +269,7 @@ class MEDFViewer {
       this.currentDocument = doc;
 
       if (this.options.verifyOnLoad) {
-        const result = this.verify(doc);
+        const result = await this.verify(doc);
         this.verified = result.valid;
         this.updateVerificationStatus(result);
       }
@@ -54,52 +288,97 @@ class MEDFViewer {
 
   /**
    * Verify document hashes
+   *
+   * Recomputes every block_hash and the doc_hash over canonical JSON
+   * (UTF-8, keys sorted by code point, no whitespace), exactly as
+   * `medf pack` does, with the algorithm named in doc_hash. Signatures
+   * are not checked in the browser.
    */
-  verify(doc) {
-    if (!doc.doc_hash) {
-      return { valid: false, error: 'No document hash' };
+  async verify(doc) {
+    if (!doc.doc_hash?.value) {
+      return { valid: false, error: 'no_document_hash' };
+    }
+    const algorithm = doc.doc_hash.algorithm || 'sha-256';
+    if (!MEDFViewer.HASH_ALGORITHMS.includes(algorithm)) {
+      return { valid: false, error: 'unsupported_hash_algorithm', algorithm };
     }
 
-    // Calculate document hash (excluding doc_hash and signature fields)
-    const docSrc = {
-      medf_version: doc.medf_version,
-      id: doc.id,
-      snapshot: doc.snapshot,
-      issuer: doc.issuer,
-      document_type: doc.document_type,
-      language: doc.language,
-      blocks: doc.blocks.map(b => ({
-        block_id: b.block_id,
-        role: b.role,
-        format: b.format,
-        text: b.text
-      }))
-    };
-
-    const canonical = JSON.stringify(docSrc, Object.keys(docSrc).sort());
-    const actualHash = this.sha256(canonical);
-    const expectedHash = doc.doc_hash.value;
+    for (const block of doc.blocks || []) {
+      if (!block.block_hash) continue;
+      const actual = await this.hashHex(algorithm, this.canonicalJSON({
+        block_id: block.block_id,
+        role: block.role,
+        format: block.format,
+        text: block.text
+      }));
+      if (actual !== block.block_hash) {
+        return {
+          valid: false,
+          error: 'block_hash_mismatch',
+          block_id: block.block_id,
+          expected: block.block_hash,
+          actual
+        };
+      }
+    }
 
+    // The document hash covers everything except doc_hash, signature and index
+    const docSrc = {};
+    for (const [key, value] of Object.entries(doc)) {
+      if (!['doc_hash', 'signature', 'index'].includes(key)) {
+        docSrc[key] = value;
+      }
+    }
+    const actual = await this.hashHex(algorithm, this.canonicalJSON(docSrc));
+    const expected = doc.doc_hash.value;
+    if (actual !== expected) {
+      return { valid: false, error: 'document_hash_mismatch', expected, actual };
+    }
     return {
-      valid: actualHash === expectedHash,
-      expected: expectedHash,
-      actual: actualHash
+      valid: true,
+      algorithm,
+      expected,
+      actual,
+      signature: doc.signature ? 'not_evaluated' : 'absent'
     };
   }
 
   /**
-   * Calculate SHA-256 hash
+   * Canonical JSON text, as medf.py's canonical_json produces it
    */
-  sha256(string) {
-    // Simple implementation for browser
-    // In production, use crypto.subtle.digest()
-    let hash = 0;
-    for (let i = 0; i < string.length; i++) {
-      const char = string.charCodeAt(i);
-      hash = ((hash << 5) - hash) + char;
-      hash = hash & hash;
+  canonicalJSON(value) {
+    if (Array.isArray(value)) {
+      return `[${value.map(v => this.canonicalJSON(v)).join(',')}]`;
     }
-    return Math.abs(hash).toString(16).padStart(64, '0');
+    if (value !== null && typeof value === 'object') {
+      // Code point order (UTF-16 order differs only for keys beyond the BMP)
+      const keys = Object.keys(value)
+        .filter(k => value[k] !== undefined)
+        .sort((a, b) => {
+          const x = Array.from(a, c => c.codePointAt(0));
+          const y = Array.from(b, c => c.codePointAt(0));
+          for (let i = 0; i < Math.min(x.length, y.length); i++) {
+            if (x[i] !== y[i]) return x[i] - y[i];
+          }
+          return x.length - y.length;
+        });
+      return `{${keys.map(k => `${JSON.stringify(k)}:${this.canonicalJSON(value[k])}`).join(',')}}`;
+    }
+    return JSON.stringify(value);
+  }
+
+  /**
+   * Hex digest of a string's UTF-8 bytes with a MEDF hash algorithm
+   */
+  async hashHex(algorithm, text) {
+    const data = new TextEncoder().encode(text);
+    if (algorithm === 'sha-256') {
+      return this.sha256Hex(data);
+    }
+    if (algorithm === 'blake2b-256') {
+      return blake2b256Hex(data);
+    }
+    throw new Error(`Unsupported hash algorithm: ${algorithm}`);
   }
 
   /**
@@ -130,8 +409,12 @@ class MEDFViewer {
 
   /**
    * Render a single block
+   *
+   * `block.html` is used only with trustedHtml (bundle chunks that matched
+   * their hash); it is outside block_hash, so documents loaded directly
+   * always render from `block.text`.
    */
-  renderBlock(block) {
+  renderBlock(block, { trustedHtml = false } = {}) {
     const article = document.createElement('article');
     article.className = 'medf-block';
     article.id = block.block_id;
@@ -148,7 +431,7 @@ class MEDFViewer {
     // Block content
     const content = document.createElement('div');
     content.className = 'medf-block-text';
-    content.innerHTML = this.renderMarkdown(block.text);
+    content.innerHTML = (trustedHtml && block.html) || this.renderMarkdown(block.text);
     article.appendChild(content);
 
     // Block actions
@@ -231,8 +514,15 @@ class MEDFViewer {
   /**
    * Navigate to block
    */
-  navigateToBlock(blockId) {
+  navigateToBlock(blockId, chunkLoaded = false) {
     const block = document.getElementById(blockId);
+    if (!block && this.bundle && !chunkLoaded) {
+      const entry = this.bundle.manifest.blocks.find(b => b.block_id === blockId);
+      if (entry) {
+        this.loadChunk(entry.chunk).then(() => this.navigateToBlock(blockId, true));
+      }
+      return;
+    }
     if (block) {
       block.scrollIntoView({ behavior: 'smooth', block: 'start' });
 
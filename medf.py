@@ -8,22 +8,241 @@ It does not decide what is correct, official, or authoritative.
 """
 
 import json
+import os
 import sys
+import base64
+import ctypes
+import ctypes.util
+import csv
+import functools
+import gzip
 import hashlib
+import http.client
+import io
+import itertools
+import queue
+import random
 import re
+import select
+import signal
+import socket
+import socketserver
+import sqlite3
+import struct
+import subprocess
+import tarfile
+import threading
+import time
+import tracemalloc
+import unicodedata
+import urllib.parse
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timezone
 
 try:
     from nacl.signing import SigningKey, VerifyKey
-    from nacl.exceptions import BadSignatureError
     HAS_NACL = True
 except ImportError:
     HAS_NACL = False
 
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 # Version
 VERSION = "0.2.1"
 
+# Hash algorithms by doc_hash.algorithm name.
+# block_hash values use the same algorithm as the document's doc_hash.
+HASH_ALGORITHMS = {
+    "sha-256": hashlib.sha256,
+    "blake2b-256": lambda data=b"": hashlib.blake2b(data, digest_size=32),
+}
+DEFAULT_HASH_ALGORITHM = "sha-256"
+
+# Texts longer than this many characters are canonicalized and hashed in
+# chunks of CANONICAL_CHUNK_CHARS instead of as one byte string
+STREAM_HASH_THRESHOLD = 1024 * 1024
+CANONICAL_CHUNK_CHARS = 256 * 1024
+
+# Documents with more text than this (characters) hash their blocks on a
+# thread pool; hashlib releases the GIL while hashing large buffers
+PARALLEL_HASH_THRESHOLD = 8 * 1024 * 1024
+
+# Signing agent: one JSON request/response per line over a Unix socket
+AGENT_SOCKET_ENV = "MEDF_AGENT_SOCK"
+AGENT_MAX_REQUEST_BYTES = 16 * 1024 * 1024
+# Every algorithm in HASH_ALGORITHMS produces a 256-bit digest
+HASH_VALUE_RE = re.compile(r"[a-f0-9]{64}")
+
+# Audit
+MEDF_SCHEMA_PATH = Path(__file__).resolve().parent / "spec" / "medf.schema.json"
+
+# Reverse reference index
+DEFAULT_REFS_INDEX = ".medf-refs.db"
+
+# Reference resolution (--fetch): cache index name, concurrent fetches, seconds
+REFERENCE_CACHE_DB = "fetches.db"
+DEFAULT_FETCH_JOBS = 16
+FETCH_TIMEOUT = 30
+
+# Near-duplicate detection: 64 MinHash values in 16 bands of 4 rows
+# puts the LSH candidate threshold near Jaccard 0.5, below DEDUP_THRESHOLD
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16
+SHINGLE_SIZE = 3
+DEDUP_THRESHOLD = 0.8
+DEFAULT_DEDUP_INDEX = ".medf-dedup.db"
+
+# Corpus store
+DEFAULT_CORPUS_DB = ".medf-corpus.db"
+
+# Transparency log of signed doc_hashes
+DEFAULT_TRANSPARENCY_LOG = ".medf-log.db"
+
+# Legacy migration
+MIGRATION_MANIFEST = "migration-manifest.ndjson"
+
+# Presentation index (index.presentation, outside doc_hash)
+PRESENTATION_INDEX_VERSION = 1
+INDEX_SUMMARY_CHARS = 160
+
+# Viewer bundle export
+VIEWER_ASSETS = Path(__file__).resolve().parent / "examples" / "viewer"
+VIEWER_CHUNK_BYTES = 256 * 1024
+
+# .medfpack archives
+ARCHIVE_MAGIC = b"MEDFPACK"
+ARCHIVE_VERSION = 1
+ARCHIVE_FOOTER = struct.Struct("<8sQQ")
+ARCHIVE_FOOTER_MAGIC = b"MEDFDIR\0"
+
+# CARv1 export: CIDv1 prefix (version 1, dag-json 0x0129, sha2-256, 32 bytes)
+CID_PREFIX = b"\x01\xa9\x02\x12\x20"
+CAR_MANIFEST_PAGE = 1000
+CAR_MANIFEST_VERSION = 1
+
+# Compressed documents (.medf.json.gz / .medf.json.zst), detected by magic bytes
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+DOCUMENT_SUFFIXES = (".medf.json", ".medf.json.gz", ".medf.json.zst")
+BUNDLE_TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+# Prometheus textfile metrics (histogram bucket upper bounds, seconds)
+METRICS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+METRICS_FAILURE_TYPES = ("block_hash_mismatch", "document_hash_mismatch", "signature_verification_failed")
+
+# Verification result cache
+DEFAULT_CACHE_MAX_ENTRIES = 1_000_000
+
+# JSON backend: orjson when installed, unless MEDF_JSON_BACKEND=stdlib
+JSON_BACKENDS = ("orjson", "stdlib")
+
+
+_canonical_dumps = functools.partial(
+    json.dumps, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+)
+
+
+def _default_json_backend() -> str:
+    requested = os.environ.get("MEDF_JSON_BACKEND", "orjson")
+    return "orjson" if requested == "orjson" and HAS_ORJSON else "stdlib"
+
+
+_json_backend = _default_json_backend()
+
+
+def json_backend(name: str = None) -> str:
+    """Return the JSON backend in use, switching to name first if given"""
+    global _json_backend
+    if name is not None:
+        if name not in JSON_BACKENDS or (name == "orjson" and not HAS_ORJSON):
+            raise ValueError(f"JSON backend not available: {name}")
+        _json_backend = name
+    return _json_backend
+
+
+_JSON_SCALARS = frozenset((str, bool, type(None)))
+_JSON_CONTAINERS = frozenset((dict, list, tuple))
+
+
+def _orjson_exact(obj) -> bool:
+    """
+    Whether orjson encodes obj byte-for-byte like the stdlib encoder.
+
+    They agree on strings (escaping included), booleans, null, 64-bit
+    integers, lists and objects. Floats are formatted differently (1e16
+    vs 1e+16) and orjson reads integer literals beyond 64 bits as floats,
+    so any other value sends the call to the stdlib. (Non-string keys
+    make orjson raise, which the callers also hand to the stdlib.)
+    Values are type-checked a container at a time, and a list of objects
+    (such as blocks) as one, so the check runs at C speed rather than a
+    Python step per value.
+    """
+    stack = [[obj]]
+    while stack:
+        children = stack.pop()
+        kinds = set(map(type, children))
+        if kinds <= _JSON_SCALARS:
+            continue
+        if kinds == {dict}:
+            values = itertools.chain.from_iterable(map(dict.values, children))
+            if not set(map(type, values)) <= _JSON_SCALARS:
+                stack.append(list(itertools.chain.from_iterable(map(dict.values, children))))
+            continue
+        for child in children:
+            kind = type(child)
+            if kind is dict:
+                stack.append(child.values())
+            elif kind is list or kind is tuple:
+                stack.append(child)
+            elif kind is int:
+                if not -(1 << 63) <= child < (1 << 64):
+                    return False
+            elif kind not in _JSON_SCALARS:
+                return False
+    return True
+
+
+def json_loads(data):
+    """
+    Parse JSON text or bytes with the current backend.
+
+    Input orjson rejects (NaN, lone surrogates, ...) and results holding
+    floats are parsed again by the stdlib, so the result always equals
+    json.loads(data) and errors are the stdlib's.
+    """
+    if _json_backend == "orjson":
+        try:
+            value = orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+        else:
+            if _orjson_exact(value):
+                return value
+    return json.loads(data)
+
+
+def json_dumps_indented(obj) -> bytes:
+    """UTF-8 bytes of json.dumps(obj, indent=2, ensure_ascii=False), via the current backend"""
+    if _json_backend == "orjson" and _orjson_exact(obj):
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
 
 def canonical_json(obj) -> bytes:
     """
@@ -37,7 +256,15 @@ def canonical_json(obj) -> bytes:
     - Sorted keys (lexical order)
     - No whitespace (separators=(",", ":"))
     - Unicode characters preserved (ensure_ascii=False)
+
+    With the orjson backend, values it encodes identically are encoded
+    by orjson; `medf bench json` checks the bytes match the stdlib's.
     """
+    if _json_backend == "orjson" and _orjson_exact(obj):
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+        except orjson.JSONEncodeError:
+            pass
     return json.dumps(
         obj,
         sort_keys=True,
@@ -46,11 +273,244 @@ def canonical_json(obj) -> bytes:
     ).encode("utf-8")
 
 
+def iter_canonical_json(obj):
+    """
+    Yield canonical_json(obj) as text pieces.
+
+    Long strings are escaped in bounded slices, so no piece is much
+    larger than CANONICAL_CHUNK_CHARS. Joining the pieces and encoding
+    to UTF-8 gives exactly canonical_json(obj).
+    """
+    if isinstance(obj, str):
+        if len(obj) <= CANONICAL_CHUNK_CHARS:
+            yield _canonical_dumps(obj)
+            return
+        # JSON string escaping is per code point, so slices escape independently
+        yield '"'
+        for i in range(0, len(obj), CANONICAL_CHUNK_CHARS):
+            yield _canonical_dumps(obj[i:i + CANONICAL_CHUNK_CHARS])[1:-1]
+        yield '"'
+    elif isinstance(obj, dict) and all(isinstance(k, str) for k in obj):
+        if all(_is_small_scalar(v) for v in obj.values()):
+            # Flat objects such as ordinary blocks: one C-level dump
+            yield _canonical_dumps(obj)
+            return
+        yield "{"
+        for i, key in enumerate(sorted(obj)):
+            if i:
+                yield ","
+            yield _canonical_dumps(key)
+            yield ":"
+            yield from iter_canonical_json(obj[key])
+        yield "}"
+    elif isinstance(obj, (list, tuple)):
+        yield "["
+        for i, item in enumerate(obj):
+            if i:
+                yield ","
+            yield from iter_canonical_json(item)
+        yield "]"
+    else:
+        yield _canonical_dumps(obj)
+
+
+def _is_small_scalar(value) -> bool:
+    if isinstance(value, str):
+        return len(value) <= CANONICAL_CHUNK_CHARS
+    return not isinstance(value, (dict, list, tuple))
+
+
+def hash_canonical_json(obj, algorithm: str = DEFAULT_HASH_ALGORITHM) -> str:
+    """
+    Hash canonical_json(obj) without building the whole byte string.
+
+    Pieces are fed to the hash in batches of about CANONICAL_CHUNK_CHARS
+    characters; the digest equals hash_hex(canonical_json(obj)).
+    """
+    if algorithm not in HASH_ALGORITHMS:
+        raise ValueError(f"unsupported hash algorithm: {algorithm}")
+    hasher = HASH_ALGORITHMS[algorithm]()
+    pending = []
+    size = 0
+    for piece in iter_canonical_json(obj):
+        pending.append(piece)
+        size += len(piece)
+        if size >= CANONICAL_CHUNK_CHARS:
+            hasher.update("".join(pending).encode("utf-8"))
+            pending = []
+            size = 0
+    hasher.update("".join(pending).encode("utf-8"))
+    return hasher.hexdigest()
+
+
 def sha256_hex(data: bytes) -> str:
     """Calculate SHA-256 hash and return as hex string"""
     return hashlib.sha256(data).hexdigest()
 
 
+def hash_hex(data: bytes, algorithm: str = DEFAULT_HASH_ALGORITHM) -> str:
+    """Calculate a hash with a registered algorithm and return as hex string"""
+    if algorithm not in HASH_ALGORITHMS:
+        raise ValueError(f"unsupported hash algorithm: {algorithm}")
+    return HASH_ALGORITHMS[algorithm](data).hexdigest()
+
+
+def document_hash_algorithm(doc: dict) -> str:
+    """The algorithm recorded in doc_hash, which also applies to block_hash"""
+    return doc.get("doc_hash", {}).get("algorithm", DEFAULT_HASH_ALGORITHM)
+
+
+def _decompressing_stream(raw):
+    """Wrap a binary stream so it yields document bytes, by magic number"""
+    magic = raw.peek(4)[:4] if hasattr(raw, "peek") else b""
+    if magic[:2] == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=raw, mode="rb")
+    if magic == ZSTD_MAGIC:
+        if not HAS_ZSTD:
+            raise ValueError("zstd-compressed document needs the zstandard package")
+        return zstandard.ZstdDecompressor().stream_reader(raw)
+    return raw
+
+
+def _read_decompressed(raw) -> bytes:
+    """
+    Read all document bytes from raw into memory. Both JSON backends
+    parse a complete buffer, so reads are not streamed: peak memory is
+    the decompressed size. Truncated or corrupt compressed data raises
+    ValueError, like malformed JSON, so callers that skip unreadable
+    documents need no codec-specific exceptions.
+    """
+    try:
+        return _decompressing_stream(raw).read()
+    except (EOFError, zlib.error) as e:
+        raise ValueError(f"corrupt compressed document: {e}") from e
+    except Exception as e:
+        if HAS_ZSTD and isinstance(e, zstandard.ZstdError):
+            raise ValueError(f"corrupt compressed document: {e}") from e
+        raise
+
+
+def read_document(path: Path) -> dict:
+    """Load a document, gunzipping / unzstding it in memory if compressed"""
+    with open(path, "rb") as raw:
+        return json_loads(_read_decompressed(raw))
+
+
+def read_document_bytes(path: Path) -> bytes:
+    """The document's JSON bytes, decompressed if necessary"""
+    with open(path, "rb") as raw:
+        return _read_decompressed(raw)
+
+
+def loads_document(data: bytes) -> dict:
+    """Parse document bytes that may be compressed (e.g. a git blob)"""
+    return json_loads(_read_decompressed(io.BufferedReader(io.BytesIO(data))))
+
+
+def document_compression(path: Path) -> str:
+    """
+    Compression to write path with: that of the existing file, else
+    what its suffix asks for ("gzip", "zstd" or None).
+    """
+    try:
+        with open(path, "rb") as f:
+            magic = f.read(4)
+        if magic[:2] == GZIP_MAGIC:
+            return "gzip"
+        if magic == ZSTD_MAGIC:
+            return "zstd"
+        return None
+    except OSError:
+        pass
+    if path.name.endswith(".gz"):
+        return "gzip"
+    if path.name.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+def write_document(path: Path, doc: dict, compression: str = "auto"):
+    """
+    Write a document as indented JSON, compressed like the file it
+    replaces (or as its suffix says). Compressed output is streamed from
+    the serializer into the compressor (a block at a time with orjson).
+    Hashes cover canonical JSON, so the on-disk encoding never affects
+    verification.
+
+    The file is written next to path and renamed over it, so readers
+    (and watchers) never see a partially written document.
+    """
+    if compression == "auto":
+        compression = document_compression(path)
+    if compression == "zstd" and not HAS_ZSTD:
+        raise ValueError("writing zstd documents needs the zstandard package")
+
+    target = Path(os.path.realpath(path))
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "xb") as raw:
+            _write_document_stream(raw, doc, compression)
+        try:
+            os.chmod(tmp, os.stat(target).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp, target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _orjson_indented_pieces(doc: dict):
+    """
+    json_dumps_indented(doc) in pieces: one per top-level member and one
+    per block, so a compressed write holds at most one block's JSON.
+    """
+    dumps = functools.partial(orjson.dumps, option=orjson.OPT_INDENT_2)
+    if not doc:
+        yield b"{}"
+        return
+    for i, (key, value) in enumerate(doc.items()):
+        yield (b",\n  " if i else b"{\n  ") + dumps(key) + b": "
+        if key == "blocks" and type(value) is list and value:
+            for j, block in enumerate(value):
+                yield (b",\n    " if j else b"[\n    ") + dumps(block).replace(b"\n", b"\n    ")
+            yield b"\n  ]"
+        else:
+            # JSON strings hold no raw newlines, so this only re-indents
+            yield dumps(value).replace(b"\n", b"\n  ")
+    yield b"\n}"
+
+
+def _write_document_stream(raw, doc: dict, compression: str):
+    if compression is None:
+        raw.write(json_dumps_indented(doc))
+        return
+
+    def compressor():
+        if compression == "gzip":
+            # mtime=0 keeps output reproducible for identical documents
+            return gzip.GzipFile(fileobj=raw, mode="wb", mtime=0)
+        return zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+
+    if (_json_backend == "orjson" and type(doc) is dict
+            and all(type(k) is str for k in doc) and _orjson_exact(doc)):
+        try:
+            with compressor() as stream:
+                for piece in _orjson_indented_pieces(doc):
+                    stream.write(piece)
+            return
+        except orjson.JSONEncodeError:
+            # e.g. a lone surrogate: start over with the stdlib encoder
+            raw.seek(0)
+            raw.truncate()
+    with io.TextIOWrapper(compressor(), encoding="utf-8") as text:
+        json.dump(doc, text, indent=2, ensure_ascii=False)
+
+
+def is_document_path(name: str) -> bool:
+    return name.endswith(DOCUMENT_SUFFIXES)
+
+
 def slugify(text: str) -> str:
     """
     Convert text to a valid block_id.
@@ -67,23 +527,12 @@ def slugify(text: str) -> str:
     return text
 
 
-def cmd_import(markdown_path: Path, doc_type: str = "philosophy", auto_pack: bool = True):
+def markdown_to_document(content: str, doc_id: str, doc_type: str = "philosophy") -> dict:
     """
-    Import a Markdown file and convert to MEDF format.
-
-    Splits the Markdown file by ## headers and creates
-    a MEDF document with one block per section.
+    Convert Markdown text to an unpacked MEDF document.
 
-    By default, automatically runs pack to generate hashes.
-    Use --no-pack to skip hashing.
+    Splits the text by ## headers, one block per section.
     """
-    if not markdown_path.exists():
-        print(f"[Error] File not found: {markdown_path}")
-        sys.exit(1)
-
-    # Read Markdown content
-    content = markdown_path.read_text(encoding="utf-8")
-
     # Extract title from first # header
     title = None
     first_line = content.split('\n')[0]
@@ -92,7 +541,7 @@ def cmd_import(markdown_path: Path, doc_type: str = "philosophy", auto_pack: boo
 
     # Split by ## headers
     sections = []
-    current_section = {"text": "", "title": None}
+    current_section = {"lines": [], "title": None}
 
     for line in content.split('\n'):
         if line.startswith('## '):
@@ -102,10 +551,10 @@ def cmd_import(markdown_path: Path, doc_type: str = "philosophy", auto_pack: boo
             # Start new section
             current_section = {
                 "title": line[3:].strip(),
-                "text": ""
+                "lines": []
             }
         else:
-            current_section["text"] += line + '\n'
+            current_section["lines"].append(line)
 
     # Don't forget the last section
     if current_section["title"] is not None:
@@ -113,15 +562,13 @@ def cmd_import(markdown_path: Path, doc_type: str = "philosophy", auto_pack: boo
 
     # If no ## headers found, treat entire file as one block
     if not sections:
-        sections = [{"title": title or "main", "text": content}]
+        sections = [{"title": title or "main", "lines": [content]}]
 
-    # Create MEDF document
-    doc_id = slugify(markdown_path.stem)
     blocks = []
 
     for section in sections:
         block_id = slugify(section["title"])
-        text = section["text"].strip()
+        text = '\n'.join(section["lines"]).strip()
 
         blocks.append({
             "block_id": block_id,
@@ -130,7 +577,7 @@ def cmd_import(markdown_path: Path, doc_type: str = "philosophy", auto_pack: boo
             "text": text
         })
 
-    doc = {
+    return {
         "medf_version": "0.2.1",
         "id": doc_id,
         "snapshot": datetime.now(timezone.utc).isoformat(),
@@ -139,12 +586,37 @@ def cmd_import(markdown_path: Path, doc_type: str = "philosophy", auto_pack: boo
         "blocks": blocks
     }
 
+
+def cmd_import(markdown_path: Path, doc_type: str = "philosophy", auto_pack: bool = True,
+               algorithm: str = None, compression: str = None):
+    """
+    Import a Markdown file and convert to MEDF format.
+
+    Splits the Markdown file by ## headers and creates
+    a MEDF document with one block per section.
+
+    By default, automatically runs pack to generate hashes.
+    Use --no-pack to skip hashing. With compression ("gzip" or "zstd")
+    the output is written as .medf.json.gz / .medf.json.zst.
+    """
+    if not markdown_path.exists():
+        print(f"[Error] File not found: {markdown_path}")
+        sys.exit(1)
+
+    # Read Markdown content
+    content = markdown_path.read_text(encoding="utf-8")
+
+    # Create MEDF document
+    doc = markdown_to_document(content, slugify(markdown_path.stem), doc_type)
+    blocks = doc["blocks"]
+
     # Output to JSON
     output_path = markdown_path.with_suffix('.medf.json')
-    output_path.write_text(
-        json.dumps(doc, indent=2, ensure_ascii=False),
-        encoding="utf-8"
-    )
+    if compression == "gzip":
+        output_path = output_path.with_name(output_path.name + ".gz")
+    elif compression == "zstd":
+        output_path = output_path.with_name(output_path.name + ".zst")
+    write_document(output_path, doc, compression)
 
     print(f"[OK] Imported {markdown_path.name}")
     print(f"  Output: {output_path}")
@@ -153,9 +625,9 @@ def cmd_import(markdown_path: Path, doc_type: str = "philosophy", auto_pack: boo
     # Auto-pack by default
     if auto_pack:
         print()
-        cmd_pack(output_path)
+        cmd_pack(output_path, algorithm)
         # Reload to get doc_hash
-        packed_doc = json.loads(output_path.read_text(encoding="utf-8"))
+        packed_doc = read_document(output_path)
         print()
         print("Verified and ready!")
         print(f"  Document hash: {packed_doc['doc_hash']['value'][:16]}...")
@@ -188,388 +660,4521 @@ def cmd_init():
     print(json.dumps(doc, indent=2, ensure_ascii=False))
 
 
-def cmd_pack(path: Path):
-    """
-    Generate hashes for all blocks and the document.
-
-    This command creates a verifiable snapshot.
-    It does NOT freeze your workflow.
-    You can always create a new version by repacking.
-    """
-    doc = json.loads(path.read_text(encoding="utf-8"))
+def compute_block_hash(block: dict, algorithm: str = DEFAULT_HASH_ALGORITHM) -> str:
+    """Hash the immutable fields of a block"""
+    block_src = {
+        "block_id": block["block_id"],
+        "role": block["role"],
+        "format": block["format"],
+        "text": block["text"],
+    }
+    if isinstance(block_src["text"], str) and len(block_src["text"]) > STREAM_HASH_THRESHOLD:
+        return hash_canonical_json(block_src, algorithm)
+    return hash_hex(canonical_json(block_src), algorithm)
 
-    # Calculate block_hash
-    for block in doc.get("blocks", []):
-        block_src = {
-            "block_id": block["block_id"],
-            "role": block["role"],
-            "format": block["format"],
-            "text": block["text"],
-        }
-        block["block_hash"] = sha256_hex(canonical_json(block_src))
 
-    # Calculate doc_hash (excluding index/signature)
+def compute_doc_hash(doc: dict, algorithm: str = DEFAULT_HASH_ALGORITHM) -> str:
+    """Hash the document, excluding index/signature"""
     doc_src = {
         k: v for k, v in doc.items()
         if k not in ("doc_hash", "signature", "index")
     }
-    doc["doc_hash"] = {
-        "algorithm": "sha-256",
-        "value": sha256_hex(canonical_json(doc_src))
-    }
+    if _text_size(doc.get("blocks", [])) > STREAM_HASH_THRESHOLD:
+        return hash_canonical_json(doc_src, algorithm)
+    return hash_hex(canonical_json(doc_src), algorithm)
+
 
-    # Write updated document
-    path.write_text(
-        json.dumps(doc, indent=2, ensure_ascii=False),
-        encoding="utf-8"
+def _text_size(blocks: list) -> int:
+    return sum(
+        len(b["text"]) for b in blocks
+        if isinstance(b, dict) and isinstance(b.get("text"), str)
     )
 
-    print(f"[OK] Hashes generated: {path}")
-    print(f"  Blocks: {len(doc['blocks'])}")
-    print(f"  Document hash: {doc['doc_hash']['value'][:16]}...")
+
+def _hash_block_batch(blocks: list, algorithm: str) -> tuple:
+    start = time.perf_counter()
+    hashes = [compute_block_hash(block, algorithm) for block in blocks]
+    return hashes, time.perf_counter() - start
 
 
-def cmd_verify(path: Path, explain: bool = False, json_output: bool = False):
+def iter_block_hashes(blocks: list, algorithm: str = DEFAULT_HASH_ALGORITHM,
+                      threads: int = None, timings: dict = None):
     """
-    Verify block hashes, document hash, and signature.
+    Yield compute_block_hash for each block, in order.
 
-    Verification checks integrity and consistency.
-    Trust decisions are not evaluated.
+    Documents above PARALLEL_HASH_THRESHOLD are hashed on a thread pool;
+    threads=1 forces serial hashing. Serial hashing is lazy, so a caller
+    that stops at the first mismatch hashes nothing after it.
+    With timings, records the thread count and the summed per-thread
+    hashing time (block_cpu_s).
     """
-    doc = json.loads(path.read_text(encoding="utf-8"))
+    if threads is None:
+        threads = min(32, os.cpu_count() or 1) if _text_size(blocks) > PARALLEL_HASH_THRESHOLD else 1
+    threads = max(1, min(threads, len(blocks)))
+    if timings is not None:
+        timings["threads"] = threads
+    if threads == 1:
+        return (compute_block_hash(block, algorithm) for block in blocks)
 
-    # Verify blocks
-    failed_block = None
-    for block in doc.get("blocks", []):
-        expected = block.get("block_hash")
-        if not expected:
-            continue
+    # Batches of roughly equal text size, several per thread
+    target = _text_size(blocks) // (threads * 4) + 1
+    batches = [[]]
+    size = 0
+    for block in blocks:
+        if size >= target:
+            batches.append([])
+            size = 0
+        batches[-1].append(block)
+        size += len(block.get("text") or "") if isinstance(block, dict) else 0
 
-        block_src = {
-            "block_id": block["block_id"],
-            "role": block["role"],
-            "format": block["format"],
-            "text": block["text"],
-        }
-        actual = sha256_hex(canonical_json(block_src))
-        if expected != actual:
-            failed_block = {
-                "block_id": block["block_id"],
-                "expected": expected,
-                "actual": actual
-            }
-            break
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(functools.partial(_hash_block_batch, algorithm=algorithm), batches))
+    if timings is not None:
+        timings["block_cpu_s"] = sum(seconds for _, seconds in results)
+    return iter([h for hashes, _ in results for h in hashes])
 
-    if failed_block:
-        result = {
-            "result": "error",
-            "error": "block_hash_mismatch",
-            "block_id": failed_block["block_id"],
-            "expected": f"sha256:{failed_block['expected'][:16]}...",
-            "actual": f"sha256:{failed_block['actual'][:16]}..."
-        }
-        if json_output:
-            print(json.dumps(result, indent=2))
-        else:
-            print("✖ Block hash mismatch")
-            print()
-            print("Details:")
-            print(f"  block_id: {failed_block['block_id']}")
-            print(f"  expected: sha256:{failed_block['expected'][:16]}...")
-            print(f"  actual:   sha256:{failed_block['actual'][:16]}...")
-            print()
-            print("The text content of this block has been altered.")
-        return
 
-    # Verify document hash
-    if "doc_hash" not in doc:
-        if json_output:
-            print(json.dumps({"result": "error", "error": "no_document_hash"}, indent=2))
-        else:
-            print("✖ No document hash found")
-        return
+def pack_document(doc: dict, algorithm: str = None, threads: int = None,
+                  timings: dict = None) -> dict:
+    """
+    Set block_hash on every block and doc_hash on the document.
 
-    expected = doc["doc_hash"]["value"]
-    doc_src = {
-        k: v for k, v in doc.items()
-        if k not in ("doc_hash", "signature", "index")
-    }
-    actual = sha256_hex(canonical_json(doc_src))
-    if expected != actual:
-        if json_output:
-            print(json.dumps({"result": "error", "error": "document_hash_mismatch"}, indent=2))
-        else:
-            print("✖ Document hash mismatch")
-            print()
-            print("The document structure has been altered.")
-        return
+    Without an explicit algorithm, a repacked document keeps the one
+    already recorded in its doc_hash.
+    """
+    algorithm = algorithm or document_hash_algorithm(doc)
+    blocks = doc.get("blocks", [])
 
-    # Verify signature (if present)
-    has_signature = "signature" in doc
-    signature_valid = None
+    start = time.perf_counter()
+    for block, block_hash in zip(blocks, iter_block_hashes(blocks, algorithm, threads, timings)):
+        block["block_hash"] = block_hash
+    blocks_done = time.perf_counter()
 
-    if has_signature:
-        if not HAS_NACL:
-            signature_valid = "skipped"
-        else:
-            try:
-                sig = doc["signature"]
-                public_key = VerifyKey(sig["public_key"].encode("utf-8"))
-                hash_value = doc["doc_hash"]["value"].encode("utf-8")
-                public_key.verify(hash_value, sig["value"].encode("utf-8"))
-                signature_valid = True
-            except Exception:
-                if json_output:
-                    print(json.dumps({"result": "error", "error": "signature_verification_failed"}, indent=2))
-                else:
-                    print("✖ Signature verification failed")
-                    print()
-                    print("The signature does not match the document hash.")
-                return
+    doc["doc_hash"] = {
+        "algorithm": algorithm,
+        "value": compute_doc_hash(doc, algorithm)
+    }
 
-    # Success output
-    if json_output:
-        result = {
-            "result": "ok",
-            "integrity": "verified",
-            "checked": {
-                "document_hash": True,
-                "block_hashes": True
-            }
-        }
+    if timings is not None:
+        timings["block_hashes_s"] = blocks_done - start
+        timings.setdefault("block_cpu_s", timings["block_hashes_s"])
+        timings["doc_hash_s"] = time.perf_counter() - blocks_done
+    return doc
 
-        if has_signature and signature_valid is True:
-            result["reproducibility"] = "verified"
-            result["signature"] = {
-                "present": True,
-                "valid": True
-            }
-            result["trust_decision"] = "not_evaluated"
-        elif has_signature and signature_valid == "skipped":
-            result["signature"] = {
-                "present": True,
-                "valid": None
-            }
-            result["trust_decision"] = "not_evaluated"
-        else:
-            result["signature"] = {
-                "present": False
-            }
-            result["trust_decision"] = "not_applicable"
 
-        print(json.dumps(result, indent=2))
-    else:
-        print("✔ Document hash matches")
-        print("✔ All block hashes match")
+class RunMetrics:
+    """
+    Counters and latency histograms for one verify / pack run, written
+    in the Prometheus text format for node_exporter's textfile collector.
+    """
 
-        if has_signature and signature_valid is True:
-            print("✔ Signature is cryptographically valid")
-            print()
-            print("Summary:")
-            print("  Integrity: verified")
-            print("  Reproducibility: verified")
-            print("  Trust decision: not evaluated")
-        elif has_signature and signature_valid == "skipped":
-            print("⚠ Signature present (PyNaCl not installed)")
-            print()
-            print("Summary:")
-            print("  Integrity: verified")
-            print("  Signature: present (not verified)")
-            print("  Trust decision: not evaluated")
+    def __init__(self, command: str):
+        self.command = command
+        self.started = time.time()
+        self.documents = {"ok": 0, "error": 0}
+        self.failures = dict.fromkeys(METRICS_FAILURE_TYPES, 0)
+        self.cache_hits = 0
+        self.bytes_hashed = 0
+        self.stages = {}
+
+    def observe(self, result: dict = None, size: int = 0, timings: dict = None, cached: bool = False):
+        """Record one document: its result, bytes hashed and stage timings"""
+        if result is not None:
+            outcome = "ok" if result["result"] == "ok" else "error"
+            self.documents[outcome] += 1
+            if outcome == "error":
+                self.failures[result["error"]] = self.failures.get(result["error"], 0) + 1
         else:
-            print()
-            print("Summary:")
-            print("  Integrity: verified")
-            print("  Signature: not present")
-            print("  Trust decision: not applicable")
+            self.documents["ok"] += 1
+        if cached:
+            self.cache_hits += 1
+        self.bytes_hashed += size
+        for key, seconds in (timings or {}).items():
+            if key.endswith("_s") and key != "block_cpu_s":
+                # [cumulative bucket counts, sum, count]
+                stage = self.stages.setdefault(key[:-2], [[0] * len(METRICS_BUCKETS), 0.0, 0])
+                for i, bound in enumerate(METRICS_BUCKETS):
+                    if seconds <= bound:
+                        stage[0][i] += 1
+                stage[1] += seconds
+                stage[2] += 1
 
-        if explain:
-            print()
-            print("="*60)
-            if has_signature and signature_valid is True:
-                print("This MEDF document is verifiable because:")
-                print("- Each content block matches its recorded hash")
-                print("- The document hash matches the signed value")
-                print("- The signature matches the embedded public key")
-            else:
-                print("This MEDF document is verifiable because:")
-                print("- Each content block matches its recorded hash")
-                print("- The document hash is computable and reproducible")
+    def render(self) -> str:
+        command = f'command="{self.command}"'
+        lines = [
+            "# HELP medf_run_timestamp_seconds Unix time the run finished.",
+            "# TYPE medf_run_timestamp_seconds gauge",
+            f"medf_run_timestamp_seconds{{{command}}} {time.time():.3f}",
+            "# HELP medf_run_duration_seconds Wall-clock duration of the run.",
+            "# TYPE medf_run_duration_seconds gauge",
+            f"medf_run_duration_seconds{{{command}}} {time.time() - self.started:.6f}",
+            "# HELP medf_documents_total Documents processed, by result.",
+            "# TYPE medf_documents_total counter",
+        ]
+        lines += [
+            f'medf_documents_total{{{command},result="{outcome}"}} {count}'
+            for outcome, count in self.documents.items()
+        ]
+        lines += [
+            "# HELP medf_failures_total Failed documents, by error.",
+            "# TYPE medf_failures_total counter",
+        ]
+        lines += [
+            f'medf_failures_total{{{command},error="{error}"}} {count}'
+            for error, count in sorted(self.failures.items())
+        ]
+        lines += [
+            "# HELP medf_cache_hits_total Results served from the verification cache.",
+            "# TYPE medf_cache_hits_total counter",
+            f"medf_cache_hits_total{{{command}}} {self.cache_hits}",
+            "# HELP medf_bytes_hashed_total Document JSON bytes (decompressed) loaded and hashed.",
+            "# TYPE medf_bytes_hashed_total counter",
+            f"medf_bytes_hashed_total{{{command}}} {self.bytes_hashed}",
+            "# HELP medf_stage_duration_seconds Per-document latency of each stage.",
+            "# TYPE medf_stage_duration_seconds histogram",
+        ]
+        for stage, (counts, total, count) in sorted(self.stages.items()):
+            labels = f'{command},stage="{stage}"'
+            for bound, bucket in zip(METRICS_BUCKETS, counts):
+                lines.append(f'medf_stage_duration_seconds_bucket{{{labels},le="{bound:g}"}} {bucket}')
+            lines.append(f'medf_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"medf_stage_duration_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"medf_stage_duration_seconds_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
 
-            print()
-            print("This verification does NOT evaluate:")
-            print("- Who owns the signing key" if has_signature else "- Key ownership or authority")
-            print("- Whether the signer is authoritative" if has_signature else "- Content authorship")
-            print("- Whether the content is correct")
-            print("="*60)
+    def write(self, path: Path):
+        """Write atomically, so the collector never reads a partial file"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+        tmp_path.write_text(self.render(), encoding="utf-8")
+        os.replace(tmp_path, path)
 
 
+def _print_timings(timings: dict):
+    """Print stage timings collected by pack/verify"""
+    speedup = timings["block_cpu_s"] / timings["block_hashes_s"] if timings["block_hashes_s"] else 1.0
+    print()
+    print("Timings:")
+    print(f"  load:           {timings['load_s'] * 1000:9.1f} ms")
+    print(f"  block hashes:   {timings['block_hashes_s'] * 1000:9.1f} ms "
+          f"({timings['threads']} threads, {speedup:.1f}x speedup)")
+    print(f"  document hash:  {timings['doc_hash_s'] * 1000:9.1f} ms")
+    if "write_s" in timings:
+        print(f"  write:          {timings['write_s'] * 1000:9.1f} ms")
 
-def cmd_sign(path: Path, key_path: Path):
-    """
-    Attach a cryptographic signature to the document hash.
 
-    A signature proves integrity, not authority.
+def cmd_pack(path: Path, algorithm: str = None, threads: int = None,
+             show_timings: bool = False, metrics: "RunMetrics" = None):
     """
-    if not HAS_NACL:
-        print("[Error] PyNaCl is required for signing")
-        print("Install: pip install pynacl")
-        sys.exit(1)
+    Generate hashes for all blocks and the document.
 
-    doc = json.loads(path.read_text(encoding="utf-8"))
+    This command creates a verifiable snapshot.
+    It does NOT freeze your workflow.
+    You can always create a new version by repacking.
 
-    # Read private key
+    Returns False (after recording the failure in metrics) if the
+    document could not be read, packed or written.
+    """
+    timings = {}
+    start = time.perf_counter()
+    stage = "unreadable_document"
     try:
-        key = SigningKey.load(key_path.read_bytes())
-    except Exception as e:
-        print(f"[Error] Failed to load private key: {e}")
-        sys.exit(1)
+        data = read_document_bytes(path)
+        doc = json_loads(data)
+        timings["load_s"] = time.perf_counter() - start
 
-    # Sign doc_hash.value
-    if "doc_hash" not in doc:
-        print("[Error] No doc_hash found to sign")
-        print("Run 'medf pack' first")
-        sys.exit(1)
+        stage = "malformed_document"
+        pack_document(doc, algorithm, threads=threads, timings=timings)
 
-    hash_value = doc["doc_hash"]["value"]
-    message = hash_value.encode("utf-8")
+        # Write updated document
+        stage = "write_failed"
+        start = time.perf_counter()
+        write_document(path, doc)
+        timings["write_s"] = time.perf_counter() - start
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        if metrics is not None:
+            metrics.observe({"result": "error", "error": stage}, 0, timings)
+        print(f"[Error] Failed to pack {path} ({stage}): {e}")
+        return False
+    if metrics is not None:
+        metrics.observe({"result": "ok"}, len(data), timings)
 
-    # Sign
-    signature_bytes = key.sign(message)
-    signature_value = signature_bytes.decode("utf-8")
+    print(f"[OK] Hashes generated: {path}")
+    print(f"  Blocks: {len(doc['blocks'])}")
+    print(f"  Document hash: {doc['doc_hash']['value'][:16]}...")
+    if show_timings:
+        _print_timings(timings)
+    return True
 
-    # Get public key
-    public_key = key.verify_key
 
-    doc["signature"] = {
-        "algorithm": "ed25519",
-        "value": signature_value,
-        "public_key": public_key.encode().decode("utf-8"),
+def verify_document(doc: dict, threads: int = None, timings: dict = None) -> dict:
+    """
+    Verify block hashes, document hash, and signature of a loaded document.
+
+    Returns the result object printed by `medf verify --json`.
+    """
+    algorithm = document_hash_algorithm(doc)
+    if algorithm not in HASH_ALGORITHMS:
+        return {"result": "error", "error": "unsupported_hash_algorithm", "algorithm": algorithm}
+    prefix = algorithm.replace("-", "")
+
+    # Verify blocks
+    start = time.perf_counter()
+    hashed = [block for block in doc.get("blocks", []) if block.get("block_hash")]
+    for block, actual in zip(hashed, iter_block_hashes(hashed, algorithm, threads, timings)):
+        expected = block["block_hash"]
+        if expected != actual:
+            return {
+                "result": "error",
+                "error": "block_hash_mismatch",
+                "block_id": block["block_id"],
+                "expected": f"{prefix}:{expected[:16]}...",
+                "actual": f"{prefix}:{actual[:16]}..."
+            }
+
+    blocks_done = time.perf_counter()
+
+    # Verify document hash
+    if "doc_hash" not in doc:
+        return {"result": "error", "error": "no_document_hash"}
+
+    doc_hash_matches = doc["doc_hash"]["value"] == compute_doc_hash(doc, algorithm)
+    if timings is not None:
+        timings["block_hashes_s"] = blocks_done - start
+        timings.setdefault("block_cpu_s", timings["block_hashes_s"])
+        timings["doc_hash_s"] = time.perf_counter() - blocks_done
+    if not doc_hash_matches:
+        return {"result": "error", "error": "document_hash_mismatch"}
+
+    # Verify signature (if present)
+    result = {
+        "result": "ok",
+        "integrity": "verified",
+        "checked": {
+            "document_hash": True,
+            "block_hashes": True
+        }
+    }
+
+    if "signature" not in doc:
+        result["signature"] = {
+            "present": False
+        }
+        result["trust_decision"] = "not_applicable"
+        return result
+
+    if not HAS_NACL:
+        result["signature"] = {
+            "present": True,
+            "valid": None
+        }
+        result["trust_decision"] = "not_evaluated"
+        return result
+
+    try:
+        sig = doc["signature"]
+        public_key = VerifyKey(base64.b64decode(sig["public_key"]))
+        hash_value = doc["doc_hash"]["value"].encode("utf-8")
+        public_key.verify(hash_value, base64.b64decode(sig["value"]))
+    except Exception:
+        return {"result": "error", "error": "signature_verification_failed"}
+
+    result["reproducibility"] = "verified"
+    result["signature"] = {
+        "present": True,
+        "valid": True
+    }
+    result["trust_decision"] = "not_evaluated"
+    return result
+
+
+def cmd_verify(path: Path, explain: bool = False, json_output: bool = False,
+               cache: "VerifyCache" = None, threads: int = None, show_timings: bool = False,
+               metrics_path: Path = None, cache_max_entries: int = DEFAULT_CACHE_MAX_ENTRIES) -> dict:
+    """
+    Verify block hashes, document hash, and signature.
+
+    Verification checks integrity and consistency.
+    Trust decisions are not evaluated.
+    Returns the result so the caller can set the exit status.
+    """
+    identity = result = None
+    if cache is not None:
+        identity, result = cache.lookup(path)
+    timings = {}
+    size = 0
+    cached = result is not None
+    if result is None:
+        start = time.perf_counter()
+        data = read_document_bytes(path)
+        doc = json_loads(data)
+        size = len(data)
+        timings["load_s"] = time.perf_counter() - start
+        result = verify_document(doc, threads=threads, timings=timings)
+        if cache is not None:
+            cache.store(identity, result)
+    if cache is not None:
+        cache.prune(cache_max_entries)
+        cache.close()
+    if metrics_path:
+        metrics = RunMetrics("verify")
+        metrics.observe(result, size, timings, cached=cached)
+        metrics.write(metrics_path)
+    show_timings = show_timings and "doc_hash_s" in timings
+
+    if json_output and show_timings:
+        result = dict(result, timings={k: round(v, 6) for k, v in timings.items()})
+    if json_output:
+        print(json.dumps(result, indent=2))
+        return result
+
+    error = result.get("error")
+    if error == "unsupported_hash_algorithm":
+        print(f"✖ Unsupported hash algorithm: {result['algorithm']}")
+        print()
+        print(f"Supported: {', '.join(HASH_ALGORITHMS)}")
+        return result
+    if error == "block_hash_mismatch":
+        print("✖ Block hash mismatch")
+        print()
+        print("Details:")
+        print(f"  block_id: {result['block_id']}")
+        print(f"  expected: {result['expected']}")
+        print(f"  actual:   {result['actual']}")
+        print()
+        print("The text content of this block has been altered.")
+        return result
+    if error == "no_document_hash":
+        print("✖ No document hash found")
+        return result
+    if error == "document_hash_mismatch":
+        print("✖ Document hash mismatch")
+        print()
+        print("The document structure has been altered.")
+        return result
+    if error == "signature_verification_failed":
+        print("✖ Signature verification failed")
+        print()
+        print("The signature does not match the document hash.")
+        return result
+
+    signature = result["signature"]
+    has_signature = signature["present"]
+    signature_valid = signature.get("valid")
+
+    print("✔ Document hash matches")
+    print("✔ All block hashes match")
+
+    if has_signature and signature_valid is True:
+        print("✔ Signature is cryptographically valid")
+        print()
+        print("Summary:")
+        print("  Integrity: verified")
+        print("  Reproducibility: verified")
+        print("  Trust decision: not evaluated")
+    elif has_signature:
+        print("⚠ Signature present (PyNaCl not installed)")
+        print()
+        print("Summary:")
+        print("  Integrity: verified")
+        print("  Signature: present (not verified)")
+        print("  Trust decision: not evaluated")
+    else:
+        print()
+        print("Summary:")
+        print("  Integrity: verified")
+        print("  Signature: not present")
+        print("  Trust decision: not applicable")
+
+    if explain:
+        print()
+        print("="*60)
+        if has_signature and signature_valid is True:
+            print("This MEDF document is verifiable because:")
+            print("- Each content block matches its recorded hash")
+            print("- The document hash matches the signed value")
+            print("- The signature matches the embedded public key")
+        else:
+            print("This MEDF document is verifiable because:")
+            print("- Each content block matches its recorded hash")
+            print("- The document hash is computable and reproducible")
+
+        print()
+        print("This verification does NOT evaluate:")
+        print("- Who owns the signing key" if has_signature else "- Key ownership or authority")
+        print("- Whether the signer is authoritative" if has_signature else "- Content authorship")
+        print("- Whether the content is correct")
+        print("="*60)
+
+    if show_timings:
+        _print_timings(timings)
+    return result
+
+
+class VerifyCache:
+    """
+    On-disk cache of verification results (SQLite).
+
+    A cached result is reused only while the file's path, size, mtime,
+    inode and content fingerprint are all unchanged; anything else is
+    verified again. Results are discarded when the medf version changes.
+    """
+
+    FINGERPRINT_SAMPLE = 64 * 1024
+    TABLE = "verify_cache"
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                fingerprint TEXT NOT NULL,
+                result TEXT NOT NULL,
+                verified_at TEXT NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS {self.TABLE}_last_used ON {self.TABLE} (last_used);
+        """)
+        version_key = "version" if self.TABLE == "verify_cache" else f"{self.TABLE}_version"
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (version_key,)).fetchone()
+        if row is None or row[0] != VERSION:
+            self._db.execute(f"DELETE FROM {self.TABLE}")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (version_key, VERSION))
+        self.hits = 0
+
+    def _fingerprint(self, path: Path, size: int) -> str:
+        """Hash of the size plus the first and last 64 KiB of the file"""
+        h = hashlib.blake2b(str(size).encode("ascii"), digest_size=16)
+        with open(path, "rb") as f:
+            h.update(f.read(self.FINGERPRINT_SAMPLE))
+            if size > self.FINGERPRINT_SAMPLE:
+                f.seek(max(self.FINGERPRINT_SAMPLE, size - self.FINGERPRINT_SAMPLE))
+                h.update(f.read())
+        return h.hexdigest()
+
+    def identity(self, path: Path) -> tuple:
+        """(path, size, mtime_ns, inode, fingerprint), taken before verifying"""
+        path = path.resolve()
+        st = path.stat()
+        return (str(path), st.st_size, st.st_mtime_ns, st.st_ino, self._fingerprint(path, st.st_size))
+
+    def lookup(self, path: Path) -> tuple:
+        """Return (identity, cached result or None)"""
+        try:
+            identity = self.identity(path)
+        except OSError:
+            return None, None
+        row = self._db.execute(
+            f"SELECT size, mtime_ns, inode, fingerprint, result FROM {self.TABLE} WHERE path = ?",
+            (identity[0],)
+        ).fetchone()
+        if row is None or tuple(row[:4]) != identity[1:]:
+            return identity, None
+        self._db.execute(
+            f"UPDATE {self.TABLE} SET last_used = ? WHERE path = ?", (time.time(), identity[0])
+        )
+        self.hits += 1
+        return identity, json.loads(row[4])
+
+    def cacheable(self, result: dict) -> bool:
+        # An unchecked signature (PyNaCl missing) is not a result worth keeping
+        return result.get("signature", {}).get("valid", False) is not None
+
+    def store(self, identity: tuple, result: dict):
+        if identity is None or not self.cacheable(result):
+            return
+        self._db.execute(
+            f"INSERT OR REPLACE INTO {self.TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (*identity, json.dumps(result), datetime.now(timezone.utc).isoformat(), time.time())
+        )
+
+    def clear(self, paths: list = None) -> int:
+        """Invalidate the given paths, or everything"""
+        if paths:
+            keys = [(str(Path(p).resolve()),) for p in paths]
+            cur = self._db.executemany(f"DELETE FROM {self.TABLE} WHERE path = ?", keys)
+        else:
+            cur = self._db.execute(f"DELETE FROM {self.TABLE}")
+        return cur.rowcount
+
+    def prune(self, max_entries: int) -> int:
+        """Drop least recently used entries beyond max_entries"""
+        cur = self._db.execute(
+            f"DELETE FROM {self.TABLE} WHERE path IN ("
+            f" SELECT path FROM {self.TABLE} ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (max_entries,)
+        )
+        return cur.rowcount
+
+    def count(self) -> int:
+        return self._db.execute(f"SELECT COUNT(*) FROM {self.TABLE}").fetchone()[0]
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+
+def cmd_cache(action: str, db_path: Path, paths: list = None, max_entries: int = None):
+    """Inspect, invalidate, or size-limit a verification cache"""
+    cache = VerifyCache(db_path)
+    if action == "stats":
+        size = db_path.stat().st_size if db_path.exists() else 0
+        print(f"Cache: {db_path}")
+        print(f"  Entries: {cache.count()}")
+        print(f"  Size: {size} bytes")
+    elif action == "clear":
+        removed = cache.clear(paths)
+        print(f"[OK] Removed {removed} cached results")
+    elif action == "prune":
+        removed = cache.prune(max_entries if max_entries is not None else DEFAULT_CACHE_MAX_ENTRIES)
+        print(f"[OK] Pruned {removed} cached results")
+    cache.close()
+
+    if action != "stats":
+        db = sqlite3.connect(str(db_path))
+        db.execute("VACUUM")
+        db.close()
+
+
+def _load_and_verify(path_str: str) -> dict:
+    """Verify one file; unreadable or malformed documents become results"""
+    try:
+        doc = read_document(Path(path_str))
+        return verify_document(doc)
+    except (OSError, ValueError) as e:
+        return {"result": "error", "error": "unreadable_document", "detail": str(e)}
+    except (KeyError, TypeError, AttributeError) as e:
+        return {"result": "error", "error": "malformed_document", "detail": str(e)}
+
+
+def _load_and_verify_timed(path_str: str) -> tuple:
+    """_load_and_verify, plus (document bytes, stage timings) for metrics"""
+    timings = {}
+    start = time.perf_counter()
+    try:
+        data = read_document_bytes(Path(path_str))
+        doc = json_loads(data)
+    except (OSError, ValueError, EOFError) as e:
+        return {"result": "error", "error": "unreadable_document", "detail": str(e)}, 0, timings
+    timings["load_s"] = time.perf_counter() - start
+    try:
+        result = verify_document(doc, timings=timings)
+    except (KeyError, TypeError, AttributeError) as e:
+        result = {"result": "error", "error": "malformed_document", "detail": str(e)}
+    return result, len(data), timings
+
+
+def _verify_changed_document(task: tuple) -> dict:
+    """
+    Verify a changed file and, given its base version, check which
+    blocks changed against the expected block_ids.
+    """
+    path_str, base_bytes, expected_blocks = task
+    result = _load_and_verify(path_str)
+    if result["result"] != "ok" or base_bytes is None or expected_blocks is None:
+        return result
+
+    try:
+        old_doc = loads_document(base_bytes)
+        new_doc = read_document(Path(path_str))
+        old_algorithm = document_hash_algorithm(old_doc)
+        new_algorithm = document_hash_algorithm(new_doc)
+        old_hashes = {
+            b["block_id"]: compute_block_hash(b, old_algorithm) for b in old_doc.get("blocks", [])
+        }
+        new_hashes = {
+            b["block_id"]: compute_block_hash(b, new_algorithm) for b in new_doc.get("blocks", [])
+        }
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        return {"result": "error", "error": "unreadable_base_document", "detail": str(e)}
+
+    touched = sorted(
+        block_id for block_id in set(old_hashes) | set(new_hashes)
+        if old_hashes.get(block_id) != new_hashes.get(block_id)
+    )
+    result["changed_blocks"] = touched
+    unexpected = [block_id for block_id in touched if block_id not in expected_blocks]
+    if unexpected:
+        return {
+            "result": "error",
+            "error": "unexpected_block_changes",
+            "blocks": unexpected,
+            "changed_blocks": touched
+        }
+    return result
+
+
+def _run_parallel(func, items: list, jobs: int = None, progress=None) -> list:
+    """
+    Map func over items in a process pool, preserving order.
+
+    progress, if given, is called with (done, total) as results arrive.
+    """
+    if jobs == 1 or len(items) < 2:
+        results = map(func, items)
+        pool = None
+    else:
+        workers = jobs or os.cpu_count() or 1
+        chunksize = max(1, len(items) // (workers * 4))
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(func, items, chunksize=chunksize)
+    try:
+        if progress is None:
+            return list(results)
+        collected = []
+        for result in results:
+            collected.append(result)
+            progress(len(collected), len(items))
+        return collected
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def _git(root: str, *args: str, input_bytes: bytes = None) -> bytes:
+    return subprocess.run(
+        ["git", "-C", root, *args],
+        input=input_bytes, capture_output=True, check=True
+    ).stdout
+
+
+def git_changed_documents(base_rev: str) -> tuple:
+    """
+    List documents (.medf.json, also compressed) added or modified since base_rev.
+
+    Compares base_rev with the working tree.
+    Returns (repository root, [(status, path relative to root)]).
+    """
+    root = _git(".", "rev-parse", "--show-toplevel").decode("utf-8").strip()
+    output = _git(
+        root, "diff", "--name-status", "--no-renames", "--diff-filter=AM", "-z",
+        base_rev, "--", *(f"*{suffix}" for suffix in DOCUMENT_SUFFIXES)
+    ).decode("utf-8")
+    fields = output.split("\0")
+    changes = [(fields[i], fields[i + 1]) for i in range(0, len(fields) - 1, 2)]
+    return root, changes
+
+
+def git_read_blobs(root: str, rev: str, paths: list) -> dict:
+    """Read many files at one revision through a single `git cat-file --batch`"""
+    if not paths:
+        return {}
+    request = "".join(f"{rev}:{p}\n" for p in paths).encode("utf-8")
+    output = _git(root, "cat-file", "--batch", input_bytes=request)
+
+    blobs = {}
+    pos = 0
+    for p in paths:
+        header_end = output.index(b"\n", pos)
+        header = output[pos:header_end].split()
+        pos = header_end + 1
+        if header[-1] == b"missing":
+            blobs[p] = None
+            continue
+        size = int(header[2])
+        blobs[p] = output[pos:pos + size]
+        pos += size + 1
+    return blobs
+
+
+def _print_batch_results(paths: list, results: list, json_output: bool = False,
+                         cached: int = None):
+    """Print per-document results and exit non-zero if any failed"""
+    failed = sum(1 for r in results if r["result"] != "ok")
+
+    if json_output:
+        summary = {
+            "result": "error" if failed else "ok",
+            "verified": len(results) - failed,
+            "failed": failed
+        }
+        if cached is not None:
+            summary["cached"] = cached
+        summary["documents"] = [dict(path=str(p), **r) for p, r in zip(paths, results)]
+        print(json.dumps(summary, indent=2))
+    else:
+        for path, result in zip(paths, results):
+            if result["result"] == "ok":
+                print(f"✔ {path}")
+            elif result["error"] == "block_hash_mismatch":
+                print(f"✖ {path}: block_hash_mismatch ({result['block_id']})")
+            elif result["error"] == "unexpected_block_changes":
+                print(f"✖ {path}: unexpected block changes: {', '.join(result['blocks'])}")
+            else:
+                print(f"✖ {path}: {result['error']}")
+        print()
+        line = f"Summary: {len(results) - failed} verified, {failed} failed"
+        if cached is not None:
+            line += f" ({cached} from cache)"
+        print(line)
+
+    if failed:
+        sys.exit(1)
+
+
+def cmd_verify_batch(paths: list, jobs: int = None, json_output: bool = False,
+                     cache: VerifyCache = None, cache_max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+                     metrics_path: Path = None):
+    """
+    Verify many documents in parallel.
+
+    With a cache, unchanged files reuse their previous result and only
+    the rest are verified. With metrics_path, a Prometheus textfile is
+    written before the results are printed.
+    """
+    results = [None] * len(paths)
+    identities = [None] * len(paths)
+    if cache is not None:
+        for i, path in enumerate(paths):
+            identities[i], results[i] = cache.lookup(path)
+
+    todo = [i for i, result in enumerate(results) if result is None]
+    metrics = RunMetrics("verify") if metrics_path else None
+    if metrics is None:
+        fresh = _run_parallel(_load_and_verify, [str(paths[i]) for i in todo], jobs)
+    else:
+        measured = _run_parallel(_load_and_verify_timed, [str(paths[i]) for i in todo], jobs)
+        fresh = [result for result, _, _ in measured]
+        for i, result in enumerate(results):
+            if result is not None:
+                metrics.observe(result, cached=True)
+        for result, size, timings in measured:
+            metrics.observe(result, size, timings)
+        metrics.write(metrics_path)
+    for i, result in zip(todo, fresh):
+        results[i] = result
+
+    cached = None
+    if cache is not None:
+        for i, result in zip(todo, fresh):
+            cache.store(identities[i], result)
+        cache.prune(cache_max_entries)
+        cached = cache.hits
+        cache.close()
+
+    _print_batch_results(paths, results, json_output=json_output, cached=cached)
+
+
+def is_bundle_path(path: Path) -> bool:
+    """zip or tar archive of documents, judged by name and then by content"""
+    name = path.name.lower()
+    if name.endswith(".zip"):
+        return zipfile.is_zipfile(path)
+    if name.endswith(BUNDLE_TAR_SUFFIXES):
+        return tarfile.is_tarfile(path)
+    return False
+
+
+def _verify_bytes(data: bytes) -> dict:
+    """Verify a document held in memory (possibly compressed)"""
+    try:
+        doc = loads_document(data)
+    except (OSError, ValueError, EOFError) as e:
+        return {"result": "error", "error": "unreadable_document", "detail": str(e)}
+    try:
+        return verify_document(doc)
+    except (KeyError, TypeError, AttributeError) as e:
+        return {"result": "error", "error": "malformed_document", "detail": str(e)}
+
+
+def _verify_zip_members(task: tuple) -> list:
+    """Verify a slice of zip members; the archive is opened once per slice"""
+    zip_path, names = task
+    with zipfile.ZipFile(zip_path) as bundle:
+        return [_verify_bytes(bundle.read(name)) for name in names]
+
+
+def _verify_tar_members(tar_path: Path, jobs: int = None) -> tuple:
+    """
+    Stream a tar (optionally compressed) and verify each document member.
+
+    Tar has no index, so members are read in order; parsing and hashing
+    run in a process pool with a bounded number in flight.
+    """
+    names, results = [], []
+    workers = jobs or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    pending = []
+    try:
+        with tarfile.open(tar_path, mode="r|*") as bundle:
+            for member in bundle:
+                if not member.isfile() or not is_document_path(member.name):
+                    continue
+                data = bundle.extractfile(member).read()
+                names.append(member.name)
+                if pool is None:
+                    results.append(_verify_bytes(data))
+                    continue
+                pending.append(pool.submit(_verify_bytes, data))
+                if len(pending) >= workers * 4:
+                    results.append(pending.pop(0).result())
+        results.extend(f.result() for f in pending)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return names, results
+
+
+def cmd_verify_bundle(bundle_path: Path, jobs: int = None, json_output: bool = False):
+    """
+    Verify every document inside a zip or tar bundle without extracting.
+
+    Zip members are spread over a process pool by name, each worker
+    reading them directly from the archive; tar bundles are streamed.
+    """
+    if zipfile.is_zipfile(bundle_path):
+        with zipfile.ZipFile(bundle_path) as bundle:
+            names = [
+                info.filename for info in bundle.infolist()
+                if not info.is_dir() and is_document_path(info.filename)
+            ]
+        workers = jobs or os.cpu_count() or 1
+        size = max(1, -(-len(names) // (workers * 4)))
+        slices = [names[i:i + size] for i in range(0, len(names), size)]
+        results = [
+            result
+            for chunk in _run_parallel(_verify_zip_members, [(str(bundle_path), s) for s in slices], jobs)
+            for result in chunk
+        ]
+    else:
+        names, results = _verify_tar_members(bundle_path, jobs)
+
+    _print_batch_results([f"{bundle_path}:{name}" for name in names], results, json_output=json_output)
+
+
+def cmd_verify_changed(base_rev: str, expected_blocks: set = None,
+                       jobs: int = None, json_output: bool = False):
+    """
+    Verify only documents added or modified since a git revision.
+
+    With expected_blocks, modified documents must also differ from their
+    base_rev version only in those block_ids.
+    """
+    try:
+        root, changes = git_changed_documents(base_rev)
+    except (OSError, subprocess.CalledProcessError) as e:
+        stderr = getattr(e, "stderr", b"") or b""
+        print(f"[Error] git diff against {base_rev} failed: {stderr.decode('utf-8', 'replace').strip() or e}")
+        sys.exit(1)
+
+    if not changes:
+        if json_output:
+            print(json.dumps({"result": "ok", "verified": 0, "failed": 0, "documents": []}, indent=2))
+        else:
+            print(f"No MEDF documents changed since {base_rev}")
+        return
+
+    base_blobs = {}
+    if expected_blocks is not None:
+        modified = [p for status, p in changes if status == "M"]
+        base_blobs = git_read_blobs(root, base_rev, modified)
+
+    paths = [Path(root) / p for _, p in changes]
+    tasks = [
+        (str(Path(root) / p), base_blobs.get(p), expected_blocks)
+        for _, p in changes
+    ]
+    results = _run_parallel(_verify_changed_document, tasks, jobs)
+    shown = [Path(os.path.relpath(p)) for p in paths]
+    _print_batch_results(shown, results, json_output=json_output)
+
+
+_SCHEMA_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _medf_schema():
+    try:
+        return json.loads(MEDF_SCHEMA_PATH.read_text(encoding="utf-8"))
+    except OSError:
+        return None
+
+
+def schema_errors(instance, schema: dict = None, root: dict = None, where: str = "$") -> list:
+    """
+    Validate against spec/medf.schema.json.
+
+    Supports the JSON Schema keywords that schema uses ($ref, type, enum,
+    pattern, required, properties, additionalProperties, items, minItems)
+    and returns a list of "location: problem" strings.
+    """
+    if schema is None:
+        schema = _medf_schema()
+        if schema is None:
+            return []
+    root = root or schema
+    if "$ref" in schema:
+        target = root
+        for part in schema["$ref"].lstrip("#/").split("/"):
+            target = target[part]
+        schema = target
+
+    expected = schema.get("type")
+    if expected in _SCHEMA_TYPES and not isinstance(instance, _SCHEMA_TYPES[expected]):
+        return [f"{where}: expected {expected}"]
+
+    errors = []
+    if "enum" in schema and instance not in schema["enum"]:
+        errors.append(f"{where}: {instance!r} is not one of {schema['enum']}")
+    if "pattern" in schema and isinstance(instance, str) and not re.search(schema["pattern"], instance):
+        errors.append(f"{where}: does not match {schema['pattern']}")
+
+    if isinstance(instance, dict):
+        properties = schema.get("properties", {})
+        for key in schema.get("required", []):
+            if key not in instance:
+                errors.append(f"{where}: missing required property {key!r}")
+        for key, value in instance.items():
+            if key in properties:
+                errors.extend(schema_errors(value, properties[key], root, f"{where}.{key}"))
+            elif schema.get("additionalProperties", True) is False:
+                errors.append(f"{where}: unexpected property {key!r}")
+
+    if isinstance(instance, list):
+        if len(instance) < schema.get("minItems", 0):
+            errors.append(f"{where}: expected at least {schema['minItems']} items")
+        if "items" in schema:
+            for i, item in enumerate(instance):
+                errors.extend(schema_errors(item, schema["items"], root, f"{where}[{i}]"))
+
+    return errors
+
+
+class AuditCache(VerifyCache):
+    """Audit records for unchanged files, stored alongside verify results"""
+
+    TABLE = "audit_cache"
+
+    def cacheable(self, record: dict) -> bool:
+        return record.get("signature") != "unchecked"
+
+
+def _audit_hashes(doc: dict, record: dict):
+    algorithm = record["hash_algorithm"]
+    if algorithm not in HASH_ALGORITHMS:
+        record["block_hashes"] = record["doc_hash"] = "unsupported"
+        return
+
+    blocks = doc.get("blocks", [])
+    hashed = [block for block in blocks if block.get("block_hash")]
+    mismatched = [
+        block["block_id"]
+        for block, actual in zip(hashed, iter_block_hashes(hashed, algorithm))
+        if block["block_hash"] != actual
+    ]
+    if mismatched:
+        record["block_hashes"] = "mismatch"
+        record["mismatched_blocks"] = mismatched
+    elif not hashed:
+        record["block_hashes"] = "missing"
+    elif len(hashed) < len(blocks):
+        record["block_hashes"] = "partial"
+    else:
+        record["block_hashes"] = "ok"
+
+    if not doc.get("doc_hash"):
+        record["doc_hash"] = "missing"
+    elif doc["doc_hash"]["value"] == compute_doc_hash(doc, algorithm):
+        record["doc_hash"] = "ok"
+    else:
+        record["doc_hash"] = "mismatch"
+
+
+def _audit_signature(doc: dict, record: dict):
+    sig = doc.get("signature")
+    if not sig:
+        record["signature"] = "unsigned"
+        return
+    record["signer"] = sig.get("public_key")
+    if not HAS_NACL:
+        record["signature"] = "unchecked"
+        return
+    try:
+        public_key = VerifyKey(base64.b64decode(sig["public_key"]))
+        public_key.verify(doc["doc_hash"]["value"].encode("utf-8"), base64.b64decode(sig["value"]))
+        record["signature"] = "valid"
+    except Exception:
+        record["signature"] = "invalid"
+
+
+def audit_document(path_str: str) -> dict:
+    """Run every per-document audit check on one file"""
+    try:
+        doc = read_document(Path(path_str))
+    except (OSError, ValueError) as e:
+        return {"status": "unreadable", "detail": str(e), "issues": ["unreadable"]}
+    if not isinstance(doc, dict):
+        return {"status": "malformed", "issues": ["schema"], "schema_errors": ["$: expected object"]}
+
+    record = {
+        "status": "ok",
+        "id": doc.get("id"),
+        "medf_version": doc.get("medf_version"),
+        "hash_algorithm": document_hash_algorithm(doc),
+        "doc_hash_value": (doc.get("doc_hash") or {}).get("value"),
+    }
+    record["schema_errors"] = schema_errors(doc)
+
+    blocks = doc.get("blocks")
+    block_ids = [b.get("block_id") for b in blocks if isinstance(b, dict)] if isinstance(blocks, list) else []
+    seen = set()
+    record["duplicate_block_ids"] = sorted({
+        bid for bid in block_ids if bid in seen or seen.add(bid)
+    }, key=str)
+
+    try:
+        _audit_hashes(doc, record)
+        _audit_signature(doc, record)
+    except (KeyError, TypeError, AttributeError) as e:
+        record["status"] = "malformed"
+        record["detail"] = str(e)
+
+    issues = []
+    if record["status"] != "ok":
+        issues.append(record["status"])
+    if record.get("block_hashes") == "mismatch":
+        issues.append("block_hash_mismatch")
+    if record.get("doc_hash") == "mismatch":
+        issues.append("document_hash_mismatch")
+    if record.get("signature") == "invalid":
+        issues.append("signature_invalid")
+    if record["duplicate_block_ids"]:
+        issues.append("duplicate_block_ids")
+    if record["schema_errors"]:
+        issues.append("schema")
+    record["issues"] = issues
+    return record
+
+
+AUDIT_CSV_FIELDS = [
+    "path", "id", "medf_version", "hash_algorithm", "block_hashes", "doc_hash",
+    "signature", "signer", "duplicate_block_ids", "duplicate_of", "schema_errors", "issues"
+]
+
+
+def _write_audit_csv(records: list, out):
+    writer = csv.DictWriter(out, fieldnames=AUDIT_CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for record in records:
+        row = dict(record)
+        for field in ("duplicate_block_ids", "duplicate_of", "schema_errors", "issues"):
+            row[field] = "; ".join(str(v) for v in record.get(field, []))
+        writer.writerow(row)
+
+
+def cmd_audit(paths: list, jobs: int = None, output_format: str = None,
+              output_path: Path = None, cache: AuditCache = None):
+    """
+    Audit every document under the given paths.
+
+    Per-document checks run in a process pool; duplicate documents (same
+    doc_hash) are found across the whole run afterwards. With a cache,
+    untouched files reuse their previous record.
+    """
+    records = [None] * len(paths)
+    identities = [None] * len(paths)
+    if cache is not None:
+        for i, path in enumerate(paths):
+            identities[i], records[i] = cache.lookup(path)
+
+    todo = [i for i, record in enumerate(records) if record is None]
+
+    def progress(done, total):
+        sys.stderr.write(f"\rAuditing {done}/{total}")
+        if done == total:
+            sys.stderr.write("\n")
+        sys.stderr.flush()
+
+    fresh = _run_parallel(
+        audit_document, [str(paths[i]) for i in todo], jobs,
+        progress=progress if sys.stderr.isatty() and todo else None
+    )
+    for i, record in zip(todo, fresh):
+        records[i] = record
+
+    cached = None
+    if cache is not None:
+        for i, record in zip(todo, fresh):
+            cache.store(identities[i], record)
+        cached = cache.hits
+        cache.close()
+
+    # Cross-document check: identical doc_hash under different paths
+    by_hash = {}
+    for path, record in zip(paths, records):
+        if record.get("doc_hash_value"):
+            by_hash.setdefault(record["doc_hash_value"], []).append(str(path))
+    report = []
+    for path, record in zip(paths, records):
+        record = dict(path=str(path), **record)
+        others = [p for p in by_hash.get(record.get("doc_hash_value"), []) if p != str(path)]
+        record["duplicate_of"] = others
+        if others:
+            record["issues"] = record["issues"] + ["duplicate_document"]
+        report.append(record)
+
+    flagged = sum(1 for r in report if r["issues"])
+    out = open(output_path, "w", encoding="utf-8", newline="") if output_path else sys.stdout
+    try:
+        if output_format == "json":
+            summary = {
+                "result": "error" if flagged else "ok",
+                "documents": len(report),
+                "flagged": flagged,
+            }
+            if cached is not None:
+                summary["cached"] = cached
+            summary["records"] = report
+            out.write(json.dumps(summary, indent=2, ensure_ascii=False) + "\n")
+        elif output_format == "csv":
+            _write_audit_csv(report, out)
+        else:
+            for record in report:
+                if record["issues"]:
+                    print(f"✖ {record['path']}: {', '.join(record['issues'])}", file=out)
+                else:
+                    print(f"✔ {record['path']}", file=out)
+            print(file=out)
+            line = f"Summary: {len(report) - flagged} clean, {flagged} flagged"
+            if cached is not None:
+                line += f" ({cached} from cache)"
+            print(line, file=out)
+    finally:
+        if output_path:
+            out.close()
+
+    if output_path:
+        print(f"[OK] Audit report written: {output_path}")
+    if flagged:
+        sys.exit(1)
+
+
+class ReferenceIndex:
+    """
+    Reverse index of block references (SQLite).
+
+    Maps each cited document_id#block_id to the blocks that cite it, and
+    keeps a baseline of block hashes per file, so a repacked document can
+    be compared against what its dependents last saw. The baseline is
+    recorded when a file is first indexed and advances only when asked
+    (`impact --ack`, `refs index --baseline`), not on routine re-indexing.
+    Files are re-read only when their size or mtime changed.
+    """
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                document_id TEXT,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS refs (
+                target_document TEXT NOT NULL,
+                target_block TEXT NOT NULL,
+                source_path TEXT NOT NULL,
+                source_document TEXT,
+                source_block TEXT NOT NULL,
+                pinned_hash TEXT
+            );
+            CREATE INDEX IF NOT EXISTS refs_target ON refs (target_document, target_block);
+            CREATE INDEX IF NOT EXISTS refs_source ON refs (source_path);
+            CREATE TABLE IF NOT EXISTS baselines (
+                path TEXT NOT NULL,
+                block_id TEXT NOT NULL,
+                block_hash TEXT,
+                PRIMARY KEY (path, block_id)
+            );
+        """)
+        # Indexes written before baselines existed: their hashes are the baseline
+        if self._db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'block_hashes'"
+        ).fetchone():
+            self._db.execute(
+                "INSERT OR IGNORE INTO baselines SELECT path, block_id, block_hash FROM block_hashes"
+            )
+            self._db.execute("DROP TABLE block_hashes")
+            self._db.commit()
+
+    def _forget(self, path: str):
+        self._db.execute("DELETE FROM files WHERE path = ?", (path,))
+        self._db.execute("DELETE FROM refs WHERE source_path = ?", (path,))
+
+    def update(self, paths: list, force: bool = False, baseline: bool = False) -> tuple:
+        """
+        Index new or changed files; returns (indexed, unchanged, removed).
+
+        Files without a baseline get one from their recorded block hashes;
+        with baseline=True every given file's baseline is reset.
+        """
+        indexed = unchanged = 0
+        for path in paths:
+            key = str(Path(path).resolve())
+            try:
+                st = os.stat(key)
+            except OSError:
+                continue
+            row = self._db.execute(
+                "SELECT size, mtime_ns FROM files WHERE path = ?", (key,)
+            ).fetchone()
+            if not force and not baseline and row == (st.st_size, st.st_mtime_ns):
+                unchanged += 1
+                continue
+            try:
+                doc = read_document(Path(key))
+            except (OSError, ValueError):
+                continue
+            self._forget(key)
+            self._add(key, doc, st)
+            if baseline or self.baseline(key) is None:
+                self.set_baseline(key, {b.get("block_id"): b.get("block_hash") for b in doc.get("blocks", [])})
+            indexed += 1
+
+        removed = 0
+        for (key,) in self._db.execute("SELECT path FROM files").fetchall():
+            if not os.path.exists(key):
+                self._forget(key)
+                self._db.execute("DELETE FROM baselines WHERE path = ?", (key,))
+                removed += 1
+        self._db.commit()
+        return indexed, unchanged, removed
+
+    def _add(self, key: str, doc: dict, st: os.stat_result):
+        doc_id = doc.get("id")
+        self._db.execute(
+            "INSERT INTO files VALUES (?, ?, ?, ?)", (key, doc_id, st.st_size, st.st_mtime_ns)
+        )
+        refs = []
+        for block in doc.get("blocks", []):
+            for ref in block.get("references", []):
+                if not ref.get("document_id"):
+                    continue
+                # Pinned hashes may be written "sha256:<hex>"
+                pinned = ref.get("block_hash")
+                if isinstance(pinned, str) and ":" in pinned:
+                    pinned = pinned.split(":", 1)[1]
+                refs.append((
+                    ref["document_id"], ref.get("block_id") or "", key, doc_id,
+                    block.get("block_id"), pinned
+                ))
+        self._db.executemany("INSERT INTO refs VALUES (?, ?, ?, ?, ?, ?)", refs)
+
+    def baseline(self, path) -> dict:
+        """{block_id: block_hash} of a file's baseline, or None if it has none"""
+        rows = self._db.execute(
+            "SELECT block_id, block_hash FROM baselines WHERE path = ?", (str(Path(path).resolve()),)
+        ).fetchall()
+        return dict(rows) if rows else None
+
+    def set_baseline(self, path, hashes: dict):
+        """Replace a file's baseline with {block_id: block_hash}"""
+        key = str(Path(path).resolve())
+        self._db.execute("DELETE FROM baselines WHERE path = ?", (key,))
+        self._db.executemany("INSERT OR REPLACE INTO baselines VALUES (?, ?, ?)", [
+            (key, block_id, block_hash) for block_id, block_hash in hashes.items() if block_id is not None
+        ])
+
+    def citing(self, document_id: str) -> list:
+        """Every reference to a document, as dicts"""
+        rows = self._db.execute(
+            "SELECT target_block, source_path, source_document, source_block, pinned_hash"
+            " FROM refs WHERE target_document = ? ORDER BY source_path, source_block",
+            (document_id,)
+        ).fetchall()
+        return [
+            dict(zip(("target_block", "source_path", "source_document", "source_block", "pinned_hash"), row))
+            for row in rows
+        ]
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+
+def current_block_hashes(doc: dict) -> dict:
+    """{block_id: block_hash} computed from the blocks as they are now"""
+    blocks = doc.get("blocks", [])
+    return dict(zip(
+        (b["block_id"] for b in blocks), iter_block_hashes(blocks, document_hash_algorithm(doc))
+    ))
+
+
+def impacted_references(doc: dict, index: ReferenceIndex, path: Path) -> list:
+    """
+    References whose cited block in doc differs from what they last saw.
+
+    A reference that pins a block_hash is compared with that hash;
+    otherwise with the baseline of the file at path. A reference without
+    a block_id is affected by any block change. Without a baseline the
+    change is unknown, and unpinned references are reported as such.
+    """
+    current = current_block_hashes(doc)
+    previous = index.baseline(path)
+    changed = None if previous is None else {
+        block_id for block_id in set(current) | set(previous)
+        if current.get(block_id) != previous.get(block_id)
+    }
+
+    impacted = []
+    for ref in index.citing(doc.get("id")):
+        target = ref["target_block"]
+        if target and target not in current:
+            reason = "block_removed"
+        elif target and ref["pinned_hash"]:
+            if ref["pinned_hash"] == current[target]:
+                continue
+            reason = "block_changed"
+        elif changed is None:
+            reason = "baseline_unknown"
+        elif not target:
+            if not changed:
+                continue
+            reason = "document_changed"
+        elif target in changed:
+            reason = "block_changed"
+        else:
+            continue
+        impacted.append(dict(ref, reason=reason, current_hash=current.get(target)))
+    return impacted
+
+
+def cmd_refs_index(paths: list, db_path: Path, force: bool = False, baseline: bool = False):
+    """Bring the reverse reference index up to date"""
+    index = ReferenceIndex(db_path)
+    indexed, unchanged, removed = index.update(paths, force=force, baseline=baseline)
+    index.close()
+    print(f"[OK] Reference index updated: {db_path}")
+    print(f"  Indexed: {indexed}  Unchanged: {unchanged}  Removed: {removed}")
+
+
+def cmd_impact(doc_path: Path, db_path: Path, verify: bool = False,
+               jobs: int = None, json_output: bool = False, ack: bool = False):
+    """
+    List documents citing blocks of doc_path that changed since its
+    baseline, optionally re-verify them, then re-index doc_path. With
+    ack, the current block hashes become the new baseline.
+    """
+    doc = read_document(doc_path)
+    index = ReferenceIndex(db_path)
+    impacted = impacted_references(doc, index, doc_path)
+
+    sources = sorted({ref["source_path"] for ref in impacted})
+    results = _run_parallel(_load_and_verify, sources, jobs) if verify else []
+    verified = dict(zip(sources, results))
+
+    index.update([doc_path])
+    if ack:
+        index.set_baseline(doc_path, current_block_hashes(doc))
+    index.close()
+
+    if json_output:
+        output = {
+            "document_id": doc.get("id"),
+            "impacted": impacted,
+        }
+        if verify:
+            output["verification"] = [dict(path=p, **r) for p, r in verified.items()]
+        print(json.dumps(output, indent=2, ensure_ascii=False))
+    else:
+        if not impacted:
+            print(f"[OK] No dependents affected by changes to {doc.get('id')}")
+        if ack:
+            print(f"[OK] Baseline updated: {doc_path}")
+        for ref in impacted:
+            target = f"{doc.get('id')}#{ref['target_block']}" if ref["target_block"] else doc.get("id")
+            print(f"⚠ {ref['source_path']}#{ref['source_block']} cites {target} ({ref['reason']})")
+        if verify and sources:
+            print()
+            for path, result in verified.items():
+                mark = "✔" if result["result"] == "ok" else "✖"
+                print(f"{mark} {path}" + ("" if result["result"] == "ok" else f": {result['error']}"))
+
+    if verify and any(r["result"] != "ok" for r in results):
+        sys.exit(1)
+
+
+def default_reference_cache() -> Path:
+    """Fetched-reference cache directory from $MEDF_CACHE, or ~/.medf/cache"""
+    return Path(os.environ.get("MEDF_CACHE") or Path.home() / ".medf" / "cache")
+
+
+class ReferenceCache:
+    """
+    Content-addressed cache of fetched reference documents.
+
+    Documents are stored once, as objects/<doc_hash>.medf.json, however
+    many URIs serve them. An SQLite table maps each URI to the doc_hash
+    it last returned, with the ETag / Last-Modified validators used for
+    conditional requests. Only verified documents are ever stored.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.root = cache_dir
+        (cache_dir / "objects").mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(cache_dir / REFERENCE_CACHE_DB))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS fetches (
+                uri TEXT PRIMARY KEY,
+                document_id TEXT,
+                doc_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS fetches_document ON fetches (document_id);
+        """)
+
+    def object_path(self, doc_hash: str) -> Path:
+        return self.root / "objects" / f"{doc_hash}.medf.json"
+
+    def validators(self, uri: str) -> dict:
+        """Cached doc_hash, etag and last_modified for a URI, or None"""
+        row = self._db.execute(
+            "SELECT doc_hash, etag, last_modified FROM fetches WHERE uri = ?", (uri,)
+        ).fetchone()
+        if row is None or not self.object_path(row[0]).exists():
+            return None
+        return {"doc_hash": row[0], "etag": row[1], "last_modified": row[2]}
+
+    def find(self, document_id: str) -> Path:
+        """Most recently fetched object for a document_id, or None"""
+        for (doc_hash,) in self._db.execute(
+            "SELECT doc_hash FROM fetches WHERE document_id = ? ORDER BY fetched_at DESC", (document_id,)
+        ):
+            if self.object_path(doc_hash).exists():
+                return self.object_path(doc_hash)
+        return None
+
+    def store(self, uri: str, document_id: str, fetched: dict):
+        """Record a fetch; the document body is written only if its doc_hash is new"""
+        path = self.object_path(fetched["doc_hash"])
+        if "data" in fetched and not path.exists():
+            tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+            tmp.write_bytes(fetched["data"])
+            os.replace(tmp, path)
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO fetches VALUES (?, ?, ?, ?, ?, ?)",
+                (uri, document_id, fetched["doc_hash"], fetched.get("etag"),
+                 fetched.get("last_modified"), datetime.now(timezone.utc).isoformat())
+            )
+
+    def close(self):
+        self._db.close()
+
+
+class ReferenceFetcher:
+    """
+    Fetch reference documents concurrently over pooled keep-alive connections.
+
+    Each worker thread keeps one HTTP/1.1 connection per host and reuses
+    it for every request it makes there. Requests carry If-None-Match /
+    If-Modified-Since from the cache, so an unchanged document costs one
+    round trip and no body. Bodies are parsed and verified in the worker;
+    anything that fails verification is reported, never returned for use.
+    Plain http is accepted only for loopback hosts (local stand-in servers).
+    """
+
+    def __init__(self, jobs: int = None, timeout: float = FETCH_TIMEOUT):
+        self.jobs = jobs or DEFAULT_FETCH_JOBS
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self, scheme: str, netloc: str):
+        pool = getattr(self._local, "pool", None)
+        if pool is None:
+            pool = self._local.pool = {}
+        conn = pool.get((scheme, netloc))
+        if conn is None:
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            conn = pool[(scheme, netloc)] = cls(netloc, timeout=self.timeout)
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _get(self, url: str, headers: dict, redirects: int = 3) -> tuple:
+        """GET url on a pooled connection; returns (status, response, body)"""
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme != "https" and not (
+            parts.scheme == "http" and parts.hostname in ("localhost", "127.0.0.1", "::1")
+        ):
+            raise ValueError(f"reference URIs must use https: {url}")
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        conn = self._connection(parts.scheme, parts.netloc)
+        try:
+            conn.request("GET", target, headers=headers)
+            response = conn.getresponse()
+        except (http.client.HTTPException, OSError):
+            # The server may have closed an idle keep-alive connection
+            conn.close()
+            conn.request("GET", target, headers=headers)
+            response = conn.getresponse()
+        body = response.read()
+        if response.status in (301, 302, 303, 307, 308) and redirects:
+            location = urllib.parse.urljoin(url, response.getheader("Location", ""))
+            return self._get(location, headers, redirects - 1)
+        return response.status, response, body
+
+    def _fetch(self, task: tuple) -> dict:
+        uri, document_id, cached = task
+        headers = {"Accept": "application/json"}
+        if cached and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+        try:
+            status, response, body = self._get(uri, headers)
+        except (http.client.HTTPException, OSError, ValueError) as e:
+            return {"status": "fetch_failed", "detail": str(e)}
+        if status == 304 and cached:
+            return {"status": "not_modified", "doc_hash": cached["doc_hash"]}
+        if status != 200:
+            return {"status": "fetch_failed", "detail": f"HTTP {status}"}
+        try:
+            doc = loads_document(body)
+            result = verify_document(doc)
+        except (ValueError, EOFError, KeyError, TypeError, AttributeError) as e:
+            return {"status": "verification_failed", "detail": f"unreadable_document: {e}"}
+        if result["result"] != "ok":
+            return {"status": "verification_failed", "detail": result["error"]}
+        if document_id and doc.get("id") != document_id:
+            return {"status": "verification_failed", "detail": f"id_mismatch: {doc.get('id')}"}
+        return {
+            "status": "fetched",
+            "doc_hash": doc["doc_hash"]["value"],
+            "data": body,
+            "etag": response.getheader("ETag"),
+            "last_modified": response.getheader("Last-Modified"),
+        }
+
+    def fetch_all(self, tasks: list) -> list:
+        """Fetch (uri, document_id, cached validators or None) tasks in order"""
+        if not tasks:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.jobs, len(tasks))) as pool:
+            results = list(pool.map(self._fetch, tasks))
+        return results
+
+    def close(self):
+        for conn in self._connections:
+            conn.close()
+
+
+def _is_remote_uri(uri) -> bool:
+    return isinstance(uri, str) and uri.startswith(("https://", "http://"))
+
+
+def _find_reference_document(document_id: str, uri, base_dir: Path, search_paths: list) -> Path:
+    """Locate a referenced document locally: its uri path, then the search directories"""
+    if uri and not _is_remote_uri(uri):
+        path = base_dir / uri
+        if path.is_file():
+            return path
+    for directory in search_paths:
+        for suffix in DOCUMENT_SUFFIXES:
+            path = Path(directory) / f"{document_id}{suffix}"
+            if path.is_file():
+                return path
+    return None
+
+
+def resolve_references(doc_path: Path, block_id: str = None, search_paths: list = (),
+                       fetch: bool = False, jobs: int = None, cache_dir: Path = None) -> list:
+    """
+    Resolve the references of a document (or one block) to verified documents.
+
+    Offline resolution order: the reference's local uri, the referring
+    document's directory, $MEDF_PATH, search_paths, then the fetch cache.
+    With fetch, references not found locally are (re)validated against
+    their remote uri, all unique URIs concurrently; a failed fetch falls
+    back to the cache. Every resolved document is verified before its
+    block hash is reported.
+    """
+    doc = read_document(doc_path)
+    base_dir = doc_path.parent
+    env_paths = [p for p in os.environ.get("MEDF_PATH", "").split(os.pathsep) if p]
+    local_paths = [base_dir, *env_paths, *search_paths]
+
+    refs = [
+        (block.get("block_id"), ref)
+        for block in doc.get("blocks", [])
+        if block_id is None or block.get("block_id") == block_id
+        for ref in block.get("references", []) if ref.get("document_id")
+    ]
+
+    # Locate each (document_id, uri) once
+    targets = {}
+    for _, ref in refs:
+        key = (ref["document_id"], ref.get("uri"))
+        if key not in targets:
+            path = _find_reference_document(ref["document_id"], ref.get("uri"), base_dir, local_paths)
+            targets[key] = {"status": "found", "path": path} if path else None
+
+    cache = ReferenceCache(cache_dir or default_reference_cache())
+    pending = [key for key, found in targets.items() if found is None]
+    if fetch:
+        remote = sorted({uri for document_id, uri in pending if _is_remote_uri(uri)})
+        ids = {uri: document_id for document_id, uri in pending if _is_remote_uri(uri)}
+        fetcher = ReferenceFetcher(jobs)
+        fetched = fetcher.fetch_all([(uri, ids[uri], cache.validators(uri)) for uri in remote])
+        fetcher.close()
+        outcomes = {}
+        for uri, result in zip(remote, fetched):
+            if result["status"] in ("fetched", "not_modified"):
+                cache.store(uri, ids[uri], result)
+                status = "fetched" if result["status"] == "fetched" else "cached"
+                outcomes[uri] = {"status": status, "path": cache.object_path(result["doc_hash"])}
+            else:
+                outcomes[uri] = result
+        for key in pending:
+            targets[key] = outcomes.get(key[1])
+    for key in pending:
+        if targets[key] is None or targets[key]["status"] == "fetch_failed":
+            cached = cache.validators(key[1]) if key[1] else None
+            path = cache.object_path(cached["doc_hash"]) if cached else cache.find(key[0])
+            if path is not None:
+                targets[key] = {"status": "cached", "path": path}
+            elif targets[key] is None:
+                targets[key] = {"status": "not_found"}
+    cache.close()
+
+    # Verify each resolved document once, then look up the cited blocks
+    loaded = {}
+    for key, target in targets.items():
+        if "path" not in target:
+            continue
+        path = target["path"]
+        if path not in loaded:
+            try:
+                resolved = read_document(path)
+                result = verify_document(resolved)
+            except (OSError, ValueError, EOFError, KeyError, TypeError, AttributeError) as e:
+                resolved, result = None, {"result": "error", "error": f"unreadable_document: {e}"}
+            loaded[path] = (resolved, result)
+        resolved, result = loaded[path]
+        if result["result"] != "ok":
+            target.update(status="verification_failed", detail=result["error"])
+        else:
+            target["doc"] = resolved
+
+    results = []
+    for source_block, ref in refs:
+        target = targets[(ref["document_id"], ref.get("uri"))]
+        entry = {
+            "source_block": source_block,
+            "document_id": ref["document_id"],
+            "block_id": ref.get("block_id"),
+            "status": target["status"],
+        }
+        if "path" in target:
+            entry["location"] = str(target["path"])
+        if "detail" in target:
+            entry["detail"] = target["detail"]
+        resolved = target.get("doc")
+        if resolved is not None and ref.get("block_id"):
+            block = next((b for b in resolved["blocks"] if b.get("block_id") == ref["block_id"]), None)
+            if block is None:
+                entry["status"] = "block_not_found"
+            else:
+                prefix = document_hash_algorithm(resolved).replace("-", "")
+                entry["block_hash"] = f"{prefix}:{block.get('block_hash')}"
+        results.append(entry)
+    return results
+
+
+_RESOLVE_STATUS = {
+    "found": "✓ Found (local)",
+    "fetched": "✓ Found (fetched)",
+    "cached": "✓ Found (cache)",
+    "not_found": "✖ Not found",
+    "block_not_found": "✖ Block not found in document",
+    "verification_failed": "✖ Verification failed",
+    "fetch_failed": "✖ Fetch failed",
+}
+
+
+def cmd_resolve(doc_path: Path, block_id: str = None, search_paths: list = (), fetch: bool = False,
+                list_all: bool = False, jobs: int = None, json_output: bool = False):
+    """List or resolve the references of a document, optionally fetching remote ones"""
+    if list_all:
+        doc = read_document(doc_path)
+        refs = [
+            dict(ref, source_block=block.get("block_id"))
+            for block in doc.get("blocks", [])
+            if block_id is None or block.get("block_id") == block_id
+            for ref in block.get("references", [])
+        ]
+        if json_output:
+            print(json.dumps({"block_id": block_id, "references": refs}, indent=2, ensure_ascii=False))
+            return
+        for ref in refs:
+            print(f"{ref['source_block']}: MEDF: {ref.get('document_id')}#{ref.get('block_id', '')}"
+                  + (f"  ({ref['uri']})" if ref.get("uri") else ""))
+        return
+
+    start = time.perf_counter()
+    results = resolve_references(doc_path, block_id, search_paths, fetch=fetch, jobs=jobs)
+    elapsed = time.perf_counter() - start
+
+    if json_output:
+        print(json.dumps({"block_id": block_id, "references": results}, indent=2, ensure_ascii=False))
+        return
+
+    print(f"References for block: {block_id}" if block_id else f"References in: {doc_path}")
+    for i, result in enumerate(results, 1):
+        print()
+        print(f"{i}. MEDF: {result['document_id']}#{result['block_id'] or ''}")
+        print(f"   Status: {_RESOLVE_STATUS[result['status']]}")
+        if "location" in result:
+            label = "Path" if result["status"] == "found" else "Cached"
+            print(f"   {label}: {result['location']}")
+        if "detail" in result:
+            print(f"   Detail: {result['detail']}")
+        if "block_hash" in result:
+            print(f"   Block hash: {result['block_hash'][:23]}...")
+    resolved = sum(1 for r in results if "block_hash" in r)
+    print()
+    print(f"Resolved {resolved}/{len(results)} references in {elapsed:.2f}s")
+
+
+_SHINGLE_TOKEN_RE = re.compile(
+    r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]|\w+"
+)
+_MINHASH_PRIME = (1 << 61) - 1
+_MINHASH_PERMUTATIONS = [
+    (int.from_bytes(hashlib.sha256(b"medf-minhash-a%d" % i).digest()[:8], "big") % (_MINHASH_PRIME - 1) + 1,
+     int.from_bytes(hashlib.sha256(b"medf-minhash-b%d" % i).digest()[:8], "big") % _MINHASH_PRIME)
+    for i in range(MINHASH_PERMUTATIONS)
+]
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """
+    Overlapping token n-grams of normalised text.
+
+    Latin-script words are tokens; each CJK character is a token of its
+    own, so Japanese, Chinese and Korean text shingles by characters
+    without needing a word segmenter. Whitespace and case are ignored.
+    Text with fewer than size tokens has no shingles.
+    """
+    tokens = _SHINGLE_TOKEN_RE.findall(unicodedata.normalize("NFKC", text).lower())
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def minhash_signature(text: str) -> bytes:
+    """
+    MinHash signature of a block's shingles, packed as 32-bit values.
+
+    None for text too short to shingle: such blocks carry too little
+    content for a similarity estimate (exact copies share a block_hash).
+    """
+    hashed = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+        for s in shingles(text)
+    ]
+    if not hashed:
+        return None
+    return struct.pack(
+        f"<{MINHASH_PERMUTATIONS}I",
+        *(min((a * x + b) % _MINHASH_PRIME for x in hashed) & 0xFFFFFFFF
+          for a, b in _MINHASH_PERMUTATIONS)
+    )
+
+
+def minhash_similarity(a: bytes, b: bytes) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    sa = struct.unpack(f"<{MINHASH_PERMUTATIONS}I", a)
+    sb = struct.unpack(f"<{MINHASH_PERMUTATIONS}I", b)
+    return sum(x == y for x, y in zip(sa, sb)) / MINHASH_PERMUTATIONS
+
+
+def _minhash_document(path_str: str):
+    """
+    (document_id, [(block_id, block_hash, text length, signature)]) or
+    None; blocks too short to shingle are left out.
+    """
+    try:
+        doc = read_document(Path(path_str))
+        blocks = [
+            (b["block_id"], b.get("block_hash"), len(b["text"]), minhash_signature(b["text"]))
+            for b in doc.get("blocks", [])
+        ]
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+    return doc.get("id"), [block for block in blocks if block[3] is not None]
+
+
+class DedupIndex:
+    """
+    MinHash/LSH index of blocks (SQLite).
+
+    Each signature is split into bands; blocks sharing any band bucket
+    are candidate near-duplicates, so clustering never compares all
+    pairs. Files are re-read only when their size or mtime changed.
+    """
+
+    ROWS_PER_BAND = MINHASH_PERMUTATIONS // MINHASH_BANDS
+    # Bumped when signatures change meaning; older indexes are rebuilt
+    SIGNATURE_VERSION = "2"
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS blocks (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL,
+                document_id TEXT,
+                block_id TEXT NOT NULL,
+                block_hash TEXT,
+                text_length INTEGER NOT NULL,
+                signature BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS blocks_path ON blocks (path);
+            CREATE TABLE IF NOT EXISTS bands (
+                band INTEGER NOT NULL,
+                bucket BLOB NOT NULL,
+                block INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS bands_bucket ON bands (band, bucket);
+            CREATE INDEX IF NOT EXISTS bands_block ON bands (block);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'signature_version'").fetchone()
+        if row is None or row[0] != self.SIGNATURE_VERSION:
+            for table in ("bands", "blocks", "files"):
+                self._db.execute(f"DELETE FROM {table}")
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('signature_version', ?)", (self.SIGNATURE_VERSION,)
+            )
+            self._db.commit()
+
+    def _forget(self, path: str):
+        self._db.execute(
+            "DELETE FROM bands WHERE block IN (SELECT id FROM blocks WHERE path = ?)", (path,)
+        )
+        self._db.execute("DELETE FROM blocks WHERE path = ?", (path,))
+        self._db.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def update(self, paths: list, jobs: int = None) -> tuple:
+        """Index new or changed files; returns (indexed, unchanged, removed)"""
+        todo = []
+        unchanged = 0
+        for path in paths:
+            key = str(Path(path).resolve())
+            try:
+                st = os.stat(key)
+            except OSError:
+                continue
+            row = self._db.execute(
+                "SELECT size, mtime_ns FROM files WHERE path = ?", (key,)
+            ).fetchone()
+            if row == (st.st_size, st.st_mtime_ns):
+                unchanged += 1
+            else:
+                todo.append((key, st))
+
+        indexed = 0
+        results = _run_parallel(_minhash_document, [key for key, _ in todo], jobs)
+        for (key, st), result in zip(todo, results):
+            self._forget(key)
+            if result is None:
+                continue
+            document_id, blocks = result
+            self._db.execute("INSERT INTO files VALUES (?, ?, ?)", (key, st.st_size, st.st_mtime_ns))
+            for block_id, block_hash, text_length, signature in blocks:
+                cur = self._db.execute(
+                    "INSERT INTO blocks (path, document_id, block_id, block_hash, text_length, signature)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, document_id, block_id, block_hash, text_length, signature)
+                )
+                width = self.ROWS_PER_BAND * 4
+                self._db.executemany("INSERT INTO bands VALUES (?, ?, ?)", [
+                    (band, signature[band * width:(band + 1) * width], cur.lastrowid)
+                    for band in range(MINHASH_BANDS)
+                ])
+            indexed += 1
+
+        removed = 0
+        for (key,) in self._db.execute("SELECT path FROM files").fetchall():
+            if not os.path.exists(key):
+                self._forget(key)
+                removed += 1
+        self._db.commit()
+        return indexed, unchanged, removed
+
+    def clusters(self, threshold: float = DEDUP_THRESHOLD) -> list:
+        """
+        Groups of near-duplicate blocks, largest first.
+
+        Groups are the connected components of candidate pairs (blocks
+        sharing an LSH bucket) that reach the threshold. A pair is
+        compared at most once, and not at all when its blocks are already
+        in one group, so copies of one block cost linear time.
+        """
+        parent = {}
+
+        def find(x):
+            while parent.get(x, x) != x:
+                parent[x] = parent.get(parent[x], parent[x])
+                x = parent[x]
+            return x
+
+        signatures = {}
+
+        def signature(block):
+            if block not in signatures:
+                signatures[block] = struct.unpack(f"<{MINHASH_PERMUTATIONS}I", self._db.execute(
+                    "SELECT signature FROM blocks WHERE id = ?", (block,)
+                ).fetchone()[0])
+            return signatures[block]
+
+        needed = threshold * MINHASH_PERMUTATIONS
+        compared = set()
+        buckets = self._db.execute(
+            "SELECT group_concat(block) FROM bands GROUP BY band, bucket HAVING COUNT(*) > 1"
+        )
+        for (members,) in buckets:
+            # Members seen so far in this bucket, by group; a new member is
+            # compared with each other group until one member matches
+            groups = {}
+            for b in sorted(int(m) for m in members.split(",")):
+                root = find(b)
+                for other in [r for r in groups if r != root]:
+                    for a in groups[other]:
+                        if (a, b) in compared:
+                            continue
+                        compared.add((a, b))
+                        if sum(x == y for x, y in zip(signature(a), signature(b))) >= needed:
+                            parent[other] = root
+                            groups.setdefault(root, []).extend(groups.pop(other))
+                            break
+                groups.setdefault(root, []).append(b)
+
+        groups = {}
+        for block in parent:
+            groups.setdefault(find(block), set()).add(block)
+        clusters = []
+        for root, members in groups.items():
+            members.add(root)
+            rows = [
+                self._db.execute(
+                    "SELECT id, path, document_id, block_id, block_hash, text_length, signature"
+                    " FROM blocks WHERE id = ?", (m,)
+                ).fetchone()
+                for m in sorted(members)
+            ]
+            reference = rows[0][6]
+            clusters.append([
+                {
+                    "path": path, "document_id": document_id, "block_id": block_id,
+                    "block_hash": block_hash, "text_length": text_length,
+                    "similarity": round(minhash_similarity(reference, sig), 3)
+                }
+                for _, path, document_id, block_id, block_hash, text_length, sig in rows
+            ])
+        clusters.sort(key=lambda c: (-len(c), c[0]["path"], c[0]["block_id"]))
+        return clusters
+
+    def block_count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM blocks").fetchone()[0]
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+
+def cmd_dedup(paths: list, db_path: Path, threshold: float = DEDUP_THRESHOLD,
+              jobs: int = None, json_output: bool = False):
+    """Update the MinHash index and report near-duplicate block clusters"""
+    index = DedupIndex(db_path)
+    indexed, unchanged, removed = index.update(paths, jobs=jobs)
+    clusters = index.clusters(threshold)
+    block_count = index.block_count()
+    index.close()
+
+    # Text that could be stored once per cluster instead of per block
+    redundant = sum(sum(b["text_length"] for b in c) - max(b["text_length"] for b in c) for c in clusters)
+
+    if json_output:
+        print(json.dumps({
+            "indexed": indexed,
+            "unchanged": unchanged,
+            "removed": removed,
+            "blocks": block_count,
+            "threshold": threshold,
+            "redundant_chars": redundant,
+            "clusters": clusters
+        }, indent=2, ensure_ascii=False))
+        return
+
+    for n, cluster in enumerate(clusters, 1):
+        print(f"Cluster {n} ({len(cluster)} blocks)")
+        for block in cluster:
+            print(f"  {block['similarity']:.2f}  {block['path']}#{block['block_id']}")
+        print()
+    print(f"Files: {indexed} indexed, {unchanged} unchanged, {removed} removed")
+    print(f"Blocks: {block_count}  Clusters: {len(clusters)}  "
+          f"Redundant text: {redundant} chars (threshold {threshold})")
+
+
+class CorpusDB:
+    """
+    SQLite store of documents and blocks for metadata queries.
+
+    sync() materialises files incrementally: files with unchanged size
+    and mtime are skipped, and files whose doc_hash is unchanged keep
+    their block rows (only the document row, which also holds fields
+    outside doc_hash such as the signature, is rewritten). Queries then
+    run without parsing JSON.
+    """
+
+    DOCUMENT_FIELDS = (
+        "path", "id", "issuer", "document_type", "snapshot", "language",
+        "medf_version", "hash_algorithm", "doc_hash", "signed", "block_count"
+    )
+    BLOCK_FIELDS = ("path", "position", "block_id", "role", "format", "block_hash", "text")
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                path TEXT PRIMARY KEY,
+                id TEXT,
+                issuer TEXT,
+                document_type TEXT,
+                snapshot TEXT,
+                language TEXT,
+                medf_version TEXT,
+                hash_algorithm TEXT,
+                doc_hash TEXT,
+                signed INTEGER NOT NULL,
+                block_count INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS documents_id ON documents (id);
+            CREATE INDEX IF NOT EXISTS documents_issuer ON documents (issuer);
+            CREATE INDEX IF NOT EXISTS documents_type ON documents (document_type);
+            CREATE INDEX IF NOT EXISTS documents_snapshot ON documents (snapshot);
+            CREATE INDEX IF NOT EXISTS documents_doc_hash ON documents (doc_hash);
+            CREATE TABLE IF NOT EXISTS blocks (
+                path TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                block_id TEXT,
+                role TEXT,
+                format TEXT,
+                block_hash TEXT,
+                text TEXT,
+                PRIMARY KEY (path, position)
+            );
+            CREATE INDEX IF NOT EXISTS blocks_block_hash ON blocks (block_hash);
+            CREATE INDEX IF NOT EXISTS blocks_role ON blocks (role);
+        """)
+
+    def sync(self, paths: list) -> dict:
+        """Bring the store in line with paths; returns counts per outcome"""
+        counts = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "unreadable": 0}
+        for path in paths:
+            key = str(Path(path).resolve())
+            try:
+                st = os.stat(key)
+            except OSError:
+                continue
+            row = self._db.execute(
+                "SELECT size, mtime_ns, doc_hash, * FROM documents WHERE path = ?", (key,)
+            ).fetchone()
+            if row is not None and row[:2] == (st.st_size, st.st_mtime_ns):
+                counts["unchanged"] += 1
+                continue
+            try:
+                doc = read_document(Path(key))
+                doc_hash = (doc.get("doc_hash") or {}).get("value")
+            except (OSError, ValueError, AttributeError):
+                counts["unreadable"] += 1
+                continue
+            if row is not None and doc_hash and row[2] == doc_hash:
+                # Same blocks; the document row may still differ (re-signed)
+                values = self._document_row(key, doc, st)
+                self._db.execute("REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", values)
+                same = row[3:-2] == values[:-2]
+                counts["unchanged" if same else "updated"] += 1
+                continue
+            self._forget(key)
+            self._add(key, doc, st)
+            counts["updated" if row is not None else "added"] += 1
+
+        for (key,) in self._db.execute("SELECT path FROM documents").fetchall():
+            if not os.path.exists(key):
+                self._forget(key)
+                counts["removed"] += 1
+        self._db.commit()
+        return counts
+
+    def _forget(self, key: str):
+        self._db.execute("DELETE FROM documents WHERE path = ?", (key,))
+        self._db.execute("DELETE FROM blocks WHERE path = ?", (key,))
+
+    @staticmethod
+    def _document_row(key: str, doc: dict, st: os.stat_result) -> tuple:
+        return (
+            key, doc.get("id"), doc.get("issuer"), doc.get("document_type"), doc.get("snapshot"),
+            doc.get("language"), doc.get("medf_version"), document_hash_algorithm(doc),
+            (doc.get("doc_hash") or {}).get("value"), int(bool(doc.get("signature"))),
+            len(doc.get("blocks", [])), st.st_size, st.st_mtime_ns
+        )
+
+    def _add(self, key: str, doc: dict, st: os.stat_result):
+        blocks = doc.get("blocks", [])
+        self._db.execute(
+            "INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            self._document_row(key, doc, st)
+        )
+        self._db.executemany("INSERT INTO blocks VALUES (?, ?, ?, ?, ?, ?, ?)", [
+            (key, i, b.get("block_id"), b.get("role"), b.get("format"), b.get("block_hash"), b.get("text"))
+            for i, b in enumerate(blocks)
+        ])
+
+    def _where(self, id=None, issuer=None, document_type=None, after=None, before=None,
+               role=None, block_hash=None, doc_hash=None, prefix="d") -> tuple:
+        clauses, params = [], []
+        for column, value in (("id", id), ("issuer", issuer), ("document_type", document_type),
+                              ("doc_hash", doc_hash)):
+            if value is not None:
+                clauses.append(f"{prefix}.{column} = ?")
+                params.append(value)
+        # Snapshots are ISO 8601 strings, so string order is time order
+        if after is not None:
+            clauses.append(f"{prefix}.snapshot > ?")
+            params.append(after)
+        if before is not None:
+            clauses.append(f"{prefix}.snapshot < ?")
+            params.append(before)
+        for column, value in (("role", role), ("block_hash", block_hash)):
+            if value is not None:
+                clauses.append(
+                    f"EXISTS (SELECT 1 FROM blocks b2 WHERE b2.path = {prefix}.path AND b2.{column} = ?)"
+                )
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def documents(self, limit: int = None, **filters) -> list:
+        """
+        Documents matching every given filter, ordered by snapshot.
+
+        Filters: id, issuer, document_type, doc_hash, after / before
+        (snapshot bounds), role and block_hash (has such a block).
+        """
+        where, params = self._where(**filters)
+        sql = f"SELECT {', '.join('d.' + f for f in self.DOCUMENT_FIELDS)} FROM documents d{where}" \
+              " ORDER BY d.snapshot, d.id"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(zip(self.DOCUMENT_FIELDS, row)) for row in self._db.execute(sql, params)]
+
+    def blocks(self, limit: int = None, role: str = None, block_hash: str = None, **filters) -> list:
+        """Blocks with the given role / block_hash in documents matching filters"""
+        where, params = self._where(**filters)
+        block_clauses = []
+        for column, value in (("role", role), ("block_hash", block_hash)):
+            if value is not None:
+                block_clauses.append(f"b.{column} = ?")
+                params.append(value)
+        if block_clauses:
+            where += (" AND " if where else " WHERE ") + " AND ".join(block_clauses)
+        sql = f"SELECT d.id, {', '.join('b.' + f for f in self.BLOCK_FIELDS)}" \
+              f" FROM blocks b JOIN documents d ON d.path = b.path{where}" \
+              " ORDER BY d.snapshot, d.id, b.position"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        fields = ("document_id",) + self.BLOCK_FIELDS
+        return [dict(zip(fields, row)) for row in self._db.execute(sql, params)]
+
+    def count(self) -> tuple:
+        """(documents, blocks)"""
+        return (
+            self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0],
+            self._db.execute("SELECT COUNT(*) FROM blocks").fetchone()[0],
+        )
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+
+def cmd_db_sync(paths: list, db_path: Path):
+    """Materialise documents into the corpus store"""
+    store = CorpusDB(db_path)
+    counts = store.sync(paths)
+    documents, blocks = store.count()
+    store.close()
+    print(f"[OK] Corpus store synced: {db_path}")
+    print("  " + "  ".join(f"{k.capitalize()}: {v}" for k, v in counts.items()))
+    print(f"  Documents: {documents}  Blocks: {blocks}")
+
+
+def cmd_db_query(db_path: Path, filters: dict, blocks: bool = False,
+                 limit: int = None, json_output: bool = False):
+    """Query the corpus store for documents, or blocks with --blocks"""
+    store = CorpusDB(db_path)
+    rows = store.blocks(limit=limit, **filters) if blocks else store.documents(limit=limit, **filters)
+    store.close()
+
+    if json_output:
+        print(json.dumps(rows, indent=2, ensure_ascii=False))
+        return
+    for row in rows:
+        if blocks:
+            print(f"{row['document_id']}#{row['block_id']}  {row['role']}  {row['path']}")
+        else:
+            print(f"{row['id']}  {row['snapshot']}  {row['issuer']}  {row['document_type']}  {row['path']}")
+    print()
+    print(f"{len(rows)} {'blocks' if blocks else 'documents'}")
+
+
+_LEGACY_HEADER_RE = re.compile(r'^(#{1,6})\s+(.+?)(?:\s+\{:id=([a-z0-9-]+)\})?$')
+
+
+def legacy_hash(doc: dict) -> str:
+    """The `hash` of a legacy content document, computed as cli/medf.py does"""
+    hash_input = {
+        "id": doc["id"],
+        "snapshot": doc["snapshot"],
+        "authority": doc["authority"],
+        "content": doc["content"]
+    }
+    if "index" in doc:
+        hash_input["index"] = json.dumps(doc["index"], ensure_ascii=False)
+    if "references" in doc:
+        hash_input["references"] = json.dumps(doc["references"], ensure_ascii=False)
+    canonical = json.dumps(hash_input, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def legacy_to_blocks(content: str, sections: list) -> list:
+    """
+    Split legacy `content` at its headers into blocks.
+
+    The n-th header line becomes the block named by the n-th entry of
+    index.sections and stays at the top of that block as a Markdown
+    heading (without its {:id=...} suffix), so section titles and levels
+    survive. Text before the first header becomes a "preamble" block.
+    Raises ValueError if headers and sections do not line up.
+    """
+    chunks = [["preamble", []]]
+    headers = 0
+    for line in content.split("\n"):
+        match = _LEGACY_HEADER_RE.match(line)
+        if match:
+            if headers >= len(sections):
+                raise ValueError("more headers in content than index.sections")
+            chunks.append([sections[headers]["id"], [f"{match.group(1)} {match.group(2).strip()}"]])
+            headers += 1
+        else:
+            chunks[-1][1].append(line)
+    if headers != len(sections):
+        raise ValueError("fewer headers in content than index.sections")
+
+    blocks = []
+    seen = {}
+    for block_id, lines in chunks:
+        text = "\n".join(lines).strip()
+        if block_id == "preamble" and not text:
+            continue
+        # Legacy slugs can collide; block ids must not
+        seen[block_id] = seen.get(block_id, 0) + 1
+        if seen[block_id] > 1:
+            block_id = f"{block_id}-{seen[block_id]}"
+        blocks.append({"block_id": block_id, "role": "body", "format": "markdown", "text": text})
+    return blocks
+
+
+def _migrate_document(task: tuple) -> dict:
+    """Convert, pack and write one legacy document; returns its manifest entry"""
+    source, output, algorithm = task
+    entry = {"source": source, "output": output}
+    try:
+        legacy = read_document(Path(source))
+    except (OSError, ValueError) as e:
+        return dict(entry, status="unreadable", detail=str(e))
+    if not isinstance(legacy, dict) or "content" not in legacy or "blocks" in legacy:
+        return dict(entry, status="not_legacy")
+    legacy_hash_field = legacy.get("hash")
+    if not isinstance(legacy_hash_field, dict) or not legacy_hash_field.get("value"):
+        return dict(entry, status="no_legacy_hash")
+
+    try:
+        old_hash = legacy_hash(legacy)
+        entry["legacy_hash"] = legacy["hash"]["value"]
+        if old_hash != legacy["hash"]["value"]:
+            return dict(entry, status="legacy_hash_mismatch", actual=old_hash)
+        blocks = legacy_to_blocks(legacy["content"], legacy.get("index", {}).get("sections", []))
+    except (KeyError, TypeError, AttributeError) as e:
+        return dict(entry, status="malformed", detail=str(e))
+    except ValueError as e:
+        return dict(entry, status="index_mismatch", detail=str(e))
+
+    authority = legacy.get("authority")
+    issuer = legacy.get("issuer") or (authority.get("name") if isinstance(authority, dict) else authority)
+    doc = {
+        "medf_version": "0.2.1",
+        "id": legacy["id"],
+        "snapshot": legacy["snapshot"],
+        "issuer": issuer or "",
+        "document_type": legacy.get("document_type", ""),
+        "language": legacy.get("language", ""),
+        "blocks": blocks
+    }
+    pack_document(doc, algorithm)
+
+    output_path = Path(output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    write_document(output_path, doc, compression=None)
+
+    # Every legacy key the new document does not carry, including those
+    # only converted (content, index, hash, authority)
+    return dict(
+        entry, status="migrated", doc_hash=doc["doc_hash"]["value"], blocks=len(blocks),
+        dropped=sorted(set(legacy) - set(doc))
+    )
+
+
+def cmd_migrate(source_dir: Path, out_dir: Path, jobs: int = None, algorithm: str = None):
+    """
+    Migrate legacy content documents under source_dir to block documents
+    under out_dir, mirroring the directory layout.
+
+    Every finished file is appended to out_dir/migration-manifest.ndjson
+    (old hash -> new doc_hash). Rerunning skips files already migrated.
+    """
+    manifest_path = out_dir / MIGRATION_MANIFEST
+    done = set()
+    if manifest_path.exists():
+        with open(manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from an interrupted run
+                if entry.get("status") == "migrated" and Path(entry["output"]).exists():
+                    done.add(entry["source"])
+
+    tasks = []
+    for path in sorted(source_dir.rglob("*")):
+        name = path.name
+        if not path.is_file() or not (name.endswith(".medf") or is_document_path(name)):
+            continue
+        if str(path) in done or out_dir in path.parents:
+            continue
+        relative = path.relative_to(source_dir)
+        stem = relative.name
+        for suffix in (".medf",) + DOCUMENT_SUFFIXES:
+            if stem.endswith(suffix):
+                stem = stem[:-len(suffix)]
+                break
+        tasks.append((str(path), str(out_dir / relative.parent / f"{stem}.medf.json"), algorithm))
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    counts = {}
+    workers = jobs or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(tasks) > 1 else None
+    try:
+        results = (
+            pool.map(_migrate_document, tasks, chunksize=max(1, min(64, len(tasks) // (workers * 4))))
+            if pool else map(_migrate_document, tasks)
+        )
+        with open(manifest_path, "a", encoding="utf-8") as manifest:
+            for n, entry in enumerate(results, 1):
+                manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                manifest.flush()
+                counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+                if entry["status"] not in ("migrated", "not_legacy"):
+                    print(f"✖ {entry['source']}: {entry['status']}")
+                if sys.stderr.isatty():
+                    sys.stderr.write(f"\rMigrating {n}/{len(tasks)}")
+                    sys.stderr.flush()
+        if sys.stderr.isatty() and tasks:
+            sys.stderr.write("\n")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    print(f"[OK] Migration manifest: {manifest_path}")
+    print(f"  Already migrated: {len(done)}")
+    for status, count in sorted(counts.items()):
+        print(f"  {status}: {count}")
+    if any(s not in ("migrated", "not_legacy") for s in counts):
+        sys.exit(1)
+
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$", re.MULTILINE)
+_CODE_FENCE_RE = re.compile(r"^(```|~~~).*?(?:^\1[^\n]*$|\Z)", re.MULTILINE | re.DOTALL)
+_SUMMARY_MARKUP_RE = re.compile(r"\*\*?|`+|^>\s?|!?\[([^\]]*)\]\([^)]*\)", re.MULTILINE)
+
+
+def block_index_entry(block: dict, block_hash: str) -> dict:
+    """
+    Presentation entry for one block: title, heading level, word count, summary.
+
+    The title is the first Markdown heading in the text (level = number of
+    #), falling back to the block_id with level None; fenced code is
+    skipped for both. Words are counted like dedup shingles: Latin words,
+    and each CJK character on its own.
+    """
+    text = block.get("text") if isinstance(block.get("text"), str) else ""
+    prose = _CODE_FENCE_RE.sub("", text)
+    heading = _HEADING_RE.search(prose)
+    summary = ""
+    for paragraph in re.split(r"\n\s*\n", prose):
+        paragraph = paragraph.strip()
+        if re.search(r"\w", paragraph) and not _HEADING_RE.fullmatch(paragraph):
+            summary = " ".join(_SUMMARY_MARKUP_RE.sub(r"\1", paragraph).split())
+            break
+    if len(summary) > INDEX_SUMMARY_CHARS:
+        cut = summary[:INDEX_SUMMARY_CHARS]
+        summary = (cut.rsplit(" ", 1)[0] if " " in cut else cut) + "…"
+    return {
+        "block_id": block["block_id"],
+        "block_hash": block_hash,
+        "title": heading.group(2) if heading else block["block_id"],
+        "level": len(heading.group(1)) if heading else None,
+        "words": len(_SHINGLE_TOKEN_RE.findall(text)),
+        "summary": summary,
+    }
+
+
+def update_presentation_index(doc: dict) -> tuple:
+    """
+    Build or refresh doc["index"]["presentation"] in place.
+
+    Entries are keyed by block_hash: a block whose hash matches its
+    previous entry keeps it, only changed or new blocks are recomputed,
+    and entries for removed blocks are dropped. Blocks without a
+    block_hash (unpacked documents) are hashed here. index is outside
+    doc_hash, so the signature stays valid. Returns (recomputed, reused).
+    """
+    algorithm = document_hash_algorithm(doc)
+    index = doc.get("index") if isinstance(doc.get("index"), dict) else {}
+    previous = index.get("presentation") or {}
+    if previous.get("version") != PRESENTATION_INDEX_VERSION:
+        previous = {}
+    old_entries = {e.get("block_id"): e for e in previous.get("blocks", []) if isinstance(e, dict)}
+
+    entries = []
+    recomputed = 0
+    for block in doc.get("blocks", []):
+        block_hash = block.get("block_hash") or compute_block_hash(block, algorithm)
+        entry = old_entries.get(block["block_id"])
+        if entry is None or entry.get("block_hash") != block_hash:
+            entry = block_index_entry(block, block_hash)
+            recomputed += 1
+        entries.append(entry)
+
+    index["presentation"] = {
+        "version": PRESENTATION_INDEX_VERSION,
+        "blocks": entries,
+        "words": sum(e["words"] for e in entries),
+    }
+    doc["index"] = index
+    return recomputed, len(entries) - recomputed
+
+
+def cmd_index_gen(paths: list, json_output: bool = False):
+    """
+    Generate or incrementally update the presentation index of documents.
+
+    Only files whose index actually changed are rewritten.
+    """
+    results = []
+    for path in paths:
+        doc = read_document(path)
+        before = canonical_json(doc.get("index", {}))
+        recomputed, reused = update_presentation_index(doc)
+        changed = canonical_json(doc["index"]) != before
+        if changed:
+            write_document(path, doc)
+        results.append({
+            "path": str(path),
+            "blocks": recomputed + reused,
+            "recomputed": recomputed,
+            "reused": reused,
+            "written": changed,
+        })
+
+    if json_output:
+        print(json.dumps(results if len(results) != 1 else results[0], indent=2))
+        return
+    for result in results:
+        status = "Index updated" if result["written"] else "Index up to date"
+        print(f"[OK] {status}: {result['path']}")
+        print(f"  Blocks: {result['blocks']}  Recomputed: {result['recomputed']}  "
+              f"Reused: {result['reused']}")
+
+
+def load_signing_key(key_path: Path):
+    """
+    Load an ed25519 private key.
+
+    Accepts a raw 32-byte seed or its base64 encoding.
+    """
+    data = key_path.read_bytes()
+    if len(data) != 32:
+        data = base64.b64decode(data.strip(), validate=True)
+    return SigningKey(data)
+
+
+def sign_hash(key, hash_value: str) -> dict:
+    """Sign a doc_hash value and return the signature object."""
+    signed = key.sign(hash_value.encode("utf-8"))
+    return {
+        "algorithm": "ed25519",
+        "value": base64.b64encode(signed.signature).decode("ascii"),
+        "public_key": base64.b64encode(key.verify_key.encode()).decode("ascii"),
         "signed_at": datetime.now(timezone.utc).isoformat()
     }
 
-    # Write updated document
-    path.write_text(
-        json.dumps(doc, indent=2, ensure_ascii=False),
-        encoding="utf-8"
+
+def default_agent_socket() -> Path:
+    """Socket path from $MEDF_AGENT_SOCK, or ~/.medf/agent.sock"""
+    if os.environ.get(AGENT_SOCKET_ENV):
+        return Path(os.environ[AGENT_SOCKET_ENV])
+    return Path.home() / ".medf" / "agent.sock"
+
+
+def agent_sign_hashes(hash_values: list, socket_path: Path) -> list:
+    """
+    Ask a running signing agent to sign a batch of doc_hash values.
+
+    Returns one signature object per hash, in request order.
+    """
+    request = json.dumps({"hashes": hash_values}).encode("utf-8") + b"\n"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(socket_path))
+        sock.sendall(request)
+        with sock.makefile("rb") as stream:
+            line = stream.readline()
+
+    if not line:
+        raise ConnectionError("agent closed the connection")
+    response = json.loads(line)
+    if response.get("result") != "ok":
+        raise ValueError(response.get("error", "agent_error"))
+    return response["signatures"]
+
+
+class _AgentHandler(socketserver.StreamRequestHandler):
+    """Serve newline-delimited JSON signing requests on one connection."""
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline(AGENT_MAX_REQUEST_BYTES + 1)
+            if not line:
+                return
+            if len(line) > AGENT_MAX_REQUEST_BYTES:
+                self._reply({"result": "error", "error": "request_too_large"})
+                return
+            self._reply(self._process(line))
+
+    def _process(self, line: bytes) -> dict:
+        try:
+            hash_values = json.loads(line)["hashes"]
+        except (ValueError, KeyError, TypeError):
+            return {"result": "error", "error": "malformed_request"}
+
+        # Only sign things shaped like document hashes, never arbitrary data
+        if not isinstance(hash_values, list) or not all(
+            isinstance(h, str) and HASH_VALUE_RE.fullmatch(h) for h in hash_values
+        ):
+            return {"result": "error", "error": "invalid_hash_value"}
+
+        key = self.server.signing_key
+        signatures = [sign_hash(key, h) for h in hash_values]
+        self.server.signed_count += len(signatures)
+        return {"result": "ok", "signatures": signatures}
+
+    def _reply(self, response: dict):
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class _AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def cmd_agent(key_path: Path, socket_path: Path):
+    """
+    Hold a signing key in memory and serve signatures over a Unix socket.
+
+    The private key is read once. Clients only ever receive signatures.
+    """
+    if not HAS_NACL:
+        print("[Error] PyNaCl is required for signing")
+        print("Install: pip install pynacl")
+        sys.exit(1)
+
+    try:
+        key = load_signing_key(key_path)
+    except Exception as e:
+        print(f"[Error] Failed to load private key: {e}")
+        sys.exit(1)
+
+    if socket_path.exists():
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(str(socket_path))
+            print(f"[Error] An agent is already listening on {socket_path}")
+            sys.exit(1)
+        except OSError:
+            socket_path.unlink()  # stale socket from a previous run
+
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    old_umask = os.umask(0o177)  # socket is owner-only (0600)
+    try:
+        server = _AgentServer(str(socket_path), _AgentHandler)
+    finally:
+        os.umask(old_umask)
+    server.signing_key = key
+    server.signed_count = 0
+
+    print(f"[OK] Signing agent listening: {socket_path}")
+    print(f"  Signer: {sign_hash(key, '0' * 64)['public_key'][:40]}...")
+    print(f"  export {AGENT_SOCKET_ENV}={socket_path}")
+    sys.stdout.flush()
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path.exists():
+            socket_path.unlink()
+        print()
+        print(f"[OK] Agent stopped ({server.signed_count} signatures issued)")
+
+
+def cmd_sign(paths, key_path: Path = None, agent_socket: Path = None, log_path: Path = None):
+    """
+    Attach a cryptographic signature to the document hash.
+
+    A signature proves integrity, not authority.
+    With agent_socket, all documents are signed in one batch by a
+    running `medf agent` and no key file is read. With log_path, the
+    new signatures are appended to the transparency log in one batch.
+    """
+    if isinstance(paths, Path):
+        paths = [paths]
+
+    docs = []
+    for path in paths:
+        doc = read_document(path)
+        if "doc_hash" not in doc:
+            print(f"[Error] No doc_hash found to sign: {path}")
+            print("Run 'medf pack' first")
+            sys.exit(1)
+        docs.append(doc)
+
+    hash_values = [doc["doc_hash"]["value"] for doc in docs]
+
+    if agent_socket is not None:
+        try:
+            signatures = agent_sign_hashes(hash_values, agent_socket)
+        except Exception as e:
+            print(f"[Error] Signing agent failed ({agent_socket}): {e}")
+            sys.exit(1)
+    else:
+        if not HAS_NACL:
+            print("[Error] PyNaCl is required for signing")
+            print("Install: pip install pynacl")
+            sys.exit(1)
+
+        # Read private key
+        try:
+            key = load_signing_key(key_path)
+        except Exception as e:
+            print(f"[Error] Failed to load private key: {e}")
+            sys.exit(1)
+
+        signatures = [sign_hash(key, h) for h in hash_values]
+
+    for doc, signature in zip(docs, signatures):
+        doc["signature"] = signature
+
+    if log_path is not None:
+        # Check everything before writing, so a rejected batch changes nothing
+        for path, doc in zip(paths, docs):
+            rejection = log_rejection(doc)
+            if rejection:
+                print(f"[Error] Not signed or logged, verification failed ({rejection}): {path}")
+                sys.exit(1)
+
+    for path, doc in zip(paths, docs):
+        # Write updated document
+        write_document(path, doc)
+
+        print(f"[OK] Signature attached: {path}")
+        print(f"  Algorithm: ed25519")
+        print(f"  Signer: {doc['signature']['public_key'][:40]}...")
+
+    if log_path is not None:
+        log = TransparencyLog(log_path)
+        appended, _ = log.append([log_entry(doc) for doc in docs])
+        print(f"[OK] Logged {appended} signature(s): {log_path} (tree size {log.size()})")
+        log.close()
+
+
+def _merkle_leaf_hash(entry: dict) -> bytes:
+    """RFC 6962 leaf hash: SHA-256(0x00 || canonical JSON of the entry)"""
+    return hashlib.sha256(b"\x00" + canonical_json(entry)).digest()
+
+
+def _merkle_node_hash(left: bytes, right: bytes) -> bytes:
+    """RFC 6962 interior node hash: SHA-256(0x01 || left || right)"""
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def _largest_power_of_two_below(n: int) -> int:
+    return 1 << ((n - 1).bit_length() - 1)
+
+
+def log_rejection(doc: dict):
+    """
+    Why a document may not enter the transparency log, or None.
+
+    Entries are permanent, so only documents whose hashes verify and whose
+    signature checks out against its recorded public key are accepted.
+    """
+    if "signature" not in doc or "doc_hash" not in doc:
+        return "document is not signed"
+    try:
+        result = verify_document(doc)
+    except (KeyError, TypeError, AttributeError, ValueError) as e:
+        return f"malformed document ({e})"
+    if result["result"] != "ok":
+        return result["error"]
+    if result["signature"]["valid"] is not True:
+        return "signature not checked (PyNaCl is required)"
+    return None
+
+
+def log_entry(doc: dict) -> dict:
+    """Transparency log entry for a signed document"""
+    signature = doc["signature"]
+    return {
+        "id": doc.get("id"),
+        "doc_hash": doc["doc_hash"]["value"],
+        "hash_algorithm": document_hash_algorithm(doc),
+        "public_key": signature["public_key"],
+        "signature": signature["value"],
+        "signed_at": signature.get("signed_at"),
+    }
+
+
+class TransparencyLog:
+    """
+    Local append-only Merkle log of signed doc_hashes (SQLite).
+
+    The tree is the RFC 6962 / RFC 9162 Merkle tree over log entries.
+    Leaves live in `entries`; every complete (power-of-two) subtree is
+    written to `nodes` once, when its last leaf is appended, and never
+    changes afterwards. The root of any size, and inclusion and
+    consistency proofs against it, therefore need only O(log n) node
+    reads, and the database grows linearly (about two hashes per entry).
+    """
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                idx INTEGER PRIMARY KEY,
+                leaf_hash BLOB NOT NULL UNIQUE,
+                doc_hash TEXT NOT NULL,
+                entry TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_doc_hash ON entries (doc_hash);
+            CREATE TABLE IF NOT EXISTS nodes (
+                level INTEGER NOT NULL,
+                idx INTEGER NOT NULL,
+                hash BLOB NOT NULL,
+                PRIMARY KEY (level, idx)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS tree_heads (
+                size INTEGER PRIMARY KEY,
+                root TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            );
+        """)
+
+    def size(self) -> int:
+        return self._db.execute("SELECT COALESCE(MAX(idx) + 1, 0) FROM entries").fetchone()[0]
+
+    def _node(self, level: int, idx: int) -> bytes:
+        """Hash of the complete subtree covering leaves [idx << level, (idx + 1) << level)"""
+        if level == 0:
+            row = self._db.execute("SELECT leaf_hash FROM entries WHERE idx = ?", (idx,)).fetchone()
+        else:
+            row = self._db.execute(
+                "SELECT hash FROM nodes WHERE level = ? AND idx = ?", (level, idx)
+            ).fetchone()
+        return row[0]
+
+    def _subtree(self, start: int, end: int, memo: dict) -> bytes:
+        """MTH(D[start:end]); complete subtrees come straight from storage"""
+        n = end - start
+        if n & (n - 1) == 0 and start % n == 0:
+            return self._node(n.bit_length() - 1, start // n)
+        if (start, end) not in memo:
+            k = _largest_power_of_two_below(n)
+            memo[(start, end)] = _merkle_node_hash(
+                self._subtree(start, start + k, memo), self._subtree(start + k, end, memo)
+            )
+        return memo[(start, end)]
+
+    def root(self, size: int = None) -> str:
+        """Hex root hash of the first size entries (the whole log by default)"""
+        size = self.size() if size is None else size
+        if size == 0:
+            return hashlib.sha256(b"").hexdigest()
+        return self._subtree(0, size, {}).hex()
+
+    def append(self, entries: list) -> tuple:
+        """
+        Append entries in one transaction; returns (appended, already logged).
+
+        An entry whose leaf hash is already in the log is not appended
+        again. A tree head is recorded for the new size.
+        """
+        size = self.size()
+        appended = duplicates = 0
+        # Last even-indexed (left-sibling) node per level, so a batch
+        # does not read back the nodes it has just written
+        frontier = {}
+        with self._db:
+            for entry in entries:
+                encoded = canonical_json(entry)
+                leaf = hashlib.sha256(b"\x00" + encoded).digest()
+                exists = self._db.execute("SELECT 1 FROM entries WHERE leaf_hash = ?", (leaf,)).fetchone()
+                if exists:
+                    duplicates += 1
+                    continue
+                self._db.execute(
+                    "INSERT INTO entries VALUES (?, ?, ?, ?)",
+                    (size, leaf, entry["doc_hash"], encoded.decode("utf-8"))
+                )
+                # Close every subtree this leaf completes
+                level, idx, node = 0, size, leaf
+                while idx & 1:
+                    left = frontier.get(level)
+                    left = left[1] if left and left[0] == idx - 1 else self._node(level, idx - 1)
+                    node = _merkle_node_hash(left, node)
+                    level, idx = level + 1, idx >> 1
+                    self._db.execute("INSERT INTO nodes VALUES (?, ?, ?)", (level, idx, node))
+                frontier[level] = (idx, node)
+                size += 1
+                appended += 1
+            if appended:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO tree_heads VALUES (?, ?, ?)",
+                    (size, self.root(size), datetime.now(timezone.utc).isoformat())
+                )
+        return appended, duplicates
+
+    def find(self, doc_hash: str = None, leaf_hash: bytes = None) -> tuple:
+        """(index, entry) of the first matching entry, or (None, None)"""
+        if leaf_hash is not None:
+            row = self._db.execute("SELECT idx, entry FROM entries WHERE leaf_hash = ?", (leaf_hash,)).fetchone()
+        else:
+            row = self._db.execute(
+                "SELECT idx, entry FROM entries WHERE doc_hash = ? ORDER BY idx LIMIT 1", (doc_hash,)
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else (None, None)
+
+    def inclusion_proof(self, index: int, size: int) -> list:
+        """RFC 6962 audit path for leaf index in the tree of the given size"""
+        memo = {}
+        path = []
+        start, end = 0, size
+        while end - start > 1:
+            k = _largest_power_of_two_below(end - start)
+            if index < start + k:
+                path.append(self._subtree(start + k, end, memo))
+                end = start + k
+            else:
+                path.append(self._subtree(start, start + k, memo))
+                start += k
+        return [h.hex() for h in reversed(path)]
+
+    def consistency_proof(self, old_size: int, size: int) -> list:
+        """RFC 6962 consistency proof between two tree sizes"""
+        memo = {}
+        path = []
+        start, end, m, complete = 0, size, old_size, True
+        while m != end - start:
+            k = _largest_power_of_two_below(end - start)
+            if m <= k:
+                path.append(self._subtree(start + k, end, memo))
+                end = start + k
+            else:
+                path.append(self._subtree(start, start + k, memo))
+                start, m, complete = start + k, m - k, False
+        if not complete:
+            path.append(self._subtree(start, end, memo))
+        return [h.hex() for h in reversed(path)]
+
+    def close(self):
+        self._db.close()
+
+
+def verify_inclusion(leaf_hash: bytes, index: int, size: int, path: list, root: bytes) -> bool:
+    """Check an inclusion proof (RFC 9162, section 2.1.3.2)"""
+    if index >= size:
+        return False
+    fn, sn, r = index, size - 1, leaf_hash
+    for p in path:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            r = _merkle_node_hash(p, r)
+            while not fn & 1 and fn != 0:
+                fn, sn = fn >> 1, sn >> 1
+        else:
+            r = _merkle_node_hash(r, p)
+        fn, sn = fn >> 1, sn >> 1
+    return sn == 0 and r == root
+
+
+def verify_consistency(old_size: int, size: int, path: list, old_root: bytes, root: bytes) -> bool:
+    """Check a consistency proof (RFC 9162, section 2.1.4.2)"""
+    if old_size == 0:
+        return not path
+    if old_size == size:
+        return not path and old_root == root
+    if old_size > size or not path:
+        return False
+    if old_size & (old_size - 1) == 0:
+        path = [old_root] + path
+    fn, sn = old_size - 1, size - 1
+    while fn & 1:
+        fn, sn = fn >> 1, sn >> 1
+    fr = sr = path[0]
+    for c in path[1:]:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            fr = _merkle_node_hash(c, fr)
+            sr = _merkle_node_hash(c, sr)
+            while not fn & 1 and fn != 0:
+                fn, sn = fn >> 1, sn >> 1
+        else:
+            sr = _merkle_node_hash(sr, c)
+        fn, sn = fn >> 1, sn >> 1
+    return sn == 0 and fr == old_root and sr == root
+
+
+def cmd_log_append(log_path: Path, paths: list):
+    """Append the signatures of signed documents to the log in one batch"""
+    entries = []
+    for path in paths:
+        doc = read_document(path)
+        if "signature" not in doc or "doc_hash" not in doc:
+            print(f"[Error] Document is not signed: {path}")
+            print("Run 'medf sign' first")
+            sys.exit(1)
+        rejection = log_rejection(doc)
+        if rejection:
+            print(f"[Error] Not logged, verification failed ({rejection}): {path}")
+            sys.exit(1)
+        entries.append(log_entry(doc))
+    log = TransparencyLog(log_path)
+    appended, duplicates = log.append(entries)
+    size, root = log.size(), log.root()
+    log.close()
+    print(f"[OK] Log updated: {log_path}")
+    print(f"  Appended: {appended}  Already logged: {duplicates}")
+    print(f"  Tree size: {size}")
+    print(f"  Root: {root}")
+
+
+def cmd_log_head(log_path: Path, json_output: bool = False):
+    """Print the current tree size and root"""
+    log = TransparencyLog(log_path)
+    head = {"tree_size": log.size(), "root": log.root()}
+    log.close()
+    if json_output:
+        print(json.dumps(head, indent=2))
+        return
+    print(f"Tree size: {head['tree_size']}")
+    print(f"Root: {head['root']}")
+
+
+def cmd_log_prove(log_path: Path, target: str = None, old_size: int = None, size: int = None):
+    """
+    Print an inclusion proof for a document (path or doc_hash), or a
+    consistency proof from old_size, as JSON for `medf log check`.
+    """
+    log = TransparencyLog(log_path)
+    current = log.size()
+    size = current if size is None else size
+    if not 0 <= size <= current:
+        print(f"[Error] Tree size {size} out of range (log has {current} entries)")
+        sys.exit(1)
+
+    if old_size is not None:
+        if not 0 <= old_size <= size:
+            print(f"[Error] Old size {old_size} must be between 0 and {size}")
+            sys.exit(1)
+        proof = {
+            "type": "consistency",
+            "old_size": old_size,
+            "old_root": log.root(old_size),
+            "tree_size": size,
+            "root": log.root(size),
+            "path": log.consistency_proof(old_size, size) if old_size else [],
+        }
+    else:
+        if Path(target).exists():
+            doc = read_document(Path(target))
+            if "signature" not in doc:
+                print(f"[Error] Document is not signed: {target}")
+                sys.exit(1)
+            index, entry = log.find(leaf_hash=_merkle_leaf_hash(log_entry(doc)))
+        else:
+            index, entry = log.find(doc_hash=target.split(":")[-1])
+        if index is None or index >= size:
+            print(f"[Error] Not in the log (tree size {size}): {target}")
+            sys.exit(1)
+        proof = {
+            "type": "inclusion",
+            "tree_size": size,
+            "root": log.root(size),
+            "leaf_index": index,
+            "entry": entry,
+            "path": log.inclusion_proof(index, size),
+        }
+    log.close()
+    print(json.dumps(proof, indent=2))
+
+
+def cmd_log_check(proof_path: Path, root: str = None, old_root: str = None, doc_path: Path = None):
+    """
+    Check a proof from `medf log prove` without access to the log.
+
+    The proof is checked against the roots it carries unless trusted
+    roots are given; only the latter shows the log is the one you saw.
+    """
+    proof = json.loads(proof_path.read_text(encoding="utf-8"))
+    if root is not None and root != proof["root"]:
+        print("✖ Root does not match the trusted root")
+        sys.exit(1)
+    if old_root is not None and old_root != proof.get("old_root"):
+        print("✖ Old root does not match the trusted old root")
+        sys.exit(1)
+    path = [bytes.fromhex(h) for h in proof["path"]]
+
+    if proof["type"] == "inclusion":
+        entry = proof["entry"]
+        if doc_path is not None:
+            doc = read_document(doc_path)
+            if "signature" not in doc or log_entry(doc) != entry:
+                print(f"✖ Logged entry does not match {doc_path}")
+                sys.exit(1)
+        ok = verify_inclusion(
+            _merkle_leaf_hash(entry), proof["leaf_index"], proof["tree_size"], path,
+            bytes.fromhex(proof["root"])
+        )
+        if not ok:
+            print("✖ Inclusion proof is invalid")
+            sys.exit(1)
+        print(f"✔ doc_hash {entry['doc_hash'][:16]}... is entry {proof['leaf_index']} "
+              f"of the log at size {proof['tree_size']}")
+    else:
+        ok = verify_consistency(
+            proof["old_size"], proof["tree_size"], path,
+            bytes.fromhex(proof["old_root"]), bytes.fromhex(proof["root"])
+        )
+        if not ok:
+            print("✖ Consistency proof is invalid")
+            sys.exit(1)
+        print(f"✔ The log at size {proof['tree_size']} extends the log at size {proof['old_size']}")
+    if root is None:
+        print("⚠ Checked against the root in the proof; pass --root to pin a published tree head")
+
+
+def cmd_explain():
+    """
+    Explain what MEDF verification guarantees.
+
+    MEDF verification means:
+    - The text content has not been altered
+    - The document structure matches the signed hash
+    - The signature is cryptographically valid
+
+    MEDF verification does NOT mean:
+    - The signer is authoritative
+    - The content is correct
+    - The document should be trusted
+    """
+    print("="*60)
+    print("What MEDF Verification Means")
+    print("="*60)
+    print()
+    print("MEDF verification means:")
+    print("✓ The text content has not been altered")
+    print("✓ The document structure matches the signed hash")
+    print("✓ The signature is cryptographically valid (if present)")
+    print()
+    print("MEDF verification does NOT mean:")
+    print("✗ The signer is authoritative")
+    print("✗ The content is correct")
+    print("✗ The document should be trusted")
+    print()
+    print("Key principles:")
+    print("• Text content is immutable once published")
+    print("• Presentation (rendering, indexing) is mutable")
+    print("• All hashing uses RFC 8785 (JSON Canonicalization Scheme)")
+    print("• MEDF does not define trust authorities or key ownership")
+    print()
+    print("For more information:")
+    print("• Philosophy: see PHILOSOPHY.md")
+    print("• Trust anchors: see docs/trust.md")
+    print("="*60)
+
+
+def diff_blocks(old_doc: dict, new_doc: dict) -> dict:
+    """Compare two documents by block_id and recorded block_hash"""
+    old_blocks = {b["block_id"]: b for b in old_doc.get("blocks", [])}
+    new_blocks = {b["block_id"]: b for b in new_doc.get("blocks", [])}
+
+    all_block_ids = set(old_blocks.keys()) | set(new_blocks.keys())
+
+    changed = []
+    unchanged = []
+    added = []
+    removed = []
+
+    for block_id in sorted(all_block_ids):
+        if block_id in old_blocks and block_id in new_blocks:
+            old_hash = old_blocks[block_id].get("block_hash")
+            new_hash = new_blocks[block_id].get("block_hash")
+
+            if old_hash and new_hash:
+                if old_hash != new_hash:
+                    changed.append({
+                        "block_id": block_id,
+                        "before": old_hash,
+                        "after": new_hash
+                    })
+                else:
+                    unchanged.append(block_id)
+            elif not old_hash and not new_hash:
+                unchanged.append(block_id)
+        elif block_id in old_blocks and block_id not in new_blocks:
+            removed.append(block_id)
+        elif block_id not in old_blocks and block_id in new_blocks:
+            added.append(block_id)
+
+    return {
+        "changed": changed,
+        "unchanged": unchanged,
+        "added": added,
+        "removed": removed
+    }
+
+
+def cmd_diff(old_path: Path, new_path: Path, json_output: bool = False):
+    """
+    Diff two MEDF documents at semantic block level.
+
+    Git diff is line-based.
+    MEDF diff is block-based.
+    """
+    old_doc = read_document(old_path)
+    new_doc = read_document(new_path)
+
+    result = diff_blocks(old_doc, new_doc)
+    changed = result["changed"]
+    unchanged = result["unchanged"]
+    added = result["added"]
+    removed = result["removed"]
+
+    if json_output:
+        print(json.dumps(result, indent=2))
+    else:
+        if changed:
+            for item in changed:
+                print(f"Block changed: {item['block_id']}")
+                print(f"- Previous hash: {item['before'][:16]}...")
+                print(f"+ New hash:      {item['after'][:16]}...")
+                print()
+
+        if unchanged:
+            for block_id in unchanged:
+                print(f"Block unchanged: {block_id}")
+
+        if added:
+            for block_id in added:
+                print(f"Block added: {block_id}")
+
+        if removed:
+            for block_id in removed:
+                print(f"Block removed: {block_id}")
+
+        if not (changed or added or removed):
+            print("No changes detected.")
+
+
+def _stream_parse_line(raw: bytes):
+    """Decode and parse one NDJSON line; returns (document, None) or (None, error result)"""
+    try:
+        doc = json_loads(raw.decode("utf-8"))
+    except ValueError as e:
+        # UnicodeDecodeError is a ValueError: invalid UTF-8 is invalid JSON text
+        return None, {"result": "error", "error": "invalid_json", "detail": str(e)}
+    if not isinstance(doc, dict):
+        return None, {"result": "error", "error": "malformed_document", "detail": "not an object"}
+    return doc, None
+
+
+def _stream_verify_line(raw: bytes):
+    """Verify one NDJSON document; returns a result object"""
+    doc, error = _stream_parse_line(raw)
+    if error:
+        return error
+    try:
+        return dict(id=doc.get("id"), **verify_document(doc))
+    except Exception as e:
+        # Any per-document failure becomes that document's result line
+        return {"result": "error", "error": "malformed_document", "detail": str(e)}
+
+
+def _stream_pack_line(raw: bytes, algorithm: str = None):
+    """Pack one NDJSON document; returns the packed document as one line"""
+    doc, error = _stream_parse_line(raw)
+    if error:
+        return error
+    try:
+        pack_document(doc, algorithm)
+        return json.dumps(doc, ensure_ascii=False)
+    except Exception as e:
+        return {"result": "error", "error": "malformed_document", "detail": str(e)}
+
+
+def cmd_stream(operation: str, jobs: int = None, ordered: bool = True, algorithm: str = None):
+    """
+    Process newline-delimited MEDF documents from stdin.
+
+    Writes one NDJSON line per input document to stdout. At most
+    jobs * 4 documents are in flight; stdin is not read further until
+    results have been written, so a slow consumer slows the producer.
+    Result objects carry "seq", the 0-based input line number. Every
+    non-blank input line produces exactly one output line, an error
+    result if the document could not be processed.
+    """
+    if operation == "pack":
+        func = functools.partial(_stream_pack_line, algorithm=algorithm)
+    else:
+        func = _stream_verify_line
+    out = sys.stdout
+    lock = threading.Lock()
+    closed = threading.Event()
+
+    def emit(seq, output):
+        if closed.is_set():
+            return
+        if not isinstance(output, str):
+            output = json.dumps(dict(seq=seq, **output), ensure_ascii=False)
+        with lock:
+            try:
+                out.write(output + "\n")
+                out.flush()
+            except BrokenPipeError:
+                # Consumer went away: stop reading, discard remaining output
+                closed.set()
+                os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+
+    def result_of(future):
+        # A worker that died (or an unpicklable result) still yields a line
+        try:
+            return future.result()
+        except Exception as e:
+            return {"result": "error", "error": "processing_failed", "detail": str(e) or type(e).__name__}
+
+    lines = (
+        (seq, raw)
+        for seq, raw in enumerate(sys.stdin.buffer)
+        if raw.strip()
+    )
+
+    if jobs == 1:
+        for seq, line in lines:
+            if closed.is_set():
+                break
+            emit(seq, func(line))
+        return
+
+    workers = jobs or os.cpu_count() or 1
+    window = workers * 4
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if ordered:
+            # A bounded queue of futures: the writer drains it in input order
+            pending = queue.Queue(maxsize=window)
+
+            def writer():
+                while True:
+                    item = pending.get()
+                    if item is None:
+                        return
+                    seq, future = item
+                    emit(seq, result_of(future))
+
+            writer_thread = threading.Thread(target=writer, daemon=True)
+            writer_thread.start()
+            for seq, line in lines:
+                if closed.is_set():
+                    break
+                pending.put((seq, pool.submit(func, line)))
+            pending.put(None)
+            writer_thread.join()
+        else:
+            slots = threading.BoundedSemaphore(window)
+
+            def done(future, seq):
+                try:
+                    emit(seq, result_of(future))
+                finally:
+                    slots.release()
+
+            for seq, line in lines:
+                if closed.is_set():
+                    break
+                slots.acquire()
+                future = pool.submit(func, line)
+                future.add_done_callback(lambda f, seq=seq: done(f, seq))
+
+
+class _InotifyWatcher:
+    """Recursive directory watcher on Linux inotify (via libc)"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_ISDIR = 0x40000000
+    IN_Q_OVERFLOW = 0x00004000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__(self, root: Path):
+        libc_name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._root = root
+        self._dirs = {}
+        self.overflowed = False
+        for dirpath, _, _ in os.walk(root):
+            self._add_watch(Path(dirpath))
+
+    def _rescan(self) -> list:
+        """Re-walk the whole tree; return every watched file in it"""
+        paths = []
+        for dirpath, _, filenames in os.walk(self._root):
+            self._add_watch(Path(dirpath))
+            paths.extend(Path(dirpath) / f for f in filenames if _is_watched_file(f))
+        return paths
+
+    def _add_watch(self, directory: Path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self.MASK)
+        if wd >= 0:
+            self._dirs[wd] = directory
+
+    def wait(self, timeout: float = None) -> list:
+        """
+        Block up to timeout seconds; return paths written since last call.
+
+        If the kernel queue overflowed, events were lost: every watched
+        file in the tree is returned and overflowed is set until the next call.
+        """
+        self.overflowed = False
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self._fd, 64 * 1024)
+        changed = []
+        pos = 0
+        while pos < len(data):
+            wd, mask, _, name_len = struct.unpack_from("iIII", data, pos)
+            name = data[pos + 16:pos + 16 + name_len].rstrip(b"\0")
+            pos += 16 + name_len
+            if mask & self.IN_Q_OVERFLOW:
+                self.overflowed = True
+                continue
+            path = self._dirs.get(wd, Path(".")) / os.fsdecode(name)
+            if mask & self.IN_ISDIR:
+                if mask & self.IN_CREATE:
+                    for dirpath, _, filenames in os.walk(path):
+                        self._add_watch(Path(dirpath))
+                        changed.extend(Path(dirpath) / f for f in filenames)
+            elif mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                changed.append(path)
+        if self.overflowed:
+            changed = self._rescan()
+        return changed
+
+
+class _PollingWatcher:
+    """Portable fallback: compare (mtime, size) snapshots of the tree"""
+
+    overflowed = False
+
+    def __init__(self, root: Path, interval: float = 1.0):
+        self._root = root
+        self._interval = interval
+        self._stats = self._scan()
+
+    def _scan(self) -> dict:
+        stats = {}
+        for dirpath, _, filenames in os.walk(self._root):
+            for name in filenames:
+                if _is_watched_file(name):
+                    path = Path(dirpath) / name
+                    try:
+                        st = path.stat()
+                    except OSError:
+                        continue
+                    stats[path] = (st.st_mtime_ns, st.st_size)
+        return stats
+
+    def wait(self, timeout: float = None) -> list:
+        time.sleep(self._interval if timeout is None else min(timeout, self._interval))
+        stats = self._scan()
+        changed = [p for p, st in stats.items() if self._stats.get(p) != st]
+        self._stats = stats
+        return changed
+
+
+def _is_watched_file(name: str) -> bool:
+    return is_document_path(name) or (name.endswith(".md") and not name.startswith("."))
+
+
+def repack_incremental(doc: dict, previous: dict) -> tuple:
+    """
+    Pack a document, reusing block hashes from a previous pack.
+
+    previous maps block_id -> ((algorithm, role, format, text), block_hash) and is
+    only ever filled with hashes computed here. Returns
+    (block cache for the next run, number of blocks rehashed).
+    """
+    algorithm = document_hash_algorithm(doc)
+    cache = {}
+    rehashed = 0
+    for block in doc.get("blocks", []):
+        content = (algorithm, block["role"], block["format"], block["text"])
+        prev = previous.get(block["block_id"])
+        if prev is not None and prev[0] == content:
+            block["block_hash"] = prev[1]
+        else:
+            block["block_hash"] = compute_block_hash(block, algorithm)
+            rehashed += 1
+        cache[block["block_id"]] = (content, block["block_hash"])
+
+    doc["doc_hash"] = {
+        "algorithm": algorithm,
+        "value": compute_doc_hash(doc, algorithm)
+    }
+    return cache, rehashed
+
+
+def _emit_watch_event(event: dict, json_output: bool):
+    if json_output:
+        print(json.dumps(event, ensure_ascii=False))
+    elif event["event"] == "error":
+        print(f"✖ {event['path']}: {event['error']}")
+    elif event["event"] == "overflow":
+        print(f"⚠ {event['path']}: event queue overflowed, rescanned {event['rescanned']} files")
+    else:
+        print(
+            f"[OK] {event['event']} {event['path']} "
+            f"({event['blocks']} blocks, {event['rehashed']} rehashed, "
+            f"{event['ms']:.1f} ms) {event['doc_hash'][:16]}..."
+        )
+    sys.stdout.flush()
+
+
+def _watch_process(path: Path, doc_type: str, block_caches: dict) -> dict:
+    """Re-import or re-pack one changed file. Returns an event, or None if nothing changed."""
+    start = time.perf_counter()
+
+    if path.suffix == ".md":
+        target = path.with_suffix(".medf.json")
+        doc = markdown_to_document(path.read_text(encoding="utf-8"), slugify(path.stem), doc_type)
+        event_name = "imported"
+    else:
+        target = path
+        doc = read_document(path)
+        event_name = "repacked"
+
+    block_caches[target], rehashed = repack_incremental(doc, block_caches.get(target, {}))
+
+    # Our own writes come back as events; an already-packed file is a fixpoint
+    if target.exists() and read_document_bytes(target) == json_dumps_indented(doc):
+        return None
+    write_document(target, doc)
+
+    return {
+        "event": event_name,
+        "path": str(target),
+        "blocks": len(doc["blocks"]),
+        "rehashed": rehashed,
+        "doc_hash": doc["doc_hash"]["value"],
+        "ms": round((time.perf_counter() - start) * 1000, 3)
+    }
+
+
+def cmd_watch(root: Path, doc_type: str = "philosophy", debounce: float = 0.3,
+              poll: bool = False, json_output: bool = False):
+    """
+    Watch a directory and re-import / re-pack documents as they change.
+
+    Bursts of saves are debounced. Unchanged blocks keep their hash
+    from the previous pack instead of being rehashed.
+    """
+    watcher = None
+    if not poll:
+        try:
+            watcher = _InotifyWatcher(root)
+        except (OSError, AttributeError):
+            watcher = None
+    backend = "inotify" if watcher else "polling"
+    if watcher is None:
+        watcher = _PollingWatcher(root)
+
+    if json_output:
+        print(json.dumps({"event": "watching", "path": str(root), "backend": backend}))
+    else:
+        print(f"[OK] Watching {root} ({backend}). Press Ctrl+C to stop.")
+    sys.stdout.flush()
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    block_caches = {}
+    pending = {}
+    try:
+        while True:
+            now = time.monotonic()
+            timeout = None
+            if pending:
+                timeout = max(0.0, debounce - (now - max(pending.values())))
+            changed = watcher.wait(timeout)
+            if watcher.overflowed:
+                event = {"event": "overflow", "path": str(root), "rescanned": len(changed)}
+                _emit_watch_event(event, json_output)
+            for path in changed:
+                if _is_watched_file(path.name):
+                    pending[path] = time.monotonic()
+
+            now = time.monotonic()
+            if not pending or now - max(pending.values()) < debounce:
+                continue
+
+            batch, pending = sorted(pending), {}
+            for path in batch:
+                if not path.exists():
+                    continue
+                try:
+                    event = _watch_process(path, doc_type, block_caches)
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    event = {"event": "error", "path": str(path), "error": str(e)}
+                if event:
+                    _emit_watch_event(event, json_output)
+    except KeyboardInterrupt:
+        pass
+
+
+MISSING_HASH = bytes(32)
+
+
+def _hash_bytes(hash_value) -> bytes:
+    """32-byte digest from a hex hash value; zero bytes if absent or malformed"""
+    if isinstance(hash_value, str) and len(hash_value) == 64:
+        try:
+            return bytes.fromhex(hash_value)
+        except ValueError:
+            pass
+    return MISSING_HASH
+
+
+class CorpusBlock:
+    """Lightweight view of one block in a CorpusDocument"""
+
+    __slots__ = ("document", "index")
+
+    def __init__(self, document, index: int):
+        self.document = document
+        self.index = index
+
+    @property
+    def block_id(self) -> str:
+        return self.document.block_ids[self.index]
+
+    @property
+    def role(self) -> str:
+        return self.document.roles[self.index]
+
+    @property
+    def format(self) -> str:
+        return self.document.formats[self.index]
+
+    @property
+    def block_hash(self) -> bytes:
+        return self.document.block_hash(self.index)
+
+    @property
+    def text(self) -> str:
+        return self.document.texts()[self.index]
+
+
+class CorpusDocument:
+    """
+    Compact in-memory form of a MEDF document.
+
+    Block fields are stored as columns: interned strings for block_id,
+    role and format, and one bytes object holding every block hash as a
+    32-byte digest. Block text is kept only when loaded eagerly;
+    otherwise texts() reads it back from the file on demand. The texts
+    read most recently (one document) are cached, so walking a
+    document's blocks parses its file once.
+    """
+
+    __slots__ = (
+        "path", "id", "medf_version", "snapshot", "document_type", "hash_algorithm",
+        "doc_hash", "signed", "block_ids", "roles", "formats", "block_hashes", "_texts", "_stat"
+    )
+
+    # (document, texts) of the last lazy read
+    _recent = (None, None)
+
+    def __init__(self, doc: dict, path: Path = None, keep_text: bool = False,
+                 stat: os.stat_result = None):
+        intern = sys.intern
+        blocks = doc.get("blocks", [])
+        self.path = path
+        self.id = intern(str(doc.get("id", "")))
+        self.medf_version = intern(str(doc.get("medf_version", "")))
+        self.snapshot = doc.get("snapshot")
+        self.document_type = intern(str(doc.get("document_type", "")))
+        self.hash_algorithm = intern(document_hash_algorithm(doc))
+        self.doc_hash = _hash_bytes((doc.get("doc_hash") or {}).get("value"))
+        self.signed = bool(doc.get("signature"))
+        self.block_ids = tuple(intern(str(b.get("block_id", ""))) for b in blocks)
+        self.roles = tuple(intern(str(b.get("role", ""))) for b in blocks)
+        self.formats = tuple(intern(str(b.get("format", ""))) for b in blocks)
+        self.block_hashes = b"".join(_hash_bytes(b.get("block_hash")) for b in blocks)
+        self._texts = tuple(b.get("text", "") for b in blocks) if keep_text else None
+        self._stat = None
+        if not keep_text and path is not None:
+            st = stat or os.stat(path)
+            self._stat = (st.st_size, st.st_mtime_ns)
+
+    def __len__(self) -> int:
+        return len(self.block_ids)
+
+    def __iter__(self):
+        return (CorpusBlock(self, i) for i in range(len(self.block_ids)))
+
+    def block_hash(self, index: int) -> bytes:
+        return self.block_hashes[index * 32:(index + 1) * 32]
+
+    def texts(self) -> tuple:
+        """Block texts, read from the source file if not kept in memory"""
+        if self._texts is not None:
+            return self._texts
+        if self.path is None:
+            raise ValueError(f"no text loaded for {self.id}")
+        document, texts = CorpusDocument._recent
+        if document is self:
+            return texts
+        # Block positions are only meaningful for the file as it was loaded
+        st = os.stat(self.path)
+        if (st.st_size, st.st_mtime_ns) != self._stat:
+            raise ValueError(f"{self.path} changed since it was loaded")
+        doc = read_document(Path(self.path))
+        texts = tuple(b.get("text", "") for b in doc.get("blocks", []))
+        if len(texts) != len(self.block_ids):
+            raise ValueError(f"{self.path} changed since it was loaded")
+        CorpusDocument._recent = (self, texts)
+        return texts
+
+
+class Corpus:
+    """A collection of CorpusDocuments indexed by id and doc_hash"""
+
+    def __init__(self, documents: list = None):
+        self.documents = []
+        self.by_id = {}
+        self.by_hash = {}
+        for document in documents or ():
+            self.add(document)
+
+    def add(self, document: CorpusDocument):
+        self.documents.append(document)
+        self.by_id.setdefault(document.id, []).append(document)
+        if document.doc_hash != MISSING_HASH:
+            self.by_hash.setdefault(document.doc_hash, []).append(document)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def __iter__(self):
+        return iter(self.documents)
+
+    def block_count(self) -> int:
+        return sum(len(d) for d in self.documents)
+
+    def duplicate_documents(self) -> list:
+        """Groups of documents sharing a doc_hash"""
+        return [docs for docs in self.by_hash.values() if len(docs) > 1]
+
+
+def load_corpus(paths: list, keep_text: bool = False) -> Corpus:
+    """
+    Load many documents into a Corpus.
+
+    Each file is parsed and immediately reduced to a CorpusDocument, so
+    only one full document is held as nested dicts at a time.
+    Unreadable files are skipped.
+    """
+    corpus = Corpus()
+    for path in paths:
+        try:
+            st = os.stat(path)
+            doc = read_document(Path(path))
+        except (OSError, ValueError):
+            continue
+        corpus.add(CorpusDocument(doc, path=Path(path), keep_text=keep_text, stat=st))
+    return corpus
+
+
+def cmd_bench_hash(paths: list, repeat: int = 5):
+    """
+    Compare hash algorithms on real documents.
+
+    Reports raw hashing throughput over the canonical bytes that pack
+    hashes, and the full pack time per document for each algorithm.
+    """
+    docs = [read_document(p) for p in paths]
+
+    # The exact byte strings pack hashes: every block, then each document
+    payloads = []
+    for doc in docs:
+        for block in doc.get("blocks", []):
+            payloads.append(canonical_json({
+                "block_id": block["block_id"],
+                "role": block["role"],
+                "format": block["format"],
+                "text": block["text"],
+            }))
+        payloads.append(canonical_json({
+            k: v for k, v in doc.items()
+            if k not in ("doc_hash", "signature", "index")
+        }))
+    total_bytes = sum(len(p) for p in payloads)
+    block_count = sum(len(doc.get("blocks", [])) for doc in docs)
+
+    print(f"Documents: {len(docs)}  Blocks: {block_count}  "
+          f"Hashed bytes: {total_bytes / 1e6:.2f} MB  (best of {repeat})")
+    print()
+    print(f"  {'algorithm':<14}{'hash MB/s':>12}{'pack ms/doc':>14}")
+
+    for algorithm, hasher in HASH_ALGORITHMS.items():
+        hash_time = pack_time = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for payload in payloads:
+                hasher(payload).hexdigest()
+            hash_time = min(hash_time, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for doc in docs:
+                pack_document(doc, algorithm)
+            pack_time = min(pack_time, time.perf_counter() - start)
+
+        throughput = total_bytes / 1e6 / hash_time if hash_time else float("inf")
+        print(f"  {algorithm:<14}{throughput:>12.1f}{pack_time * 1000 / len(docs):>14.3f}")
+
+
+def cmd_bench_load(paths: list):
+    """Compare memory held by parsed dicts and by a compact Corpus"""
+    def measure(load):
+        tracemalloc.start()
+        loaded = load()
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return loaded, current
+
+    docs, dict_bytes = measure(
+        lambda: [read_document(p) for p in paths]
+    )
+    block_count = sum(len(doc.get("blocks", [])) for doc in docs)
+    del docs
+    _, lazy_bytes = measure(lambda: load_corpus(paths))
+    _, text_bytes = measure(lambda: load_corpus(paths, keep_text=True))
+
+    per_block = lambda n: n / block_count if block_count else 0.0
+    print(f"Documents: {len(paths)}  Blocks: {block_count}")
+    print()
+    print(f"  {'loader':<22}{'MB':>10}{'bytes/block':>14}")
+    print(f"  {'json.loads':<22}{dict_bytes / 1e6:>10.2f}{per_block(dict_bytes):>14.0f}")
+    print(f"  {'corpus (with text)':<22}{text_bytes / 1e6:>10.2f}{per_block(text_bytes):>14.0f}")
+    print(f"  {'corpus (lazy text)':<22}{lazy_bytes / 1e6:>10.2f}{per_block(lazy_bytes):>14.0f}")
+
+
+_JSON_TRICKY_STRINGS = [
+    "".join(map(chr, range(0x20))),
+    "\"\\/\x7f\u0085   ﻿￿",
+    "</script><!-- & ' \" -->",
+    "日本語のテキスト、中文文本，한국어 텍스트",
+    "😀👩‍👩‍👧 \U0001f600\U0010ffff é İ",
+]
+_JSON_TRICKY_NUMBERS = [
+    0, -1, (1 << 63) - 1, -(1 << 63), (1 << 64) - 1, 1 << 64, -(1 << 63) - 1, 10 ** 30,
+    0.0, -0.0, 1.0, 0.1, 1e16, 1e-5, 1e300, 5e-324, 123456789.125,
+]
+
+
+def generate_json_corpus(count: int, seed: int = 0) -> list:
+    """
+    Synthetic documents for the JSON backend differential check, as file bytes.
+
+    Texts mix control characters, escapes, non-BMP and CJK text, and keys
+    that sort differently by UTF-16 and UTF-8; index objects carry
+    integers around the 64-bit limits, floats, NaN and lone surrogates,
+    so both the orjson path and every stdlib fallback are exercised.
+    """
+    rng = random.Random(seed)
+    alphabet = "".join(_JSON_TRICKY_STRINGS) + "abcdefghij klmnop\n#*`"
+    corpus = []
+    for n in range(count):
+        blocks = []
+        for b in range(rng.randint(1, 12)):
+            size = rng.choice((0, 1, 40, 400, 4000))
+            text = rng.choice(_JSON_TRICKY_STRINGS) + "".join(rng.choice(alphabet) for _ in range(size))
+            blocks.append({"block_id": f"b{b}", "role": rng.choice(("body", "abstract")),
+                           "format": "markdown", "text": text})
+        doc = {
+            "medf_version": "0.2.1",
+            "id": f"generated-{n}",
+            "snapshot": "2026-01-01T00:00:00+00:00",
+            "issuer": rng.choice(_JSON_TRICKY_STRINGS),
+            "blocks": blocks,
+        }
+        kind = n % 4
+        if kind == 1:
+            doc["index"] = {"\U0001f600": 1, "｡": 2, "z": [None, True, False, {}, []],
+                            "n": rng.sample(_JSON_TRICKY_NUMBERS[:8], 3)}
+        elif kind == 2:
+            doc["index"] = {"score": rng.choice(_JSON_TRICKY_NUMBERS[8:]), "nan": float("nan")}
+        pack_document(doc)
+        if kind == 3 and n % 8 == 3:
+            # A lone surrogate can only be written escaped
+            doc["blocks"][0]["text"] += "\ud800"
+            corpus.append(json.dumps(doc, indent=2).encode("ascii"))
+        else:
+            corpus.append(json.dumps(doc, indent=2, ensure_ascii=False).encode("utf-8"))
+    return corpus
+
+
+def _json_outcomes(data: bytes) -> tuple:
+    """Everything the backends must agree on for one document, as comparable values"""
+    def attempt(func, *args):
+        try:
+            return func(*args)
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            return f"error: {type(e).__name__}"
+
+    doc = attempt(json_loads, data)
+    if isinstance(doc, str):
+        return (doc,)
+    # Type-exact rendering of the parse result (1, 1.0 and True differ)
+    parsed = attempt(lambda: json.dumps(doc, sort_keys=True, ensure_ascii=True))
+    canonical = attempt(canonical_json, doc)
+    indented = attempt(json_dumps_indented, doc)
+    algorithm = document_hash_algorithm(doc) if isinstance(doc, dict) else None
+    hashes = attempt(lambda: (
+        [compute_block_hash(b, algorithm) for b in doc["blocks"]],
+        compute_doc_hash(doc, algorithm),
+    ))
+    return parsed, canonical, indented, hashes
+
+
+def cmd_bench_json(paths: list, generate: int = 200, repeat: int = 5):
+    """
+    Differential check and benchmark of the JSON backends.
+
+    Every document (the given ones plus a generated corpus) is parsed,
+    canonicalized, hashed and re-serialized with both backends; any
+    difference is reported and the command exits 1. Then each stage, and
+    the per-document work of verify, pack and sign, is timed per backend.
+    """
+    if not HAS_ORJSON:
+        print("[Error] orjson is not installed; only the stdlib backend is available")
+        print("Install: pip install orjson")
+        sys.exit(1)
+    previous = json_backend()
+    corpus = [read_document_bytes(p) for p in paths] + generate_json_corpus(generate)
+
+    mismatches = []
+    for i, data in enumerate(corpus):
+        json_backend("stdlib")
+        expected = _json_outcomes(data)
+        json_backend("orjson")
+        if _json_outcomes(data) != expected:
+            mismatches.append(str(paths[i]) if i < len(paths) else f"generated-{i - len(paths)}")
+    print(f"Documents: {len(paths)} given + {generate} generated  "
+          f"({sum(len(d) for d in corpus) / 1e6:.2f} MB, best of {repeat})")
+    if mismatches:
+        json_backend(previous)
+        print(f"✖ Backends disagree on {len(mismatches)} document(s):")
+        for name in mismatches[:10]:
+            print(f"  {name}")
+        sys.exit(1)
+    print("✔ parse, canonical JSON, block/doc hashes and written bytes identical on every document")
+
+    # Benchmark only documents both backends can process
+    json_backend("stdlib")
+    docs = []
+    for data in corpus:
+        try:
+            doc = json_loads(data)
+            canonical_json(doc)
+        except (ValueError, TypeError):
+            continue
+        if "doc_hash" in doc:
+            docs.append((data, doc))
+    raws = [data for data, _ in docs]
+
+    def run_verify():
+        for data in raws:
+            verify_document(json_loads(data), threads=1)
+
+    def run_pack():
+        for data in raws:
+            doc = json_loads(data)
+            pack_document(doc, threads=1)
+            json_dumps_indented(doc)
+
+    def run_sign():
+        # Signing itself is backend-independent; this is its read + write
+        for data in raws:
+            json_dumps_indented(json_loads(data))
+
+    stages = [
+        ("parse", lambda: [json_loads(data) for data in raws]),
+        ("canonical_json", lambda: [canonical_json(doc) for _, doc in docs]),
+        ("write (indent=2)", lambda: [json_dumps_indented(doc) for _, doc in docs]),
+        ("verify", run_verify),
+        ("pack", run_pack),
+        ("sign (read+write)", run_sign),
+    ]
+    print()
+    print(f"  {'stage / command':<20}{'stdlib ms/doc':>15}{'orjson ms/doc':>15}{'speedup':>10}")
+    for name, func in stages:
+        best = {}
+        for backend in JSON_BACKENDS:
+            json_backend(backend)
+            best[backend] = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func()
+                best[backend] = min(best[backend], time.perf_counter() - start)
+        per_doc = {k: v * 1000 / max(len(docs), 1) for k, v in best.items()}
+        speedup = best["stdlib"] / best["orjson"] if best["orjson"] else float("inf")
+        print(f"  {name:<20}{per_doc['stdlib']:>15.3f}{per_doc['orjson']:>15.3f}{speedup:>9.1f}x")
+    json_backend(previous)
+
+
+_MARKDOWN_RULES = [
+    # Same rules, in the same order, as MEDFViewer.renderMarkdown
+    (re.compile(r"^### (.*$)", re.I | re.M), r"<h3>\1</h3>"),
+    (re.compile(r"^## (.*$)", re.I | re.M), r"<h2>\1</h2>"),
+    (re.compile(r"^# (.*$)", re.I | re.M), r"<h1>\1</h1>"),
+    (re.compile(r"\*\*(.*)\*\*", re.I | re.M), r"<strong>\1</strong>"),
+    (re.compile(r"\*(.*)\*", re.I | re.M), r"<em>\1</em>"),
+    (re.compile(r"`([^`]+)`", re.I | re.M), r"<code>\1</code>"),
+    (re.compile(r"```([\s\S]*?)```", re.I | re.M), r"<pre><code>\1</code></pre>"),
+    (re.compile(r"\[([^\]]+)\]\(([^)]+)\)", re.I | re.M), r'<a href="\2">\1</a>'),
+    (re.compile(r"^\- (.*$)", re.I | re.M), r"<li>\1</li>"),
+    (re.compile(r"(<li>.*</li>)", re.I | re.M), r"<ul>\1</ul>"),
+]
+
+
+def render_markdown_html(text: str) -> str:
+    """Render block text to the HTML fragment the reference viewer produces"""
+    if not text:
+        return ""
+    html = (
+        text.replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace(">", "&gt;")
+        .replace('"', "&quot;")
     )
+    for pattern, replacement in _MARKDOWN_RULES:
+        html = pattern.sub(replacement, html)
+    html = html.replace("\n\n", "</p><p>").replace("\n", "<br>")
+    return f"<p>{html}</p>"
 
-    print(f"[OK] Signature attached: {path}")
-    print(f"  Algorithm: ed25519")
-    print(f"  Signer: {doc['signature']['public_key'][:40]}...")
 
+def cmd_export_viewer(doc_path: Path, outdir: Path, chunk_bytes: int = VIEWER_CHUNK_BYTES):
+    """
+    Export a static viewer bundle for a verified document.
 
-def cmd_explain():
+    Writes manifest.json (metadata, verification result, block list) and
+    content-addressed chunks/<sha256>.json files holding block text,
+    block hash and pre-rendered HTML. The viewer fetches chunks as they
+    scroll into view and checks each one against its manifest SHA-256.
     """
-    Explain what MEDF verification guarantees.
+    doc = read_document(doc_path)
+    result = verify_document(doc)
+    if result["result"] != "ok":
+        print(f"[Error] Document does not verify: {result['error']}")
+        print(f"Run 'medf verify {doc_path}' for details")
+        sys.exit(1)
 
-    MEDF verification means:
-    - The text content has not been altered
-    - The document structure matches the signed hash
-    - The signature is cryptographically valid
+    blocks = doc.get("blocks", [])
+    block_hashes = list(iter_block_hashes(blocks, document_hash_algorithm(doc)))
 
-    MEDF verification does NOT mean:
-    - The signer is authoritative
-    - The content is correct
-    - The document should be trusted
+    chunk_dir = outdir / "chunks"
+    chunk_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest_blocks = []
+    chunks = []
+    pending = []
+    pending_size = 0
+
+    def flush():
+        nonlocal pending, pending_size
+        if not pending:
+            return
+        data = json.dumps({"blocks": pending}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = sha256_hex(data)
+        chunk_path = chunk_dir / f"{digest}.json"
+        if not chunk_path.exists():
+            chunk_path.write_bytes(data)
+        chunks.append({
+            "path": f"chunks/{digest}.json",
+            "sha256": digest,
+            "bytes": len(data),
+            "blocks": len(pending)
+        })
+        pending = []
+        pending_size = 0
+
+    for block, block_hash in zip(blocks, block_hashes):
+        entry = {
+            "block_id": block["block_id"],
+            "role": block["role"],
+            "format": block["format"],
+            "block_hash": block_hash,
+            "text": block["text"],
+            "html": render_markdown_html(block["text"]) if block["format"] == "markdown" else None
+        }
+        manifest_blocks.append({
+            "block_id": block["block_id"],
+            "role": block["role"],
+            "block_hash": block_hash,
+            "chunk": len(chunks)
+        })
+        pending.append(entry)
+        pending_size += len(block["text"]) * 2
+        if pending_size >= chunk_bytes:
+            flush()
+    flush()
+
+    manifest = {
+        "medf_viewer_bundle": 1,
+        "document": {
+            k: doc[k] for k in (
+                "medf_version", "id", "snapshot", "issuer", "document_type",
+                "language", "doc_hash", "signature"
+            ) if k in doc
+        },
+        "verification": result,
+        "blocks": manifest_blocks,
+        "chunks": chunks
+    }
+    manifest_data = json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
+    (outdir / "manifest.json").write_bytes(manifest_data)
+
+    # Copy the reference viewer next to the bundle when it is available
+    if VIEWER_ASSETS.is_dir():
+        for name in ("medf-viewer.js", "medf-viewer.css"):
+            (outdir / name).write_bytes((VIEWER_ASSETS / name).read_bytes())
+        index = (VIEWER_ASSETS / "index.html").read_text(encoding="utf-8")
+        index = index.replace('<html lang="en">', '<html lang="en" data-bundle="manifest.json">', 1)
+        (outdir / "index.html").write_text(index, encoding="utf-8")
+
+    print(f"[OK] Viewer bundle exported: {outdir}")
+    print(f"  Blocks: {len(manifest_blocks)}")
+    print(f"  Chunks: {len(chunks)}")
+    print(f"  Manifest SHA-256: {sha256_hex(manifest_data)[:16]}...")
+
+
+class MedfPack:
+    """
+    Read-only view of a .medfpack archive.
+
+    Layout: a 16-byte header, the stored members back to back, a
+    deflate-compressed JSON central directory, and a fixed-size footer
+    pointing at the directory. Opening an archive reads only the footer
+    and the directory; members are read on demand by offset.
     """
-    print("="*60)
-    print("What MEDF Verification Means")
-    print("="*60)
-    print()
-    print("MEDF verification means:")
-    print("✓ The text content has not been altered")
-    print("✓ The document structure matches the signed hash")
-    print("✓ The signature is cryptographically valid (if present)")
-    print()
-    print("MEDF verification does NOT mean:")
-    print("✗ The signer is authoritative")
-    print("✗ The content is correct")
-    print("✗ The document should be trusted")
-    print()
-    print("Key principles:")
-    print("• Text content is immutable once published")
-    print("• Presentation (rendering, indexing) is mutable")
-    print("• All hashing uses RFC 8785 (JSON Canonicalization Scheme)")
-    print("• MEDF does not define trust authorities or key ownership")
-    print()
-    print("For more information:")
-    print("• Philosophy: see PHILOSOPHY.md")
-    print("• Trust anchors: see docs/trust.md")
-    print("="*60)
 
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, "rb")
+        header = self._file.read(len(ARCHIVE_MAGIC) + 8)
+        if header[:len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC:
+            raise ValueError(f"not a .medfpack archive: {path}")
+        self._file.seek(-ARCHIVE_FOOTER.size, os.SEEK_END)
+        magic, dir_offset, dir_length = ARCHIVE_FOOTER.unpack(self._file.read(ARCHIVE_FOOTER.size))
+        if magic != ARCHIVE_FOOTER_MAGIC:
+            raise ValueError(f"truncated .medfpack archive: {path}")
+        self._file.seek(dir_offset)
+        directory = json.loads(zlib.decompress(self._file.read(dir_length)))
+        self.entries = directory["documents"]
+        self.by_id = {}
+        self.by_hash = {}
+        for entry in self.entries:
+            self.by_id.setdefault(entry["id"], []).append(entry)
+            self.by_hash[entry["doc_hash"]] = entry
 
-def cmd_diff(old_path: Path, new_path: Path, json_output: bool = False):
+    def find(self, key: str) -> list:
+        """Look up members by document id or doc_hash value"""
+        if key in self.by_hash:
+            return [self.by_hash[key]]
+        return self.by_id.get(key, [])
+
+    def read(self, entry: dict) -> bytes:
+        """Read and decompress one member, checking its SHA-256"""
+        self._file.seek(entry["offset"])
+        return _decode_archive_member(self._file.read(entry["stored"]), entry)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _decode_archive_member(stored: bytes, entry: dict) -> bytes:
+    data = zlib.decompress(stored) if entry["compression"] == "deflate" else stored
+    if len(data) != entry["size"] or sha256_hex(data) != entry["sha256"]:
+        raise ValueError(f"corrupt archive member: {entry['path']}")
+    return data
+
+
+def _archive_member_name(path: Path) -> str:
+    relative = os.path.relpath(path)
+    if relative.startswith(".."):
+        return path.name
+    return Path(relative).as_posix()
+
+
+def cmd_archive_create(archive_path: Path, paths: list, compression: str = "deflate"):
     """
-    Diff two MEDF documents at semantic block level.
+    Write documents into a single .medfpack archive.
 
-    Git diff is line-based.
-    MEDF diff is block-based.
+    Members are streamed to disk one at a time. Each one is deflated
+    unless that does not make it smaller, in which case it is stored.
     """
-    old_doc = json.loads(old_path.read_text(encoding="utf-8"))
-    new_doc = json.loads(new_path.read_text(encoding="utf-8"))
+    entries = []
+    seen_names = set()
+    tmp_path = archive_path.with_name(archive_path.name + ".tmp")
 
-    old_blocks = {b["block_id"]: b for b in old_doc.get("blocks", [])}
-    new_blocks = {b["block_id"]: b for b in new_doc.get("blocks", [])}
+    with open(tmp_path, "wb") as f:
+        f.write(ARCHIVE_MAGIC + struct.pack("<H6x", ARCHIVE_VERSION))
+        for path in paths:
+            data = read_document_bytes(path)
+            doc = json_loads(data)
+            if not doc.get("doc_hash"):
+                f.close()
+                tmp_path.unlink()
+                print(f"[Error] Document is not packed: {path}")
+                print(f"Run 'medf pack {path}' first")
+                sys.exit(1)
 
-    all_block_ids = set(old_blocks.keys()) | set(new_blocks.keys())
+            name = _archive_member_name(path)
+            if name in seen_names:
+                f.close()
+                tmp_path.unlink()
+                print(f"[Error] Duplicate member name: {name}")
+                sys.exit(1)
+            seen_names.add(name)
 
-    changed = []
-    unchanged = []
-    added = []
-    removed = []
+            stored, method = data, "none"
+            if compression == "deflate":
+                deflated = zlib.compress(data, 9)
+                if len(deflated) < len(data):
+                    stored, method = deflated, "deflate"
 
-    for block_id in sorted(all_block_ids):
-        if block_id in old_blocks and block_id in new_blocks:
-            old_hash = old_blocks[block_id].get("block_hash")
-            new_hash = new_blocks[block_id].get("block_hash")
+            entries.append({
+                "id": doc["id"],
+                "snapshot": doc.get("snapshot"),
+                "doc_hash": doc["doc_hash"]["value"],
+                "hash_algorithm": document_hash_algorithm(doc),
+                "path": name,
+                "offset": f.tell(),
+                "stored": len(stored),
+                "size": len(data),
+                "compression": method,
+                "sha256": sha256_hex(data)
+            })
+            f.write(stored)
 
-            if old_hash and new_hash:
-                if old_hash != new_hash:
-                    changed.append({
-                        "block_id": block_id,
-                        "before": old_hash,
-                        "after": new_hash
-                    })
-                else:
-                    unchanged.append(block_id)
-            elif not old_hash and not new_hash:
-                unchanged.append(block_id)
-        elif block_id in old_blocks and block_id not in new_blocks:
-            removed.append(block_id)
-        elif block_id not in old_blocks and block_id in new_blocks:
-            added.append(block_id)
+        # Sorted so list output and binary search by id are stable
+        entries.sort(key=lambda e: (e["id"], e["snapshot"] or "", e["doc_hash"]))
+        directory = zlib.compress(json.dumps(
+            {"version": ARCHIVE_VERSION, "documents": entries},
+            ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8"), 9)
+        dir_offset = f.tell()
+        f.write(directory)
+        f.write(ARCHIVE_FOOTER.pack(ARCHIVE_FOOTER_MAGIC, dir_offset, len(directory)))
 
-    if json_output:
-        result = {
-            "changed": changed,
-            "unchanged": unchanged,
-            "added": added,
-            "removed": removed
-        }
-        print(json.dumps(result, indent=2))
-    else:
-        if changed:
-            for item in changed:
-                print(f"Block changed: {item['block_id']}")
-                print(f"- Previous hash: {item['before'][:16]}...")
-                print(f"+ New hash:      {item['after'][:16]}...")
-                print()
+    os.replace(tmp_path, archive_path)
 
-        if unchanged:
-            for block_id in unchanged:
-                print(f"Block unchanged: {block_id}")
+    total = sum(e["size"] for e in entries)
+    size = archive_path.stat().st_size
+    print(f"[OK] Archive created: {archive_path}")
+    print(f"  Documents: {len(entries)}")
+    print(f"  Size: {size} bytes ({total} bytes uncompressed)")
 
-        if added:
-            for block_id in added:
-                print(f"Block added: {block_id}")
 
-        if removed:
-            for block_id in removed:
-                print(f"Block removed: {block_id}")
+def cmd_archive_list(archive_path: Path, json_output: bool = False):
+    """List archive members from the central directory"""
+    with MedfPack(archive_path) as pack:
+        if json_output:
+            print(json.dumps(pack.entries, indent=2, ensure_ascii=False))
+            return
+        for entry in pack.entries:
+            print(f"{entry['id']}  {entry['doc_hash'][:16]}...  "
+                  f"{entry['size']:>10}  {entry['compression']:<7}  {entry['path']}")
+        print()
+        print(f"Documents: {len(pack.entries)}")
 
-        if not (changed or added or removed):
-            print("No changes detected.")
+
+def cmd_archive_extract(archive_path: Path, outdir: Path, keys: list = None):
+    """Extract all members, or only those matching document ids / doc_hash values"""
+    with MedfPack(archive_path) as pack:
+        if keys:
+            entries = []
+            for key in keys:
+                found = pack.find(key)
+                if not found:
+                    print(f"[Error] Not in archive: {key}")
+                    sys.exit(1)
+                entries.extend(found)
+        else:
+            entries = pack.entries
+
+        for entry in entries:
+            name = Path(entry["path"])
+            if name.is_absolute() or ".." in name.parts:
+                print(f"[Error] Unsafe member path: {entry['path']}")
+                sys.exit(1)
+            target = outdir / name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(pack.read(entry))
+            print(f"  {entry['path']}")
+
+    print(f"[OK] Extracted {len(entries)} documents to {outdir}")
+
+
+def _verify_archive_member(task: tuple) -> dict:
+    """Verify one member, reading it straight from the archive"""
+    archive_path, entry = task
+    try:
+        with open(archive_path, "rb") as f:
+            f.seek(entry["offset"])
+            data = _decode_archive_member(f.read(entry["stored"]), entry)
+        doc = json_loads(data)
+    except (OSError, ValueError, zlib.error) as e:
+        return {"result": "error", "error": "unreadable_document", "detail": str(e)}
+    try:
+        result = verify_document(doc)
+    except (KeyError, TypeError, AttributeError) as e:
+        return {"result": "error", "error": "malformed_document", "detail": str(e)}
+    if result["result"] == "ok" and doc["doc_hash"]["value"] != entry["doc_hash"]:
+        return {"result": "error", "error": "directory_hash_mismatch"}
+    return result
+
+
+def cmd_archive_verify(archive_path: Path, jobs: int = None, json_output: bool = False):
+    """Verify every archive member in parallel"""
+    with MedfPack(archive_path) as pack:
+        entries = pack.entries
+    results = _run_parallel(
+        _verify_archive_member, [(str(archive_path), e) for e in entries], jobs
+    )
+    _print_batch_results([e["path"] for e in entries], results, json_output)
+
+
+def _varint(n: int) -> bytes:
+    """Unsigned LEB128, as used by multiformats and CAR framing"""
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def dag_json_cid(data: bytes) -> bytes:
+    """Binary CIDv1 (dag-json, sha2-256) of an encoded object"""
+    return CID_PREFIX + hashlib.sha256(data).digest()
+
+
+def cid_string(cid: bytes) -> str:
+    """Multibase base32 (lowercase, unpadded) form: bagu..."""
+    return "b" + base64.b32encode(cid).decode("ascii").lower().rstrip("=")
+
+
+def _car_header(root: bytes) -> bytes:
+    """Length-prefixed dag-cbor header {"roots": [root], "version": 1}"""
+    link = b"\x00" + root
+    header = (
+        b"\xa2" + b"\x65roots" + b"\x81" + b"\xd8\x2a" + b"\x58" + bytes([len(link)]) + link
+        + b"\x67version" + b"\x01"
+    )
+    return _varint(len(header)) + header
+
+
+class CarWriter:
+    """
+    Streaming CARv1 writer of dag-json objects.
+
+    Objects are written as they are added and identical objects only
+    once. Seen CIDs are kept in a temporary on-disk SQLite table, so
+    memory stays constant however many objects a corpus has. The root
+    goes in the header at the front of the file; a placeholder of the
+    same size is written first and replaced on close.
+    """
+
+    def __init__(self, f):
+        self._f = f
+        self._seen = sqlite3.connect("")
+        self._seen.execute("CREATE TABLE seen (cid BLOB PRIMARY KEY) WITHOUT ROWID")
+        self.objects = self.duplicates = 0
+        f.write(_car_header(dag_json_cid(b"")))
+
+    def add(self, obj) -> str:
+        """Write an object (unless already present); returns its CID string"""
+        data = canonical_json(obj)
+        cid = dag_json_cid(data)
+        if self._seen.execute("INSERT OR IGNORE INTO seen VALUES (?)", (cid,)).rowcount:
+            self._f.write(_varint(len(cid) + len(data)) + cid + data)
+            self.objects += 1
+        else:
+            self.duplicates += 1
+        return cid_string(cid)
+
+    def finish(self, root: str):
+        """Point the header at root (a CID string returned by add)"""
+        cid = base64.b32decode(root[1:].upper() + "=" * (-len(root[1:]) % 8))
+        self._f.seek(0)
+        self._f.write(_car_header(cid))
+        self._seen.close()
+
+
+def cmd_export_car(paths: list, car_path: Path):
+    """
+    Export documents as one CARv1 file for `ipfs dag import`.
+
+    Every block becomes a dag-json object and every document a dag-json
+    node that links its blocks, so blocks shared between documents or
+    versions are stored once. Documents are listed in manifest pages of
+    CAR_MANIFEST_PAGE entries, linked from the root object. Documents
+    are read, verified and written one at a time.
+    """
+    tmp_path = car_path.with_name(car_path.name + ".tmp")
+    pages = []
+    page = []
+    documents = blocks = 0
+    with open(tmp_path, "wb") as f:
+        car = CarWriter(f)
+        for path in paths:
+            doc = read_document(path)
+            result = verify_document(doc)
+            if result["result"] != "ok":
+                f.close()
+                tmp_path.unlink()
+                print(f"[Error] {path}: {result['error']}")
+                print("Only verified documents can be exported")
+                sys.exit(1)
+
+            links = [{"/": car.add(block)} for block in doc["blocks"]]
+            node = dict(doc, blocks=links)
+            page.append({
+                "id": doc["id"],
+                "path": _archive_member_name(path),
+                "doc_hash": doc["doc_hash"]["value"],
+                "hash_algorithm": document_hash_algorithm(doc),
+                "document": {"/": car.add(node)},
+            })
+            documents += 1
+            blocks += len(links)
+            if len(page) == CAR_MANIFEST_PAGE:
+                pages.append({"/": car.add({"documents": page})})
+                page = []
+        if page or not pages:
+            pages.append({"/": car.add({"documents": page})})
+        root = car.add({"medf_car": CAR_MANIFEST_VERSION, "documents": documents, "manifest": pages})
+        car.finish(root)
+    os.replace(tmp_path, car_path)
+
+    print(f"[OK] CAR written: {car_path}")
+    print(f"  Documents: {documents}  Blocks: {blocks}")
+    print(f"  Objects: {car.objects} ({car.duplicates} duplicates skipped)")
+    print(f"  Size: {car_path.stat().st_size} bytes")
+    print(f"  Root: {root}")
+    print(f"Import with: ipfs dag import {car_path}")
 
 
 def print_usage():
@@ -587,8 +5192,25 @@ def print_usage():
     print("  init        Initialize a MEDF document skeleton")
     print("  import      Import a Markdown file to MEDF format")
     print("  pack        Generate hashes for blocks and the document")
+    print("  index-gen   Build/update the presentation index (TOC, word counts, summaries)")
     print("  diff        Diff two MEDF documents at block level")
+    print("  watch       Re-import / re-pack documents as they change")
+    print("  stream      Verify or pack NDJSON documents from stdin")
+    print("  cache       Inspect or invalidate a verification result cache")
+    print("  bench       Benchmark hashing or corpus memory on your documents")
+    print("  audit       Scan a corpus for hash, signature, schema and duplicate problems")
+    print("  refs        Maintain the reverse index of block references")
+    print("  impact      List (and re-verify) documents citing changed blocks")
+    print("  resolve     Resolve block references locally, or fetch them with --fetch")
+    print("  dedup       Find near-duplicate blocks across documents (MinHash/LSH)")
+    print("  db          Sync documents into a SQLite store and query metadata")
+    print("  migrate     Convert legacy content documents to the block format")
+    print("  archive     Create, list, extract, or verify .medfpack archives")
+    print("  export-viewer  Export a lazily loaded viewer bundle for a document")
+    print("  export-car  Export documents and blocks as one CARv1 file for IPFS")
     print("  sign        Attach a cryptographic signature to the document hash")
+    print("  agent       Hold a signing key in memory and sign over a Unix socket")
+    print("  log         Append-only Merkle log of signatures (append, prove, check, head)")
     print("  verify      Verify hashes and signatures")
     print("  explain     Explain what MEDF verification means")
     print()
@@ -600,9 +5222,42 @@ def print_usage():
     print("  --type <type>    Set document type (default: philosophy)")
     print("  --no-pack        Skip automatic hashing after import")
     print()
+    print("PACK OPTIONS (pack, import, stream pack):")
+    print("  --algorithm <name>  Hash algorithm: sha-256 (default) or blake2b-256.")
+    print("                      Repacking keeps the document's recorded algorithm.")
+    print()
+    print("PACK / VERIFY TUNING (single document):")
+    print("  --threads <n>       Threads for block hashing (default: automatic for")
+    print("                      documents over 8M characters; 1 disables)")
+    print("  --timings           Print per-stage timings and block hashing speedup")
+    print()
+    print("WATCH OPTIONS:")
+    print("  --debounce <sec>  Wait for saves to settle (default: 0.3)")
+    print("  --poll            Poll instead of using inotify")
+    print("  --json            Emit one JSON event per line")
+    print()
+    print("STREAM OPTIONS:")
+    print("  --jobs <n>        Worker processes (default: CPU count)")
+    print("  --unordered       Write results as they finish, not in input order")
+    print()
     print("VERIFICATION OPTIONS:")
     print("  --explain    Explain verification results in plain language")
     print("  --json      Output verification results as JSON")
+    print("  --jobs <n>  Worker processes when verifying several documents")
+    print("  --cache <db>")
+    print("              Reuse results for unchanged files from a SQLite cache")
+    print("  --cache-max-entries <n>")
+    print("              Keep at most n cached results (default: 1000000)")
+    print("  --changed-since <rev>")
+    print("              Verify only .medf.json files added/modified since a git revision")
+    print("  --expect-changed <block_id,...>")
+    print("              With --changed-since, fail if other blocks of a modified")
+    print("              document differ from the base revision")
+    print()
+    print("SIGNING OPTIONS:")
+    print("  --key <path>       Private key file (raw or base64 ed25519 seed)")
+    print("  --agent            Sign through a running 'medf agent'")
+    print("  --socket <path>    Agent socket (default: $MEDF_AGENT_SOCK or ~/.medf/agent.sock)")
     print()
     print("NOTES:")
     print("  • Text content in MEDF blocks is immutable once published.")
@@ -616,17 +5271,76 @@ def print_usage():
     print("  medf import DRAFT.md --no-pack")
     print("  medf init > document.medf.json")
     print("  medf pack document.medf.json")
+    print("  medf pack document.medf.json --algorithm blake2b-256")
+    print("  medf bench hash examples/")
+    print("  medf export-viewer document.medf.json site/document")
+    print("  medf archive create release.medfpack archive/")
+    print("  medf audit archive/ --csv --output audit.csv")
+    print("  medf db sync archive/ && medf db query --type guideline --role abstract")
+    print("  medf refs index archive/ && medf impact archive/paper-b.medf.json --verify")
     print("  medf diff v1.medf.json v2.medf.json")
+    print("  medf watch docs/ --json")
+    print("  medf stream verify < documents.ndjson > results.ndjson")
     print("  medf verify document.medf.json")
     print("  medf verify document.medf.json --explain")
     print("  medf verify document.medf.json --json")
+    print("  medf verify examples/*.medf.json --jobs 4")
+    print("  medf verify --changed-since origin/main")
+    print("  medf verify archive/ --cache ~/.medf/verify-cache.sqlite")
+    print("  medf cache prune --cache ~/.medf/verify-cache.sqlite --max-entries 100000")
     print("  medf sign document.medf.json --key private.key")
+    print("  medf agent --key private.key &")
+    print("  medf sign a.medf.json b.medf.json --agent")
     print("  medf explain")
     print()
     print("For more information:")
     print("  https://github.com/maskin/medf")
 
 
+def _option_value(name: str, default=None):
+    """Return the value following an option flag, or default"""
+    if name in sys.argv:
+        idx = sys.argv.index(name)
+        if idx + 1 < len(sys.argv):
+            return sys.argv[idx + 1]
+    return default
+
+
+def _positional_args(value_options=()) -> list:
+    """Return non-option arguments after the command name"""
+    args = []
+    skip = False
+    for arg in sys.argv[2:]:
+        if skip:
+            skip = False
+        elif arg in value_options:
+            skip = True
+        elif not arg.startswith("--"):
+            args.append(arg)
+    return args
+
+
+def _hash_algorithm_option():
+    """Return --algorithm if given, None if absent, or False after an error"""
+    algorithm = _option_value("--algorithm")
+    if algorithm is not None and algorithm not in HASH_ALGORITHMS:
+        print(f"[Error] Unsupported hash algorithm: {algorithm}")
+        print(f"Available: {', '.join(HASH_ALGORITHMS)}")
+        return False
+    return algorithm
+
+
+def _expand_document_paths(paths: list) -> list:
+    """Replace directories with the (possibly compressed) documents beneath them"""
+    expanded = []
+    for path in paths:
+        if path.is_dir():
+            expanded.extend(sorted(p for p in path.rglob("*.medf.json*") if is_document_path(p.name)))
+        else:
+            expanded.append(path)
+    return expanded
+
+
 def main():
     if len(sys.argv) < 2:
         print_usage()
@@ -650,7 +5364,7 @@ def main():
         cmd_init()
     elif cmd == "import":
         if len(sys.argv) < 3:
-            print("usage: medf import <markdown.md> [--type <document-type>] [--no-pack]")
+            print("usage: medf import <markdown.md> [--type <document-type>] [--no-pack] [--compress gzip|zstd]")
             return
         path = Path(sys.argv[2])
         doc_type = "philosophy"
@@ -661,16 +5375,50 @@ def main():
                 doc_type = sys.argv[type_idx + 1]
         if "--no-pack" in sys.argv:
             auto_pack = False
-        cmd_import(path, doc_type=doc_type, auto_pack=auto_pack)
+        algorithm = _hash_algorithm_option()
+        if algorithm is False:
+            return
+        compression = _option_value("--compress")
+        if compression not in (None, "gzip", "zstd"):
+            print(f"[Error] Unsupported compression: {compression}")
+            return
+        if compression == "zstd" and not HAS_ZSTD:
+            print("[Error] zstd compression needs the zstandard package")
+            print("Install: pip install zstandard")
+            return
+        cmd_import(path, doc_type=doc_type, auto_pack=auto_pack, algorithm=algorithm,
+                   compression=compression)
     elif cmd == "pack":
-        if len(sys.argv) < 3:
-            print("usage: medf pack <document.medf>")
+        paths = [Path(p) for p in _positional_args(("--algorithm", "--threads", "--metrics"))]
+        if not paths:
+            print("usage: medf pack <document.medf> [...] [--metrics <file.prom>]")
             return
-        path = Path(sys.argv[2])
-        if not path.exists():
-            print(f"[Error] File not found: {path}")
+        for path in paths:
+            if not path.exists():
+                print(f"[Error] File not found: {path}")
+                return
+        algorithm = _hash_algorithm_option()
+        if algorithm is False:
             return
-        cmd_pack(path)
+        threads = _option_value("--threads")
+        metrics_path = _option_value("--metrics")
+        metrics = RunMetrics("pack") if metrics_path else None
+        failed = 0
+        try:
+            for path in _expand_document_paths(paths):
+                packed = cmd_pack(
+                    path, algorithm,
+                    threads=int(threads) if threads else None,
+                    show_timings="--timings" in sys.argv,
+                    metrics=metrics
+                )
+                failed += not packed
+        finally:
+            # Failed runs are exactly the ones worth recording
+            if metrics is not None:
+                metrics.write(Path(metrics_path))
+        if failed:
+            sys.exit(1)
     elif cmd == "hash":
         # Legacy support for old 'hash' command
         if len(sys.argv) < 3:
@@ -686,27 +5434,365 @@ def main():
     elif cmd == "verify":
         explain = "--explain" in sys.argv
         json_output = "--json" in sys.argv
-        if len(sys.argv) < 3:
-            print("usage: medf verify <document.medf> [--explain] [--json]")
+        jobs = int(_option_value("--jobs", 0)) or None
+        base_rev = _option_value("--changed-since")
+        paths = [Path(p) for p in _positional_args(
+            ("--changed-since", "--expect-changed", "--jobs", "--cache", "--cache-max-entries",
+             "--threads", "--metrics")
+        )]
+        if base_rev:
+            expected = _option_value("--expect-changed")
+            expected_blocks = set(expected.split(",")) if expected is not None else None
+            cmd_verify_changed(base_rev, expected_blocks, jobs=jobs, json_output=json_output)
             return
-        path = Path(sys.argv[2])
-        if not path.exists():
-            print(f"[Error] File not found: {path}")
+        if not paths:
+            print("usage: medf verify <document.medf> [...] [--explain] [--json] [--jobs <n>] "
+                  "[--metrics <file.prom>]")
+            print("       medf verify <bundle.zip|bundle.tar.gz> [--json] [--jobs <n>]")
+            print("       medf verify --changed-since <rev> [--expect-changed <block_id,...>] [--json]")
+            return
+        for path in paths:
+            if not path.exists():
+                print(f"[Error] File not found: {path}")
+                return
+        if len(paths) == 1 and is_bundle_path(paths[0]):
+            cmd_verify_bundle(paths[0], jobs=jobs, json_output=json_output)
             return
-        cmd_verify(path, explain=explain, json_output=json_output)
+        paths = _expand_document_paths(paths)
+        cache_path = _option_value("--cache")
+        cache = VerifyCache(Path(cache_path)) if cache_path else None
+        metrics_path = _option_value("--metrics")
+        metrics_path = Path(metrics_path) if metrics_path else None
+        cache_max_entries = int(_option_value("--cache-max-entries", DEFAULT_CACHE_MAX_ENTRIES))
+        if len(paths) == 1 and not paths[0].is_dir():
+            threads = _option_value("--threads")
+            result = cmd_verify(
+                paths[0], explain=explain, json_output=json_output, cache=cache,
+                threads=int(threads) if threads else None,
+                show_timings="--timings" in sys.argv, metrics_path=metrics_path,
+                cache_max_entries=cache_max_entries
+            )
+            if result.get("result") != "ok":
+                sys.exit(1)
+        else:
+            cmd_verify_batch(
+                paths, jobs=jobs, json_output=json_output, cache=cache,
+                cache_max_entries=cache_max_entries, metrics_path=metrics_path
+            )
     elif cmd == "sign":
-        if len(sys.argv) < 4:
-            print("usage: medf sign <document.medf> --key <private-key>")
+        paths = [Path(p) for p in _positional_args(("--key", "--socket", "--log"))]
+        key_value = _option_value("--key")
+        log_value = _option_value("--log")
+        log_path = Path(log_value) if log_value else None
+        use_agent = "--agent" in sys.argv
+        if not paths or not (key_value or use_agent):
+            print("usage: medf sign <document.medf> [...] --key <private-key> [--log <log.db>]")
+            print("       medf sign <document.medf> [...] --agent [--socket <path>] [--log <log.db>]")
             return
-        path = Path(sys.argv[2])
-        key_path = Path(sys.argv[4])
-        if not path.exists():
-            print(f"[Error] File not found: {path}")
+        for path in paths:
+            if not path.exists():
+                print(f"[Error] File not found: {path}")
+                return
+        if use_agent:
+            socket_path = Path(_option_value("--socket") or default_agent_socket())
+            cmd_sign(paths, agent_socket=socket_path, log_path=log_path)
+        else:
+            key_path = Path(key_value)
+            if not key_path.exists():
+                print(f"[Error] Key file not found: {key_path}")
+                return
+            cmd_sign(paths, key_path=key_path, log_path=log_path)
+    elif cmd == "log":
+        args = _positional_args(("--log", "--size", "--consistency", "--root", "--old-root", "--document"))
+        log_path = Path(_option_value("--log", DEFAULT_TRANSPARENCY_LOG))
+        size = _option_value("--size")
+        size = int(size) if size is not None else None
+        action = args[0] if args else None
+        if action == "append" and len(args) > 1:
+            paths = [Path(p) for p in args[1:]]
+            for path in paths:
+                if not path.exists():
+                    print(f"[Error] File not found: {path}")
+                    return
+            cmd_log_append(log_path, _expand_document_paths(paths))
+        elif action == "prove" and (len(args) > 1 or _option_value("--consistency") is not None):
+            old_size = _option_value("--consistency")
+            cmd_log_prove(
+                log_path, target=args[1] if len(args) > 1 else None,
+                old_size=int(old_size) if old_size is not None else None, size=size
+            )
+        elif action == "check" and len(args) > 1:
+            document = _option_value("--document")
+            cmd_log_check(
+                Path(args[1]), root=_option_value("--root"), old_root=_option_value("--old-root"),
+                doc_path=Path(document) if document else None
+            )
+        elif action == "head":
+            cmd_log_head(log_path, json_output="--json" in sys.argv)
+        else:
+            print("usage: medf log append <document.medf|dir> [...] [--log <log.db>]")
+            print("       medf log prove <document.medf|doc_hash> [--size <n>] [--log <log.db>]")
+            print("       medf log prove --consistency <old-size> [--size <n>] [--log <log.db>]")
+            print("       medf log check <proof.json> [--root <hex>] [--old-root <hex>] [--document <doc>]")
+            print("       medf log head [--json] [--log <log.db>]")
+    elif cmd == "agent":
+        key_value = _option_value("--key")
+        if not key_value:
+            print("usage: medf agent --key <private-key> [--socket <path>]")
             return
+        key_path = Path(key_value)
         if not key_path.exists():
             print(f"[Error] Key file not found: {key_path}")
             return
-        cmd_sign(path, key_path)
+        socket_path = Path(_option_value("--socket") or default_agent_socket())
+        cmd_agent(key_path, socket_path)
+    elif cmd == "cache":
+        args = _positional_args(("--cache", "--max-entries"))
+        cache_path = _option_value("--cache")
+        if not args or args[0] not in ("stats", "clear", "prune") or not cache_path:
+            print("usage: medf cache stats|clear|prune --cache <db> [--max-entries <n>] [paths...]")
+            return
+        max_entries = _option_value("--max-entries")
+        cmd_cache(
+            args[0], Path(cache_path), paths=args[1:],
+            max_entries=int(max_entries) if max_entries is not None else None
+        )
+    elif cmd == "bench":
+        args = _positional_args(("--repeat", "--generate"))
+        if args[:1] == ["json"]:
+            paths = _expand_document_paths([Path(p) for p in args[1:]])
+            cmd_bench_json(paths, generate=int(_option_value("--generate", 200)),
+                           repeat=int(_option_value("--repeat", 5)))
+            return
+        if len(args) < 2 or args[0] not in ("hash", "load"):
+            print("usage: medf bench hash|load <document.medf.json> [...] [--repeat <n>]")
+            print("       medf bench json [<document.medf.json|dir> ...] [--generate <n>] [--repeat <n>]")
+            return
+        paths = _expand_document_paths([Path(p) for p in args[1:]])
+        for path in paths:
+            if not path.exists():
+                print(f"[Error] File not found: {path}")
+                return
+        if args[0] == "load":
+            cmd_bench_load(paths)
+        else:
+            cmd_bench_hash(paths, repeat=int(_option_value("--repeat", 5)))
+    elif cmd == "audit":
+        args = _positional_args(("--jobs", "--cache", "--output"))
+        if not args:
+            print("usage: medf audit <dir|document.medf.json> [...] [--jobs <n>] [--json|--csv] [--output <file>] [--cache <db>]")
+            return
+        paths = _expand_document_paths([Path(p) for p in args])
+        for path in paths:
+            if not path.exists():
+                print(f"[Error] File not found: {path}")
+                return
+        output_path = _option_value("--output")
+        output_format = "json" if "--json" in sys.argv else "csv" if "--csv" in sys.argv else None
+        if output_format is None and output_path:
+            output_format = "csv" if output_path.endswith(".csv") else "json"
+        jobs = _option_value("--jobs")
+        cache_path = _option_value("--cache")
+        cmd_audit(
+            paths, jobs=int(jobs) if jobs else None, output_format=output_format,
+            output_path=Path(output_path) if output_path else None,
+            cache=AuditCache(Path(cache_path)) if cache_path else None
+        )
+    elif cmd == "refs":
+        args = _positional_args(("--index",))
+        if len(args) < 2 or args[0] != "index":
+            print("usage: medf refs index <dir|document.medf.json> [...] [--index <db>] [--force] [--baseline]")
+            return
+        paths = _expand_document_paths([Path(p) for p in args[1:]])
+        cmd_refs_index(
+            paths, Path(_option_value("--index", DEFAULT_REFS_INDEX)),
+            force="--force" in sys.argv, baseline="--baseline" in sys.argv
+        )
+    elif cmd == "impact":
+        args = _positional_args(("--index", "--jobs"))
+        if not args:
+            print("usage: medf impact <document.medf.json> [--index <db>] [--verify] [--jobs <n>] [--json] [--ack]")
+            return
+        doc_path = Path(args[0])
+        if not doc_path.exists():
+            print(f"[Error] File not found: {doc_path}")
+            return
+        jobs = _option_value("--jobs")
+        cmd_impact(
+            doc_path, Path(_option_value("--index", DEFAULT_REFS_INDEX)),
+            verify="--verify" in sys.argv, jobs=int(jobs) if jobs else None,
+            json_output="--json" in sys.argv, ack="--ack" in sys.argv
+        )
+    elif cmd == "resolve":
+        args = _positional_args(("--block", "--path", "--jobs"))
+        if not args:
+            print("usage: medf resolve <document.medf.json> [--block <block_id>] [--fetch] "
+                  "[--path <dir>[:<dir>...]] [--jobs <n>] [--list-all] [--json]")
+            return
+        doc_path = Path(args[0])
+        if not doc_path.exists():
+            print(f"[Error] File not found: {doc_path}")
+            return
+        search_paths = [p for p in (_option_value("--path") or "").split(os.pathsep) if p]
+        jobs = _option_value("--jobs")
+        cmd_resolve(
+            doc_path, block_id=_option_value("--block"), search_paths=search_paths,
+            fetch="--fetch" in sys.argv, list_all="--list-all" in sys.argv,
+            jobs=int(jobs) if jobs else None, json_output="--json" in sys.argv
+        )
+    elif cmd == "dedup":
+        args = _positional_args(("--index", "--threshold", "--jobs"))
+        if not args:
+            print("usage: medf dedup <dir|document.medf.json> [...] [--index <db>] [--threshold <0-1>] [--jobs <n>] [--json]")
+            return
+        paths = _expand_document_paths([Path(p) for p in args])
+        jobs = _option_value("--jobs")
+        cmd_dedup(
+            paths, Path(_option_value("--index", DEFAULT_DEDUP_INDEX)),
+            threshold=float(_option_value("--threshold", DEDUP_THRESHOLD)),
+            jobs=int(jobs) if jobs else None, json_output="--json" in sys.argv
+        )
+    elif cmd == "db":
+        value_options = ("--db", "--id", "--issuer", "--type", "--after", "--before",
+                         "--role", "--block-hash", "--doc-hash", "--limit")
+        args = _positional_args(value_options)
+        db_path = Path(_option_value("--db", DEFAULT_CORPUS_DB))
+        if args[:1] == ["sync"] and len(args) > 1:
+            cmd_db_sync(_expand_document_paths([Path(p) for p in args[1:]]), db_path)
+        elif args == ["query"]:
+            filters = {
+                key: _option_value(option)
+                for key, option in (
+                    ("id", "--id"), ("issuer", "--issuer"), ("document_type", "--type"),
+                    ("after", "--after"), ("before", "--before"), ("role", "--role"),
+                    ("block_hash", "--block-hash"), ("doc_hash", "--doc-hash")
+                )
+                if _option_value(option) is not None
+            }
+            limit = _option_value("--limit")
+            cmd_db_query(
+                db_path, filters, blocks="--blocks" in sys.argv,
+                limit=int(limit) if limit else None, json_output="--json" in sys.argv
+            )
+        else:
+            print("usage: medf db sync <dir|document.medf.json> [...] [--db <path>]")
+            print("       medf db query [--db <path>] [--id <id>] [--issuer <issuer>] [--type <document_type>]")
+            print("                     [--after <snapshot>] [--before <snapshot>] [--role <role>]")
+            print("                     [--block-hash <hash>] [--doc-hash <hash>] [--blocks] [--limit <n>] [--json]")
+    elif cmd == "migrate":
+        args = _positional_args(("--jobs", "--algorithm"))
+        if len(args) < 2:
+            print("usage: medf migrate <legacy-dir> <out-dir> [--jobs <n>] [--algorithm <name>]")
+            return
+        source_dir = Path(args[0])
+        if not source_dir.is_dir():
+            print(f"[Error] Directory not found: {source_dir}")
+            return
+        algorithm = _hash_algorithm_option()
+        if algorithm is False:
+            return
+        jobs = _option_value("--jobs")
+        cmd_migrate(source_dir, Path(args[1]), jobs=int(jobs) if jobs else None, algorithm=algorithm)
+    elif cmd == "index-gen":
+        paths = [Path(p) for p in _positional_args()]
+        if not paths:
+            print("usage: medf index-gen <document.medf|dir> [...] [--json]")
+            return
+        for path in paths:
+            if not path.exists():
+                print(f"[Error] File not found: {path}")
+                return
+        cmd_index_gen(_expand_document_paths(paths), json_output="--json" in sys.argv)
+    elif cmd == "archive":
+        args = _positional_args(("--jobs", "--compression"))
+        usage = "usage: medf archive create|list|extract|verify <archive.medfpack> [...]"
+        if len(args) < 2 or args[0] not in ("create", "list", "extract", "verify"):
+            print(usage)
+            return
+        action, archive_path = args[0], Path(args[1])
+        if action == "create":
+            paths = _expand_document_paths([Path(p) for p in args[2:]])
+            if not paths:
+                print("usage: medf archive create <archive.medfpack> <document.medf.json|dir> [...] [--compression deflate|none]")
+                return
+            for path in paths:
+                if not path.exists():
+                    print(f"[Error] File not found: {path}")
+                    return
+            compression = _option_value("--compression", "deflate")
+            if compression not in ("deflate", "none"):
+                print(f"[Error] Unsupported compression: {compression}")
+                return
+            cmd_archive_create(archive_path, paths, compression)
+            return
+        if not archive_path.exists():
+            print(f"[Error] File not found: {archive_path}")
+            return
+        if action == "list":
+            cmd_archive_list(archive_path, json_output="--json" in sys.argv)
+        elif action == "extract":
+            if len(args) < 3:
+                print("usage: medf archive extract <archive.medfpack> <outdir> [id|doc_hash ...]")
+                return
+            cmd_archive_extract(archive_path, Path(args[2]), keys=args[3:])
+        else:
+            jobs = _option_value("--jobs")
+            cmd_archive_verify(
+                archive_path, jobs=int(jobs) if jobs else None,
+                json_output="--json" in sys.argv
+            )
+    elif cmd == "export-viewer":
+        args = _positional_args(("--chunk-size",))
+        if len(args) < 2:
+            print("usage: medf export-viewer <document.medf.json> <outdir> [--chunk-size <bytes>]")
+            return
+        doc_path = Path(args[0])
+        if not doc_path.exists():
+            print(f"[Error] File not found: {doc_path}")
+            return
+        cmd_export_viewer(
+            doc_path, Path(args[1]),
+            chunk_bytes=int(_option_value("--chunk-size", VIEWER_CHUNK_BYTES))
+        )
+    elif cmd == "export-car":
+        args = _positional_args(("--output",))
+        if not args:
+            print("usage: medf export-car <dir|document.medf.json> [...] [--output <file.car>]")
+            return
+        paths = [Path(p) for p in args]
+        for path in paths:
+            if not path.exists():
+                print(f"[Error] File not found: {path}")
+                return
+        default = f"{paths[0].resolve().name.split('.')[0]}.car"
+        cmd_export_car(_expand_document_paths(paths), Path(_option_value("--output", default)))
+    elif cmd == "stream":
+        args = _positional_args(("--jobs", "--algorithm"))
+        if not args or args[0] not in ("verify", "pack"):
+            print("usage: medf stream verify|pack [--jobs <n>] [--unordered] < documents.ndjson")
+            return
+        algorithm = _hash_algorithm_option()
+        if algorithm is False:
+            return
+        cmd_stream(
+            args[0],
+            jobs=int(_option_value("--jobs", 0)) or None,
+            ordered="--unordered" not in sys.argv,
+            algorithm=algorithm
+        )
+    elif cmd == "watch":
+        args = _positional_args(("--type", "--debounce"))
+        root = Path(args[0]) if args else Path(".")
+        if not root.is_dir():
+            print(f"[Error] Directory not found: {root}")
+            return
+        cmd_watch(
+            root,
+            doc_type=_option_value("--type", "philosophy"),
+            debounce=float(_option_value("--debounce", 0.3)),
+            poll="--poll" in sys.argv,
+            json_output="--json" in sys.argv
+        )
     elif cmd == "explain":
         cmd_explain()
     elif cmd == "diff":
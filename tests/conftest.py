@@ -0,0 +1,21 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+MEDF = ROOT / "medf.py"
+
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def run_medf():
+    """Run the medf CLI; returns the CompletedProcess"""
+    def run(*args, input=None, cwd=None, timeout=60):
+        return subprocess.run(
+            [sys.executable, str(MEDF), *map(str, args)],
+            input=input, capture_output=True, cwd=cwd, timeout=timeout
+        )
+    return run
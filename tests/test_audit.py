@@ -0,0 +1,22 @@
+import medf
+
+
+def test_imported_document_has_no_schema_issues(tmp_path, run_medf):
+    source = tmp_path / "notes.md"
+    source.write_text("# Notes\n\n## First\n\nOne.\n\n## Second\n\nTwo.\n", encoding="utf-8")
+    result = run_medf("import", source)
+    assert result.returncode == 0, result.stdout
+
+    record = medf.audit_document(str(tmp_path / "notes.medf.json"))
+    assert record["schema_errors"] == []
+    assert record["issues"] == []
+
+
+def test_language_is_declared_but_unknown_fields_are_not(tmp_path):
+    doc = medf.markdown_to_document("## Body\n\nText.", "doc")
+    doc["language"] = "en"
+    medf.pack_document(doc)
+    assert medf.schema_errors(doc) == []
+
+    doc["colour"] = "blue"
+    assert medf.schema_errors(doc) != []
@@ -0,0 +1,48 @@
+import gzip
+import json
+
+import medf
+
+
+def _document():
+    doc = {
+        "medf_version": "0.2.1",
+        "id": "doc",
+        "blocks": [{"block_id": "a", "role": "body", "format": "markdown", "text": "Compressed text. " * 50}],
+    }
+    medf.pack_document(doc)
+    return doc
+
+
+def test_truncated_gzip_is_an_unreadable_result(tmp_path):
+    data = gzip.compress(json.dumps(_document()).encode())
+    path = tmp_path / "doc.medf.json.gz"
+    path.write_bytes(data[: len(data) // 2])
+
+    assert medf._load_and_verify(str(path))["error"] == "unreadable_document"
+    assert medf.audit_document(str(path))["status"] == "unreadable"
+
+
+def test_watch_repacks_compressed_documents_in_place(tmp_path):
+    doc = _document()
+    doc["blocks"][0]["text"] = "Edited."
+    path = tmp_path / "doc.medf.json.gz"
+    path.write_bytes(gzip.compress(json.dumps(doc).encode()))
+    assert medf._is_watched_file(path.name)
+
+    event = medf._watch_process(path, "philosophy", {})
+    assert event["event"] == "repacked"
+    assert path.read_bytes()[:2] == medf.GZIP_MAGIC
+    assert medf.verify_document(medf.read_document(path))["result"] == "ok"
+    assert [p.name for p in tmp_path.iterdir()] == [path.name]
+    # The write is a fixpoint: processing it again changes nothing
+    assert medf._watch_process(path, "philosophy", {}) is None
+
+
+def test_compressed_write_matches_stdlib_encoding(tmp_path):
+    doc = _document()
+    doc["blocks"].append({"block_id": "b", "role": "body", "format": "markdown", "text": "é\n\u0001 \U0001f600"})
+    doc["index"] = {"presentation": {"blocks": [], "words": 3}, "empty": {}}
+    path = tmp_path / "doc.medf.json.gz"
+    medf.write_document(path, doc)
+    assert gzip.decompress(path.read_bytes()) == json.dumps(doc, indent=2, ensure_ascii=False).encode()
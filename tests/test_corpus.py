@@ -0,0 +1,44 @@
+import json
+import os
+
+import pytest
+
+import medf
+
+
+def _write(path, texts):
+    doc = {
+        "medf_version": "0.2.1",
+        "id": path.stem,
+        "blocks": [
+            {"block_id": f"b{i}", "role": "body", "format": "markdown", "text": text}
+            for i, text in enumerate(texts)
+        ],
+    }
+    medf.pack_document(doc)
+    path.write_text(json.dumps(doc), encoding="utf-8")
+
+
+def test_lazy_texts_parse_each_file_once(tmp_path, monkeypatch):
+    paths = [tmp_path / f"d{n}.medf.json" for n in range(2)]
+    for n, path in enumerate(paths):
+        _write(path, [f"doc {n} block {i}" for i in range(50)])
+    corpus = medf.load_corpus(paths)
+
+    reads = []
+    read_document = medf.read_document
+    monkeypatch.setattr(medf, "read_document", lambda p: reads.append(p) or read_document(p))
+    for n, document in enumerate(corpus):
+        assert [block.text for block in document] == [f"doc {n} block {i}" for i in range(50)]
+    assert len(reads) == 2
+
+
+def test_lazy_text_refuses_changed_file(tmp_path):
+    path = tmp_path / "doc.medf.json"
+    _write(path, ["first", "second"])
+    [document] = medf.load_corpus([path])
+    _write(path, ["inserted", "first", "second"])
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    with pytest.raises(ValueError, match="changed since it was loaded"):
+        list(document)[0].text
@@ -0,0 +1,42 @@
+import json
+import os
+
+import medf
+
+
+def _write(path, doc, mtime_ns=None):
+    path.write_text(json.dumps(doc), encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_sync_refreshes_document_row_after_signing(tmp_path):
+    doc = {
+        "medf_version": "0.2.1",
+        "id": "doc",
+        "issuer": "example",
+        "blocks": [{"block_id": "a", "role": "body", "format": "markdown", "text": "Text."}],
+    }
+    medf.pack_document(doc)
+    path = tmp_path / "doc.medf.json"
+    _write(path, doc, 1_000_000_000)
+
+    store = medf.CorpusDB(tmp_path / "corpus.db")
+    try:
+        assert store.sync([path])["added"] == 1
+        assert store.documents()[0]["signed"] == 0
+
+        # Signing changes fields outside doc_hash only
+        doc["signature"] = {"algorithm": "ed25519", "value": "c2ln", "public_key": "a2V5"}
+        _write(path, doc, 2_000_000_000)
+        counts = store.sync([path])
+        assert counts["updated"] == 1
+        [row] = store.documents()
+        assert row["signed"] == 1 and row["doc_hash"] == doc["doc_hash"]["value"]
+        assert store.count() == (1, 1)
+
+        # Touching the file without changes is still unchanged
+        os.utime(path, ns=(3_000_000_000, 3_000_000_000))
+        assert store.sync([path])["unchanged"] == 1
+    finally:
+        store.close()
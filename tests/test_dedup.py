@@ -0,0 +1,48 @@
+import json
+import struct
+
+import medf
+
+
+def _write(path, texts):
+    doc = {
+        "medf_version": "0.2.1",
+        "id": path.stem,
+        "blocks": [
+            {"block_id": f"b{i}", "role": "body", "format": "markdown", "text": text}
+            for i, text in enumerate(texts)
+        ],
+    }
+    path.write_text(json.dumps(doc), encoding="utf-8")
+    return path
+
+
+def _clusters(tmp_path, paths):
+    index = medf.DedupIndex(tmp_path / "dedup.db")
+    try:
+        index.update(paths, jobs=1)
+        return [sorted(b["block_id"] for b in c) for c in index.clusters()]
+    finally:
+        index.close()
+
+
+def test_short_blocks_do_not_cluster(tmp_path):
+    path = _write(tmp_path / "doc.medf.json", ["", "", "Hi", "Hi there", "---"])
+    assert _clusters(tmp_path, [path]) == []
+
+
+def test_pairs_not_involving_bucket_head_are_found(tmp_path, monkeypatch):
+    n = medf.MINHASH_PERMUTATIONS
+    rows = medf.DedupIndex.ROWS_PER_BAND
+    # y and z differ in one row of 12 bands (52/64 equal); x shares only the
+    # other 4 bands with them, so in every bucket y and z meet, x is the head
+    shared = list(range(1000, 1000 + n))
+    shared_rows = 4 * rows
+    crafted = {
+        "x": shared[:shared_rows] + list(range(n - shared_rows)),
+        "y": shared,
+        "z": [v + 5000 if i >= shared_rows and i % rows == 0 else v for i, v in enumerate(shared)],
+    }
+    monkeypatch.setattr(medf, "minhash_signature", lambda text: struct.pack(f"<{n}I", *crafted[text]))
+    path = _write(tmp_path / "doc.medf.json", ["x", "y", "z"])
+    assert _clusters(tmp_path, [path]) == [["b1", "b2"]]
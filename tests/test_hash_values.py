@@ -0,0 +1,27 @@
+import json
+
+import pytest
+
+import medf
+
+
+def _agent_result(hash_value):
+    handler = medf._AgentHandler.__new__(medf._AgentHandler)
+    return handler._process(json.dumps({"hashes": [hash_value]}).encode("utf-8"))
+
+
+@pytest.mark.parametrize("algorithm", sorted(medf.HASH_ALGORITHMS))
+def test_registered_digests_match_hash_pattern(algorithm):
+    value = medf.hash_hex(b"x", algorithm)
+    assert medf.HASH_VALUE_RE.fullmatch(value)
+    assert not medf.schema_errors(value, {"$ref": "#/$defs/hashValue"}, medf._medf_schema())
+
+
+@pytest.mark.parametrize("value", ["a" * 63, "a" * 65, "a" * 96, "a" * 128, "A" * 64])
+def test_other_lengths_rejected(value):
+    assert medf.schema_errors(value, {"$ref": "#/$defs/hashValue"}, medf._medf_schema())
+    assert _agent_result(value) == {"result": "error", "error": "invalid_hash_value"}
+
+
+def test_agent_rejects_trailing_newline():
+    assert _agent_result("a" * 64 + "\n") == {"result": "error", "error": "invalid_hash_value"}
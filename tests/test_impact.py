@@ -0,0 +1,69 @@
+import json
+
+import medf
+
+
+def _document(doc_id, texts, references=()):
+    doc = {
+        "medf_version": "0.2.1",
+        "id": doc_id,
+        "blocks": [
+            {"block_id": block_id, "role": "body", "format": "markdown", "text": text}
+            for block_id, text in texts.items()
+        ],
+    }
+    if references:
+        doc["blocks"][0]["references"] = list(references)
+    medf.pack_document(doc)
+    return doc
+
+
+def _write(path, doc):
+    path.write_text(json.dumps(doc), encoding="utf-8")
+
+
+def _impact(run_medf, path, index, *flags):
+    proc = run_medf("impact", path, "--index", index, "--json", *flags)
+    assert proc.returncode == 0, proc.stdout
+    return [(ref["target_block"], ref["reason"]) for ref in json.loads(proc.stdout)["impacted"]]
+
+
+def test_impact_survives_reindex_until_acknowledged(run_medf, tmp_path):
+    index = tmp_path / "refs.db"
+    cited = tmp_path / "a.medf.json"
+    _write(cited, _document("a", {"intro": "Original.", "body": "Stable."}))
+    _write(tmp_path / "b.medf.json", _document("b", {"x": "Cites a."}, [
+        {"document_id": "a", "block_id": "intro"},
+        {"document_id": "a", "block_id": "body"},
+    ]))
+    assert run_medf("refs", "index", tmp_path, "--index", index).returncode == 0
+
+    _write(cited, _document("a", {"intro": "Revised.", "body": "Stable."}))
+    # A routine re-index must not swallow the change
+    assert run_medf("refs", "index", tmp_path, "--index", index).returncode == 0
+    assert _impact(run_medf, cited, index) == [("intro", "block_changed")]
+    assert _impact(run_medf, cited, index, "--ack") == [("intro", "block_changed")]
+    assert _impact(run_medf, cited, index) == []
+
+
+def test_baseline_is_per_path(run_medf, tmp_path):
+    index = tmp_path / "refs.db"
+    first, second = tmp_path / "one" / "a.medf.json", tmp_path / "two" / "a.medf.json"
+    first.parent.mkdir()
+    second.parent.mkdir()
+    _write(first, _document("a", {"intro": "First copy."}))
+    _write(second, _document("a", {"intro": "Second copy."}))
+    _write(tmp_path / "b.medf.json", _document("b", {"x": "Cites a."}, [{"document_id": "a", "block_id": "intro"}]))
+    assert run_medf("refs", "index", tmp_path, "--index", index).returncode == 0
+
+    assert _impact(run_medf, first, index) == []
+    assert _impact(run_medf, second, index) == []
+
+
+def test_unknown_baseline_is_reported(run_medf, tmp_path):
+    index = tmp_path / "refs.db"
+    _write(tmp_path / "b.medf.json", _document("b", {"x": "Cites a."}, [{"document_id": "a", "block_id": "intro"}]))
+    assert run_medf("refs", "index", tmp_path, "--index", index).returncode == 0
+    outside = tmp_path.parent / f"{tmp_path.name}-a.medf.json"
+    _write(outside, _document("a", {"intro": "Never indexed."}))
+    assert _impact(run_medf, outside, index) == [("intro", "baseline_unknown")]
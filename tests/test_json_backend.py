@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("orjson")
+
+import medf
+
+EXAMPLES = sorted((Path(__file__).resolve().parent.parent / "examples").glob("*.medf.json"))
+
+# Inputs both backends must reject (or accept) identically
+EDGE_CASES = [
+    b"",
+    b"{",
+    b'{"id": "x"',
+    b'{"id": "x"} trailing',
+    b'{"id": "\xff\xfe"}',
+    b'{"id": "\\ud800"}',
+    b'{"id": x}',
+    b"[1, 2,]",
+    b'{"a": 1,}',
+    b'{"n": NaN, "i": Infinity}',
+    b'{"big": 123456789012345678901234567890, "neg": -9223372036854775809}',
+    b'{"f": 1.0, "e": 1e16, "z": -0.0, "z2": -0}',
+    b'{"dup": 1, "dup": 2}',
+    b'"just a string"',
+    b"null",
+    b"[" * 200 + b"]" * 200,
+    b'\xef\xbb\xbf{"bom": true}',
+    b'{"blocks": [{"block_id": "a", "role": "body", "format": "markdown", "text": "\\u0000\\u001f\\u2028"}]}',
+]
+
+
+@pytest.fixture
+def restore_backend():
+    previous = medf.json_backend()
+    yield
+    medf.json_backend(previous)
+
+
+def _outcomes(backend, data):
+    medf.json_backend(backend)
+    return medf._json_outcomes(data)
+
+
+@pytest.mark.parametrize("path", EXAMPLES, ids=lambda p: p.name)
+def test_examples_identical_across_backends(restore_backend, path):
+    data = medf.read_document_bytes(path)
+    assert _outcomes("orjson", data) == _outcomes("stdlib", data)
+
+
+def test_generated_corpus_identical_across_backends(restore_backend):
+    for i, data in enumerate(medf.generate_json_corpus(300)):
+        assert _outcomes("orjson", data) == _outcomes("stdlib", data), f"generated-{i}"
+
+
+@pytest.mark.parametrize("data", EDGE_CASES)
+def test_edge_cases_and_parse_failures_identical(restore_backend, data):
+    assert _outcomes("orjson", data) == _outcomes("stdlib", data)
+
+
+def test_parse_failures_are_reported(restore_backend):
+    for backend in ("orjson", "stdlib"):
+        assert _outcomes(backend, b'{"id": "x"')[0].startswith("error:")
@@ -0,0 +1,26 @@
+import json
+
+import medf
+
+
+def test_pack_records_failures_and_still_writes_metrics(run_medf, tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    good = corpus / "a.medf.json"
+    good.write_text(json.dumps({
+        "medf_version": "0.2.1",
+        "id": "a",
+        "blocks": [{"block_id": "x", "role": "body", "format": "markdown", "text": "Text."}],
+    }), encoding="utf-8")
+    (corpus / "b.medf.json").write_text("{not json", encoding="utf-8")
+    (corpus / "c.medf.json").write_text(json.dumps({"id": "c", "blocks": [{"block_id": "x"}]}), encoding="utf-8")
+    metrics = tmp_path / "pack.prom"
+
+    proc = run_medf("pack", corpus, "--metrics", metrics)
+    assert proc.returncode == 1
+    assert medf.verify_document(medf.read_document(good))["result"] == "ok"
+    text = metrics.read_text()
+    assert 'medf_documents_total{command="pack",result="ok"} 1' in text
+    assert 'medf_documents_total{command="pack",result="error"} 2' in text
+    assert 'medf_failures_total{command="pack",error="unreadable_document"} 1' in text
+    assert 'medf_failures_total{command="pack",error="malformed_document"} 1' in text
@@ -0,0 +1,53 @@
+import json
+
+import medf
+
+CONTENT = "# Guide {:id=guide}\n\nIntro text.\n\n## Scope\n\nScope text.\n\n### Detail\n\nMore."
+
+
+def _legacy(**overrides):
+    doc = {
+        "medf_version": "0.2",
+        "document_type": "guideline",
+        "id": "guide",
+        "snapshot": "2025-01-01T00:00:00Z",
+        "authority": {"name": "Example Org"},
+        "content": CONTENT,
+        "index": {
+            "title": "Guide",
+            "summary": {"en": "A guide."},
+            "sections": [
+                {"id": "guide", "title": "Guide", "level": 1, "summary": ""},
+                {"id": "scope", "title": "Scope", "level": 2, "summary": ""},
+                {"id": "detail", "title": "Detail", "level": 3, "summary": ""},
+            ],
+        },
+        "references": [{"id": "other"}],
+    }
+    doc["hash"] = {"algorithm": "sha256", "value": medf.legacy_hash(doc)}
+    doc.update(overrides)
+    return doc
+
+
+def _migrate(tmp_path, legacy):
+    source = tmp_path / "guide.medf"
+    source.write_text(json.dumps(legacy), encoding="utf-8")
+    output = tmp_path / "out" / "guide.medf.json"
+    return medf._migrate_document((str(source), str(output), None)), output
+
+
+def test_migrate_keeps_headings_and_reports_dropped_keys(tmp_path):
+    entry, output = _migrate(tmp_path, _legacy())
+    assert entry["status"] == "migrated"
+    doc = medf.read_document(output)
+    assert [(b["block_id"], b["text"].split("\n")[0]) for b in doc["blocks"]] == [
+        ("guide", "# Guide"), ("scope", "## Scope"), ("detail", "### Detail"),
+    ]
+    assert medf.verify_document(doc)["result"] == "ok"
+    assert entry["dropped"] == ["authority", "content", "hash", "index", "references"]
+
+
+def test_migrate_non_dict_hash_is_reported(tmp_path):
+    entry, output = _migrate(tmp_path, _legacy(hash="deadbeef"))
+    assert entry["status"] == "no_legacy_hash"
+    assert not output.exists()
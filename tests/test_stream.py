@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+MODES = [["--jobs", "1"], ["--jobs", "2"], ["--jobs", "2", "--unordered"]]
+
+
+def _document(text, algorithm="sha-256"):
+    return {
+        "medf_version": "0.2.1",
+        "id": "doc",
+        "blocks": [{"block_id": "a", "role": "body", "format": "markdown", "text": text}],
+        "doc_hash": {"algorithm": algorithm, "value": "0" * 64},
+    }
+
+
+def _ndjson(count):
+    # Every other document names a hash algorithm medf does not implement
+    lines = []
+    for i in range(count):
+        algorithm = "md5" if i % 2 else "sha-256"
+        lines.append(json.dumps(_document(f"text {i}", algorithm)))
+    return ("\n".join(lines) + "\n").encode()
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_pack_unsupported_algorithm_yields_one_line_per_document(run_medf, mode):
+    proc = run_medf("stream", "pack", *mode, input=_ndjson(104))
+    assert proc.returncode == 0, proc.stderr
+    lines = proc.stdout.decode().splitlines()
+    assert len(lines) == 104
+    errors = [json.loads(line) for line in lines if '"result": "error"' in line]
+    assert sorted(e["seq"] for e in errors) == list(range(1, 104, 2))
+    assert all("unsupported hash algorithm" in e["detail"] for e in errors)
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_verify_yields_one_line_per_document(run_medf, mode):
+    proc = run_medf("stream", "verify", *mode, input=_ndjson(104))
+    assert proc.returncode == 0, proc.stderr
+    results = [json.loads(line) for line in proc.stdout.decode().splitlines()]
+    assert sorted(r["seq"] for r in results) == list(range(104))
+
+
+def test_invalid_utf8_is_invalid_json(run_medf):
+    good = json.dumps(_document("ok")).encode()
+    data = good + b"\n" + b'{"id": "\xff\xfe"}\n' + good + b"\n"
+    proc = run_medf("stream", "pack", "--jobs", "1", input=data)
+    lines = proc.stdout.decode().splitlines()
+    assert len(lines) == 3
+    error = json.loads(lines[1])
+    assert error["seq"] == 1 and error["error"] == "invalid_json"
@@ -0,0 +1,79 @@
+import json
+import os
+
+import pytest
+
+nacl_signing = pytest.importorskip("nacl.signing")
+
+import medf
+
+
+@pytest.fixture
+def key_path(tmp_path):
+    path = tmp_path / "key"
+    path.write_bytes(os.urandom(32))
+    return path
+
+
+def _signed_document(tmp_path, key_path, name="doc", text="Signed text."):
+    doc = {
+        "medf_version": "0.2.1",
+        "id": name,
+        "blocks": [{"block_id": "a", "role": "body", "format": "markdown", "text": text}],
+    }
+    medf.pack_document(doc)
+    doc["signature"] = medf.sign_hash(medf.load_signing_key(key_path), doc["doc_hash"]["value"])
+    path = tmp_path / f"{name}.medf.json"
+    path.write_text(json.dumps(doc), encoding="utf-8")
+    return path
+
+
+def _log_size(log_path):
+    log = medf.TransparencyLog(log_path)
+    try:
+        return log.size()
+    finally:
+        log.close()
+
+
+def test_append_accepts_valid_signature(run_medf, tmp_path, key_path):
+    log_path = tmp_path / "log.db"
+    path = _signed_document(tmp_path, key_path)
+    proc = run_medf("log", "append", path, "--log", log_path)
+    assert proc.returncode == 0, proc.stdout
+    assert _log_size(log_path) == 1
+
+
+@pytest.mark.parametrize("tamper", ["forged_signature", "stale_doc_hash", "wrong_public_key"])
+def test_append_rejects_unverifiable_document(run_medf, tmp_path, key_path, tamper):
+    log_path = tmp_path / "log.db"
+    good = _signed_document(tmp_path, key_path, "good")
+    bad = _signed_document(tmp_path, key_path, "bad")
+    doc = json.loads(bad.read_text(encoding="utf-8"))
+    if tamper == "forged_signature":
+        doc["signature"]["value"] = doc["signature"]["value"][::-1]
+    elif tamper == "stale_doc_hash":
+        doc["blocks"][0]["text"] = "Edited after signing."
+        medf.pack_document(doc)
+    else:
+        other = nacl_signing.SigningKey.generate().verify_key.encode()
+        doc["signature"]["public_key"] = medf.base64.b64encode(other).decode("ascii")
+    bad.write_text(json.dumps(doc), encoding="utf-8")
+
+    proc = run_medf("log", "append", good, bad, "--log", log_path)
+    assert proc.returncode == 1
+    assert b"Not logged" in proc.stdout
+    assert not log_path.exists() or _log_size(log_path) == 0
+
+
+def test_sign_log_rejects_stale_doc_hash(run_medf, tmp_path, key_path):
+    log_path = tmp_path / "log.db"
+    path = _signed_document(tmp_path, key_path)
+    doc = json.loads(path.read_text(encoding="utf-8"))
+    doc["blocks"][0]["text"] = "Edited without re-packing."
+    path.write_text(json.dumps(doc), encoding="utf-8")
+
+    proc = run_medf("sign", path, "--key", key_path, "--log", log_path)
+    assert proc.returncode == 1
+    assert json.loads(path.read_text(encoding="utf-8")) == doc
+    assert not log_path.exists() or _log_size(log_path) == 0
@@ -0,0 +1,23 @@
+import json
+
+import medf
+
+
+def test_single_path_verify_honours_cache_max_entries(run_medf, tmp_path):
+    cache = tmp_path / "cache.db"
+    for n in range(3):
+        doc = {
+            "medf_version": "0.2.1",
+            "id": f"doc-{n}",
+            "blocks": [{"block_id": "a", "role": "body", "format": "markdown", "text": f"Text {n}."}],
+        }
+        medf.pack_document(doc)
+        path = tmp_path / f"doc-{n}.medf.json"
+        path.write_text(json.dumps(doc), encoding="utf-8")
+        proc = run_medf("verify", path, "--cache", cache, "--cache-max-entries", "2")
+        assert proc.returncode == 0, proc.stdout
+    store = medf.VerifyCache(cache)
+    try:
+        assert store.count() == 2
+    finally:
+        store.close()
@@ -0,0 +1,38 @@
+import os
+import struct
+import sys
+
+import pytest
+
+import medf
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux-only")
+
+
+def test_queue_overflow_rescans_the_whole_tree(tmp_path, monkeypatch):
+    watcher = medf._InotifyWatcher(tmp_path)
+    (tmp_path / "notes.md").write_text("## A\n\nText.", encoding="utf-8")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "doc.medf.json.gz").write_bytes(b"")
+    (tmp_path / "sub" / "ignored.txt").write_text("x")
+
+    # Deliver the queued events as the kernel does once its queue overflowed
+    real_read = os.read
+    overflow = struct.pack("iIII", -1, medf._InotifyWatcher.IN_Q_OVERFLOW, 0, 0)
+    monkeypatch.setattr(medf.os, "read", lambda fd, n: real_read(fd, n) and overflow)
+
+    changed = watcher.wait(1.0)
+    assert watcher.overflowed
+    assert sorted(changed) == [tmp_path / "notes.md", tmp_path / "sub" / "doc.medf.json.gz"]
+
+    # The rescan also watches directories created while events were lost
+    monkeypatch.setattr(medf.os, "read", real_read)
+    (tmp_path / "sub" / "later.md").write_text("## B\n\nMore.", encoding="utf-8")
+    assert tmp_path / "sub" / "later.md" in watcher.wait(1.0)
+    assert not watcher.overflowed
+    os.close(watcher._fd)
+
+
+def test_overflow_event_is_reported(capsys):
+    medf._emit_watch_event({"event": "overflow", "path": "/docs", "rescanned": 3}, json_output=False)
+    assert "overflowed" in capsys.readouterr().out